@@ -2,9 +2,13 @@
 
 import sqlite3
 import sys
-from typing import Dict, Any
+from contextlib import closing
+from typing import Dict, Any, Iterator, List
+
+from sqlalchemy import select, insert, update
 
 from src.utils.logger import get_logger
+from src.db_sa.engine import engine
 from src.db_sa.init_db import init_database
 from src.db_sa.session import SessionLocal
 from src.db_sa.models import Account, AccountInfo, Magic, MagicGroup, MagicGroupAssignment
@@ -14,34 +18,225 @@ logger = get_logger()
 # Default legacy database path
 DEFAULT_LEGACY_DB = "magics.db"
 
+# Rows per bulk statement (keeps SQLite under its bound-parameter limit)
+BULK_CHUNK_SIZE = 500
+
+# Rows pulled from the legacy cursor per fetch
+LEGACY_FETCH_SIZE = 1000
+
+# Legacy file is only read, so its journal mode is left untouched
+LEGACY_PRAGMAS = (
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+)
+
+TARGET_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+)
 
-def _get_legacy_records(db_path: str) -> Dict[str, Any]:
-    with sqlite3.connect(db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT account_id, account_title, leverage, server FROM account_settings")
-        account_settings = cursor.fetchall()
+# SQLite -> SQLite migration: legacy file is ATTACHed as "legacy" and copied
+# inside the SQLite VM. Empty legacy values never overwrite existing ones.
+ATTACHED_MIGRATION_SQL = (
+    ("accounts", """
+        INSERT INTO accounts (account_id, label, created_at, updated_at)
+        SELECT CAST(account_id AS TEXT), account_title, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+        FROM legacy.account_settings WHERE true
+        ON CONFLICT(account_id) DO UPDATE SET
+            label = COALESCE(NULLIF(excluded.label, ''), accounts.label),
+            updated_at = excluded.updated_at
+    """),
+    ("account_info", """
+        INSERT INTO account_info (account_id, account_number, leverage, server, updated_at)
+        SELECT CAST(account_id AS TEXT), CAST(account_id AS TEXT), leverage, server, CURRENT_TIMESTAMP
+        FROM legacy.account_settings WHERE true
+        ON CONFLICT(account_id) DO UPDATE SET
+            leverage = COALESCE(NULLIF(excluded.leverage, 0), account_info.leverage),
+            server = COALESCE(NULLIF(excluded.server, ''), account_info.server),
+            updated_at = excluded.updated_at
+    """),
+    ("magics", """
+        INSERT INTO magics (account_id, id, label)
+        SELECT CAST(account AS TEXT), magic, description
+        FROM legacy.magic_descriptions WHERE true
+        ON CONFLICT(account_id, id) DO UPDATE SET
+            label = COALESCE(NULLIF(excluded.label, ''), magics.label)
+    """),
+    ("magic_groups", """
+        INSERT INTO magic_groups (id, account_id, name)
+        SELECT id, CAST(account_id AS TEXT), name
+        FROM legacy.magic_groups WHERE true
+        ON CONFLICT(id) DO UPDATE SET
+            name = COALESCE(NULLIF(excluded.name, ''), magic_groups.name)
+    """),
+    ("magic_group_assignments", """
+        INSERT INTO magic_group_assignments (account_id, group_id, magic_id)
+        SELECT CAST(account_id AS TEXT), group_id, magic
+        FROM legacy.magic_group_assignments WHERE true
+        ON CONFLICT DO NOTHING
+    """),
+)
 
-        cursor.execute("SELECT account, magic, description FROM magic_descriptions")
-        magic_descriptions = cursor.fetchall()
 
-        cursor.execute("SELECT id, account_id, name FROM magic_groups")
-        magic_groups = cursor.fetchall()
+def _iter_batches(conn: sqlite3.Connection, query: str) -> Iterator[List[tuple]]:
+    """Yield legacy rows in ``LEGACY_FETCH_SIZE`` batches straight from the cursor."""
+    cursor = conn.cursor()
+    cursor.arraysize = LEGACY_FETCH_SIZE
+    cursor.execute(query)
+    yield from iter(cursor.fetchmany, [])
+
+
+def _get_legacy_records(conn: sqlite3.Connection) -> Dict[str, Iterator[List[tuple]]]:
+    return {
+        "account_settings": _iter_batches(
+            conn, "SELECT account_id, account_title, leverage, server FROM account_settings"
+        ),
+        "magic_descriptions": _iter_batches(conn, "SELECT account, magic, description FROM magic_descriptions"),
+        "magic_groups": _iter_batches(conn, "SELECT id, account_id, name FROM magic_groups"),
+        "group_assignments": _iter_batches(conn, "SELECT account_id, group_id, magic FROM magic_group_assignments"),
+    }
 
-        cursor.execute("SELECT account_id, group_id, magic FROM magic_group_assignments")
-        group_assignments = cursor.fetchall()
 
+def _get_existing_keys(session) -> Dict[str, set]:
+    """Prefetch primary keys of already migrated rows, one SELECT per table."""
     return {
-        "account_settings": account_settings,
-        "magic_descriptions": magic_descriptions,
-        "magic_groups": magic_groups,
-        "group_assignments": group_assignments,
+        "accounts": set(session.execute(select(Account.account_id)).scalars()),
+        "account_info": set(session.execute(select(AccountInfo.account_id)).scalars()),
+        "magics": set(session.execute(select(Magic.account_id, Magic.id)).tuples()),
+        "magic_groups": set(session.execute(select(MagicGroup.id)).scalars()),
+        "group_assignments": set(
+            session.execute(
+                select(
+                    MagicGroupAssignment.account_id,
+                    MagicGroupAssignment.group_id,
+                    MagicGroupAssignment.magic_id,
+                )
+            ).tuples()
+        ),
     }
 
 
+def _bulk_execute(session, statement, rows: List[Dict[str, Any]]) -> None:
+    for start in range(0, len(rows), BULK_CHUNK_SIZE):
+        session.execute(statement, rows[start:start + BULK_CHUNK_SIZE])
+
+
+def _migrate_attached(legacy_path: str) -> Dict[str, int]:
+    """Copy legacy tables with INSERT ... SELECT; no rows pass through Python."""
+    # Driver-level autocommit: BEGIN/COMMIT are issued explicitly below, and
+    # ATTACH/journal_mode cannot run inside an open transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for pragma in TARGET_PRAGMAS:
+            conn.exec_driver_sql(pragma)
+        conn.exec_driver_sql("ATTACH DATABASE ? AS legacy", (legacy_path,))
+        try:
+            # Take the write lock once; all statements share this transaction
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                written = {
+                    table: conn.exec_driver_sql(sql).rowcount
+                    for table, sql in ATTACHED_MIGRATION_SQL
+                }
+                conn.exec_driver_sql("COMMIT")
+            except Exception:
+                conn.exec_driver_sql("ROLLBACK")
+                raise
+        finally:
+            conn.exec_driver_sql("DETACH DATABASE legacy")
+
+    return written
+
+
+def _migrate_streamed(legacy_path: str) -> Dict[str, int]:
+    """Stream legacy rows through bulk ORM statements (non-SQLite targets)."""
+    with closing(sqlite3.connect(legacy_path)) as legacy_conn, SessionLocal() as session:
+        for pragma in LEGACY_PRAGMAS:
+            legacy_conn.execute(pragma)
+
+        records = _get_legacy_records(legacy_conn)
+        existing = _get_existing_keys(session)
+        written = {table: 0 for table, _ in ATTACHED_MIGRATION_SQL}
+
+        for batch in records["account_settings"]:
+            accounts_insert, accounts_update = [], []
+            info_insert, info_update = [], []
+            for account_id, account_title, leverage, server in batch:
+                account_id = str(account_id)
+                if account_id not in existing["accounts"]:
+                    existing["accounts"].add(account_id)
+                    accounts_insert.append({"account_id": account_id, "label": account_title})
+                elif account_title:
+                    accounts_update.append({"account_id": account_id, "label": account_title})
+
+                if account_id not in existing["account_info"]:
+                    existing["account_info"].add(account_id)
+                    info_insert.append({
+                        "account_id": account_id,
+                        "account_number": account_id,
+                        "leverage": leverage,
+                        "server": server,
+                    })
+                else:
+                    changes = {k: v for k, v in (("leverage", leverage), ("server", server)) if v}
+                    if changes:
+                        info_update.append({"account_id": account_id, **changes})
+
+            _bulk_execute(session, insert(Account), accounts_insert)
+            _bulk_execute(session, update(Account), accounts_update)
+            _bulk_execute(session, insert(AccountInfo), info_insert)
+            _bulk_execute(session, update(AccountInfo), info_update)
+            written["accounts"] += len(accounts_insert) + len(accounts_update)
+            written["account_info"] += len(info_insert) + len(info_update)
+
+        for batch in records["magic_descriptions"]:
+            magics_insert, magics_update = [], []
+            for account_id, magic, description in batch:
+                key = (str(account_id), magic)
+                if key not in existing["magics"]:
+                    existing["magics"].add(key)
+                    magics_insert.append({"account_id": key[0], "id": magic, "label": description})
+                elif description:
+                    magics_update.append({"account_id": key[0], "id": magic, "label": description})
+
+            _bulk_execute(session, insert(Magic), magics_insert)
+            _bulk_execute(session, update(Magic), magics_update)
+            written["magics"] += len(magics_insert) + len(magics_update)
+
+        for batch in records["magic_groups"]:
+            groups_insert, groups_update = [], []
+            for group_id, account_id, name in batch:
+                if group_id not in existing["magic_groups"]:
+                    existing["magic_groups"].add(group_id)
+                    groups_insert.append({"id": group_id, "account_id": str(account_id), "name": name})
+                elif name:
+                    groups_update.append({"id": group_id, "name": name})
+
+            _bulk_execute(session, insert(MagicGroup), groups_insert)
+            _bulk_execute(session, update(MagicGroup), groups_update)
+            written["magic_groups"] += len(groups_insert) + len(groups_update)
+
+        for batch in records["group_assignments"]:
+            assignments_insert = []
+            for account_id, group_id, magic in batch:
+                key = (str(account_id), group_id, magic)
+                if key not in existing["group_assignments"]:
+                    existing["group_assignments"].add(key)
+                    assignments_insert.append({"account_id": key[0], "group_id": group_id, "magic_id": magic})
+
+            _bulk_execute(session, insert(MagicGroupAssignment), assignments_insert)
+            written["magic_group_assignments"] += len(assignments_insert)
+
+        session.commit()
+
+    return written
+
+
 def migrate_legacy_db(db_path: str = None) -> None:
     """
     Migrate data from legacy magics.db to new SQLAlchemy schema.
-    
+
     Args:
         db_path: Path to legacy database file (default: magics.db)
     """
@@ -49,57 +244,14 @@ def migrate_legacy_db(db_path: str = None) -> None:
     logger.info(f"Migrating legacy database: {legacy_path}")
 
     init_database()
-    records = _get_legacy_records(legacy_path)
-
-    with SessionLocal() as session:
-        for account_id, account_title, leverage, server in records["account_settings"]:
-            account = session.get(Account, account_id)
-            if not account:
-                account = Account(account_id=account_id, label=account_title)
-                session.add(account)
-            else:
-                account.label = account_title or account.label
-
-            info = session.get(AccountInfo, account_id)
-            if not info:
-                info = AccountInfo(
-                    account_id=account_id,
-                    account_number=str(account_id),
-                    leverage=leverage,
-                    server=server,
-                )
-                session.add(info)
-            else:
-                info.leverage = leverage or info.leverage
-                info.server = server or info.server
-
-        for account_id, magic, description in records["magic_descriptions"]:
-            magic_entry = session.get(Magic, {"account_id": account_id, "id": magic})
-            if not magic_entry:
-                magic_entry = Magic(id=magic, account_id=account_id, label=description)
-                session.add(magic_entry)
-            else:
-                magic_entry.label = description or magic_entry.label
-
-        for group_id, account_id, name in records["magic_groups"]:
-            group = session.get(MagicGroup, group_id)
-            if not group:
-                group = MagicGroup(id=group_id, account_id=account_id, name=name)
-                session.add(group)
-            else:
-                group.name = name or group.name
-
-        for account_id, group_id, magic in records["group_assignments"]:
-            existing = session.get(
-                MagicGroupAssignment,
-                {"account_id": account_id, "group_id": group_id, "magic_id": magic},
-            )
-            if not existing:
-                session.add(MagicGroupAssignment(account_id=account_id, group_id=group_id, magic_id=magic))
 
-        session.commit()
+    if engine.dialect.name == "sqlite":
+        written = _migrate_attached(legacy_path)
+    else:
+        written = _migrate_streamed(legacy_path)
 
-    logger.info("Legacy migration completed")
+    summary = ", ".join(f"{table}={count}" for table, count in written.items())
+    logger.info(f"Legacy migration completed: {summary}")
 
 
 if __name__ == "__main__":
@@ -1,84 +1,133 @@
 """Max drawdown calculation for closed deals."""
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import timedelta
-from typing import Optional, Iterable, Tuple
+from typing import Optional, Iterable, Tuple, Dict, List, Any
 
 import MetaTrader5 as mt5
+from sqlalchemy import select, tuple_
 
 from ..utils.logger import get_logger
 from ..db_sa.session import SessionLocal
-from ..db_sa.models import Deal, DealDrawdown, AccountInfo
+from ..db_sa.models import Deal, AccountInfo
+from ..db_sa.bulk import update_deal_drawdowns
 from ..mt5.tick_data import MT5TickProvider
 from ..mt5.mt5_client import MT5Connection
 from ..config.settings import Config
 
 logger = get_logger()
 
+# Deal keys per IN (...) query
+DRAWDOWN_BATCH_SIZE = 500
+
+# Tick price whose extreme gives the worst price for a deal direction
+_EXTREME_COLUMNS = {"buy": "bid", "sell": "ask"}
+
+# Worker threads for tick lookup + drawdown calculation
+DRAWDOWN_MAX_WORKERS = 4
+
+_LOCAL_TIMESHIFT = timedelta(hours=Config.LOCAL_TIMESHIFT)
+
+_connection = MT5Connection()
+
+# (login, server, symbol) -> (point, tick_size, tick_value) from mt5.symbol_info;
+# tick value is in the deposit currency, so it is cached per logged-in account
+_symbol_params_cache: Dict[Tuple[int, str, str], Tuple[float, Optional[float], Optional[float]]] = {}
+
 
 def _to_local_time(dt):
-    return dt + timedelta(hours=Config.LOCAL_TIMESHIFT)
+    return dt + _LOCAL_TIMESHIFT
 
 
 def _get_point_and_tick_value(symbol: str) -> Tuple[float, Optional[float], Optional[float]]:
-    connection = MT5Connection()
-    if not connection.ensure_connected():
+    if not _connection.ensure_connected():
         return 1.0, None, None
 
+    account = mt5.account_info()
+    key = (account.login, account.server, symbol) if account else None
+    cached = _symbol_params_cache.get(key)
+    if cached is not None:
+        return cached
+
     info = mt5.symbol_info(symbol)
     if not info:
         return 1.0, None, None
     point = float(getattr(info, "point", 1.0) or 1.0)
     tick_size = float(getattr(info, "trade_tick_size", 0.0) or 0.0)
     tick_value = float(getattr(info, "trade_tick_value", 0.0) or 0.0)
-    return point, tick_size if tick_size > 0 else None, tick_value if tick_value > 0 else None
+    params = (point, tick_size if tick_size > 0 else None, tick_value if tick_value > 0 else None)
+    # Only successful lookups are cached, so a disconnected terminal is retried
+    if key is not None:
+        _symbol_params_cache[key] = params
+    return params
 
 
-def _calculate_drawdown_prices(direction: str, entry_price: float, ticks) -> Optional[float]:
+def _calculate_drawdown_prices(direction: str, entry_price: float, extreme: Optional[float]) -> Optional[float]:
+    """Drawdown in price units from the lowest bid (buy) or highest ask (sell)."""
+    if extreme is None:
+        return None
     if direction == "buy":
-        min_bid = min((t["bid"] for t in ticks), default=None)
-        if min_bid is None:
-            return None
-        return min_bid - entry_price
+        return extreme - entry_price
     if direction == "sell":
-        max_ask = max((t["ask"] for t in ticks), default=None)
-        if max_ask is None:
-            return None
-        return entry_price - max_ask
+        return entry_price - extreme
     return None
 
 
-def calculate_drawdown_for_deal(account_id: str, ticket_id: int) -> bool:
+def _load_deals(deal_keys: List[Tuple[str, int]]) -> List[Tuple[Deal, Optional[str]]]:
+    """Load deals with their account server in one query per key chunk."""
+    rows = []
     with SessionLocal() as session:
-        deal = session.get(Deal, {"account_id": account_id, "ticket_id": ticket_id})
-        if not deal or not deal.is_closed:
-            logger.debug("drawdown: deal not found or not closed")
-            return False
-
-        if not deal.entry_time or not deal.exit_time:
-            logger.warning("drawdown: missing entry/exit time")
-            return False
-
-        account_info = session.get(AccountInfo, account_id)
-        server = account_info.server if account_info else None
+        for start in range(0, len(deal_keys), DRAWDOWN_BATCH_SIZE):
+            chunk = deal_keys[start:start + DRAWDOWN_BATCH_SIZE]
+            stmt = (
+                select(Deal, AccountInfo.server)
+                .outerjoin(AccountInfo, AccountInfo.account_id == Deal.account_id)
+                .where(tuple_(Deal.account_id, Deal.ticket_id).in_(chunk))
+            )
+            rows.extend(session.execute(stmt).tuples())
+    return rows
+
+
+def _compute_drawdown(
+    deal: Deal,
+    server: Optional[str],
+    symbol_params: Dict[str, Tuple[float, Optional[float], Optional[float]]],
+) -> Optional[Dict[str, Any]]:
+    """Compute drawdown row for a loaded deal; symbol_params caches symbol info per batch."""
+    if not deal.is_closed:
+        logger.debug("drawdown: deal not found or not closed")
+        return None
+
+    if not deal.entry_time or not deal.exit_time:
+        logger.warning("drawdown: missing entry/exit time")
+        return None
+
+    column = _EXTREME_COLUMNS.get(deal.direction)
+    if column is None:
+        logger.warning("drawdown: unable to compute drawdown price")
+        return None
 
     provider = MT5TickProvider()
-    ticks = provider.get_ticks_from_db(
+    extreme = provider.get_tick_extreme(
         deal.symbol,
         _to_local_time(deal.entry_time),
         _to_local_time(deal.exit_time),
+        column,
         server=server,
     )
 
-    if not ticks:
-        logger.warning(f"drawdown: no ticks for {deal.symbol} {ticket_id}")
-        return False
+    if extreme is None:
+        logger.warning(f"drawdown: no ticks for {deal.symbol} {deal.ticket_id}")
+        return None
 
-    dd_price = _calculate_drawdown_prices(deal.direction, deal.entry_price or 0.0, ticks)
+    dd_price = _calculate_drawdown_prices(deal.direction, deal.entry_price or 0.0, extreme)
     if dd_price is None:
         logger.warning("drawdown: unable to compute drawdown price")
-        return False
+        return None
 
-    point, tick_size, tick_value = _get_point_and_tick_value(deal.symbol)
+    if deal.symbol not in symbol_params:
+        symbol_params[deal.symbol] = _get_point_and_tick_value(deal.symbol)
+    point, tick_size, tick_value = symbol_params[deal.symbol]
     drawdown_points = dd_price / point if point else dd_price
 
     if tick_size and tick_value:
@@ -86,29 +135,62 @@ def calculate_drawdown_for_deal(account_id: str, ticket_id: int) -> bool:
     else:
         drawdown_currency = dd_price * (deal.volume or 0.0)
 
+    return {
+        "account_id": deal.account_id,
+        "ticket_id": deal.ticket_id,
+        "max_drawdown_points": drawdown_points,
+        "max_drawdown_currency": drawdown_currency,
+    }
+
+
+def _save_drawdowns(rows: List[Dict[str, Any]]) -> None:
+    """Write drawdown columns of the deals, one executemany() UPDATE."""
     with SessionLocal() as session:
-        existing = session.get(DealDrawdown, {"account_id": account_id, "ticket_id": ticket_id})
-        if not existing:
-            session.add(
-                DealDrawdown(
-                    account_id=account_id,
-                    ticket_id=ticket_id,
-                    max_drawdown_points=drawdown_points,
-                    max_drawdown_currency=drawdown_currency,
-                )
-            )
-        else:
-            existing.max_drawdown_points = drawdown_points
-            existing.max_drawdown_currency = drawdown_currency
+        update_deal_drawdowns(session, rows)
         session.commit()
 
+
+def calculate_drawdown_for_deal(account_id: str, ticket_id: int) -> bool:
+    rows = _load_deals([(account_id, ticket_id)])
+    if not rows:
+        logger.debug("drawdown: deal not found or not closed")
+        return False
+
+    deal, server = rows[0]
+    result = _compute_drawdown(deal, server, {})
+    if not result:
+        return False
+
+    _save_drawdowns([result])
+
     logger.info(f"drawdown: calculated for deal {ticket_id} on account {account_id}")
     return True
 
 
 def calculate_drawdown_for_deals(deal_keys: Iterable[Tuple[str, int]]) -> int:
-    processed = 0
-    for account_id, ticket_id in deal_keys:
-        if calculate_drawdown_for_deal(account_id, ticket_id):
-            processed += 1
-    return processed
+    deals = _load_deals(list(deal_keys))
+    if not deals:
+        return 0
+
+    # MT5 lookups stay on this thread; workers only read the prefetched values
+    symbol_params = {symbol: _get_point_and_tick_value(symbol) for symbol in {deal.symbol for deal, _ in deals}}
+
+    results = []
+    with ThreadPoolExecutor(max_workers=DRAWDOWN_MAX_WORKERS, thread_name_prefix="drawdown_") as executor:
+        futures = {
+            executor.submit(_compute_drawdown, deal, server, symbol_params): deal
+            for deal, server in deals
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception:
+                logger.warning(f"drawdown: failed for deal {futures[future].ticket_id}", exc_info=True)
+                continue
+            if result:
+                results.append(result)
+
+    if results:
+        _save_drawdowns(results)
+        logger.info(f"drawdown: calculated for {len(results)} deals")
+    return len(results)
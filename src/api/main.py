@@ -1,14 +1,20 @@
 """FastAPI service for MT5 Trading Dashboard."""
 
+import asyncio
+import hashlib
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Optional, List
 
-from fastapi import FastAPI, HTTPException
+import orjson
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict
 
 from ..utils.logger import get_logger
+from ..db_sa.engine import POOL_SIZE, POOL_MAX_OVERFLOW
 from ..db_sa.init_db import init_database
 from ..config.settings import Config
 from ..readmodels.dashboard_queries import (
@@ -23,14 +29,41 @@ from ..services.chart_service import ChartService
 
 logger = get_logger()
 
-app = FastAPI(title="MT5 Trading Dashboard API")
+# Thread pool for read-only DB queries (SQLAlchemy session API is blocking),
+# one thread per connection the engine pool can hand out
+_db_executor = ThreadPoolExecutor(max_workers=POOL_SIZE + POOL_MAX_OVERFLOW, thread_name_prefix="db_read_")
+
+
+async def _run_db(func, *args, **kwargs):
+    """Run a blocking read query on the DB executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, lambda: func(*args, **kwargs))
+
+
+def _etag_response(request: Request, data) -> Response:
+    """JSON response with an ETag; answers 304 when the client copy is current."""
+    body = orjson.dumps(data)
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    # no-cache: the browser always revalidates, so edits show up immediately
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+app = FastAPI(title="MT5 Trading Dashboard API", default_response_class=ORJSONResponse)
 
 # CORS configuration from environment
-ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
-ALLOWED_ORIGINS = [origin.strip() for origin in ALLOWED_ORIGINS if origin.strip()]
+ALLOWED_ORIGINS = frozenset(
+    origin.strip()
+    for origin in os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
+    if origin.strip()
+)
+app.state.allowed_origins = ALLOWED_ORIGINS
 
 app.add_middleware(
     CORSMiddleware,
+    # CORSMiddleware only does membership checks, so the frozenset is used as is
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
@@ -49,7 +82,7 @@ def _startup_init_db() -> None:
     init_database()
     logger.info("Database initialized")
     
-    logger.info(f"CORS allowed origins: {ALLOWED_ORIGINS}")
+    logger.info(f"CORS allowed origins: {sorted(ALLOWED_ORIGINS)}")
     
     if not Config.MT5_CRED_KEY:
         logger.warning("MT5_CRED_KEY not configured - credential encryption disabled")
@@ -64,43 +97,48 @@ def _startup_init_db() -> None:
 
 # ============== Request Models ==============
 
-class SyncRequest(BaseModel):
+class RequestModel(BaseModel):
+    """Base for request bodies: immutable, validated by the pydantic-core (v2) engine."""
+    model_config = ConfigDict(frozen=True)
+
+
+class SyncRequest(RequestModel):
     account_id: Optional[str] = None
     use_active: bool = False
 
 
-class HistorySyncRequest(BaseModel):
+class HistorySyncRequest(RequestModel):
     account_id: Optional[str] = None
     use_active: bool = False
     from_date: Optional[datetime] = None
     to_date: Optional[datetime] = None
 
 
-class CredentialsRequest(BaseModel):
+class CredentialsRequest(RequestModel):
     login: str
     server: str
     password: str
 
 
-class LabelRequest(BaseModel):
+class LabelRequest(RequestModel):
     label: str
 
 
-class HistoryStartRequest(BaseModel):
+class HistoryStartRequest(RequestModel):
     history_start_date: Optional[datetime] = None
 
 
-class MagicLabelItem(BaseModel):
+class MagicLabelItem(RequestModel):
     magic: int
     label: str
 
 
-class MagicLabelsRequest(BaseModel):
+class MagicLabelsRequest(RequestModel):
     account_id: str
     labels: List[MagicLabelItem]
 
 
-class GroupCreateRequest(BaseModel):
+class GroupCreateRequest(RequestModel):
     account_id: str
     name: str
     label2: Optional[str] = None
@@ -108,23 +146,23 @@ class GroupCreateRequest(BaseModel):
     fill_color: Optional[str] = None
 
 
-class GroupRenameRequest(BaseModel):
+class GroupRenameRequest(RequestModel):
     name: Optional[str] = None
     label2: Optional[str] = None
     font_color: Optional[str] = None
     fill_color: Optional[str] = None
 
 
-class GroupAssignmentsRequest(BaseModel):
+class GroupAssignmentsRequest(RequestModel):
     account_id: str
     magic_ids: List[int]
 
 
-class ChartConfigRequest(BaseModel):
+class ChartConfigRequest(RequestModel):
     charts_path: str
 
 
-class ChartSectionCreateRequest(BaseModel):
+class ChartSectionCreateRequest(RequestModel):
     folder_name: str
     validation_line1: str
     validation_line2: Optional[str] = None
@@ -132,14 +170,14 @@ class ChartSectionCreateRequest(BaseModel):
     param_value: str
 
 
-class ChartSectionUpdateRequest(BaseModel):
+class ChartSectionUpdateRequest(RequestModel):
     validation_line1: Optional[str] = None
     validation_line2: Optional[str] = None
     param_key: Optional[str] = None
     param_value: Optional[str] = None
 
 
-class ChartValidateRequest(BaseModel):
+class ChartValidateRequest(RequestModel):
     folder_name: str
     validation_line1: str
     validation_line2: Optional[str] = None
@@ -155,9 +193,9 @@ def health():
 
 
 @app.get("/accounts")
-def list_accounts():
+async def list_accounts(request: Request):
     """List all accounts with their info."""
-    return AccountService.list_accounts()
+    return _etag_response(request, await _run_db(AccountService.list_accounts))
 
 
 @app.get("/terminal/active")
@@ -208,9 +246,9 @@ def update_history_start(account_id: str, payload: HistoryStartRequest):
 # ============== Magics & Groups ==============
 
 @app.get("/magics")
-def list_magics(account_id: str):
+async def list_magics(request: Request, account_id: str):
     """List all magics with group assignments."""
-    return GroupService.list_magics(account_id)
+    return _etag_response(request, await _run_db(GroupService.list_magics, account_id))
 
 
 @app.post("/magics/labels")
@@ -222,9 +260,9 @@ def update_magic_labels(payload: MagicLabelsRequest):
 
 
 @app.get("/groups")
-def list_groups(account_id: str):
+async def list_groups(request: Request, account_id: str):
     """List all groups for an account."""
-    return GroupService.list_groups(account_id)
+    return _etag_response(request, await _run_db(GroupService.list_groups, account_id))
 
 
 @app.post("/groups")
@@ -275,25 +313,25 @@ def update_group_assignments(group_id: int, payload: GroupAssignmentsRequest):
 # ============== Data Queries ==============
 
 @app.get("/open-positions")
-def open_positions(account_id: str):
+async def open_positions(account_id: str):
     """Get open positions summary."""
-    return get_open_positions_summary(account_id)
+    return await _run_db(get_open_positions_summary, account_id)
 
 
 @app.get("/aggregates")
-def aggregates(account_id: str, from_date: datetime, to_date: datetime):
+async def aggregates(account_id: str, from_date: datetime, to_date: datetime):
     """Get period aggregates."""
-    return get_period_aggregates(account_id, from_date, to_date)
+    return await _run_db(get_period_aggregates, account_id, from_date, to_date)
 
 
 @app.get("/deals")
-def deals(account_id: str, from_date: datetime, to_date: datetime):
+async def deals(account_id: str, from_date: datetime, to_date: datetime):
     """Get deals for a period."""
-    return get_deals(account_id, from_date, to_date)
+    return await _run_db(get_deals, account_id, from_date, to_date)
 
 
 @app.get("/compare-deals")
-def compare_deals(
+async def compare_deals(
     account_id_1: str,
     account_id_2: str,
     magic: int,
@@ -302,7 +340,8 @@ def compare_deals(
     tolerance_seconds: int = 1
 ):
     """Compare deals between two accounts by matching entry_time."""
-    return get_compared_deals(
+    return await _run_db(
+        get_compared_deals,
         account_id_1=account_id_1,
         account_id_2=account_id_2,
         magic=magic,
@@ -2,56 +2,165 @@
 Configuration settings for MT5 Trading Dashboard
 """
 
+import logging
 import os
-from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
-from pathlib import Path
-
-# Try to load .env file if python-dotenv is available
-try:
-    from dotenv import load_dotenv
-    # Load .env file from project root
-    env_path = Path(__file__).parent.parent.parent / '.env'
-    if env_path.exists():
-        load_dotenv(env_path)
-except ImportError:
-    # python-dotenv not installed, skip .env loading
-    pass
-
-
-class Config:
-    """Main configuration class"""
-    
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, Any, Final, Mapping, Optional, Tuple
+from types import MappingProxyType
+
+# Process environment, read directly instead of through os.getenv
+_env = os.environ
+
+# Load .env from project root unless disabled (MT5_SKIP_DOTENV=1 skips the
+# file check and the python-dotenv import entirely)
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_ENV_FILE = os.path.join(_PROJECT_ROOT, '.env')
+if _env.get("MT5_SKIP_DOTENV") != "1" and os.path.isfile(_ENV_FILE):
+    # Parse .env once per file version; the sentinel survives module
+    # reloads and is inherited by worker processes
+    env_key = f"{_ENV_FILE}:{os.stat(_ENV_FILE).st_mtime_ns}"
+    if _env.get("_MT5_DOTENV_LOADED") != env_key:
+        try:
+            from dotenv import load_dotenv
+            load_dotenv(_ENV_FILE)
+            _env["_MT5_DOTENV_LOADED"] = env_key
+        except ImportError:
+            # python-dotenv not installed, skip .env loading
+            pass
+
+
+# Accepted LOG_LEVEL values
+_VALID_LOG_LEVELS = frozenset({"DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"})
+
+# Read-only UI constants, also exposed as Config attributes
+CHART_MARGINS = MappingProxyType({
+    "t": 120,
+    "b": 40,
+    "l": 40,
+    "r": 20
+})
+
+# Color schemes
+COLOR_SCHEMES = MappingProxyType({
+    "profit_loss": "RdYlGn",
+    "positive": "lime",
+    "negative_warning": "orange",
+    "negative_critical": "OrangeRed",
+    "negative_danger": "red"
+})
+
+# Performance thresholds (as percentages)
+PERFORMANCE_THRESHOLDS = MappingProxyType({
+    "warning": -12,
+    "critical": -20
+})
+
+
+@lru_cache(maxsize=4)
+def _preset_starts(day: date) -> Tuple[Tuple[str, datetime, int], ...]:
+    """(preset name, start, start as Unix seconds) for a local date"""
+    # datetime.now() уже возвращает локальное время, не нужно добавлять LOCAL_TIMESHIFT
+    midnight = time.min
+    starts = (
+        ("today", datetime.combine(day, midnight)),
+        ("this_week", datetime.combine(day - timedelta(days=day.weekday()), midnight)),
+        ("this_month", datetime.combine(day.replace(day=1), midnight)),
+        ("this_year", datetime.combine(day.replace(month=1, day=1), midnight)),
+    )
+    return tuple((name, start, int(start.timestamp())) for name, start in starts)
+
+
+# Environment values treated as true for boolean settings
+_TRUE = frozenset({"true", "1", "yes", "on", "y", "t"})
+
+
+def _as_bool(value: str) -> bool:
+    return value.strip().lower() in _TRUE
+
+
+def _read_env(key: str, coerce: Callable[[str], Any], default: Any) -> Any:
+    """Environment value coerced to the setting type; default if unset or malformed"""
+    raw = _env.get(key)
+    if raw is None:
+        return default
+    try:
+        return coerce(raw)
+    except ValueError:
+        # settings is imported by the logger module, so use the logger by name
+        logging.getLogger('mt5_dashboard').warning(f"Invalid value for {key}: {raw!r}, using default {default!r}")
+        return default
+
+
+# Lazily read settings: attribute name -> (environment variable, coerce, default).
+# Defaults are already coerced; coerce is applied to environment values only.
+_SPEC: Final[Mapping[str, Tuple[str, Callable[[str], Any], Any]]] = MappingProxyType({
     # Application settings
-    APP_NAME = os.getenv("APP_NAME", "MT5 Trading Dashboard")
-    APP_VERSION = os.getenv("APP_VERSION", "1.0.0")
-    PAGE_TITLE = os.getenv("PAGE_TITLE", "Trading Dashboard")
+    "APP_NAME": ("APP_NAME", str, "MT5 Trading Dashboard"),
+    "APP_VERSION": ("APP_VERSION", str, "1.0.0"),
+    "PAGE_TITLE": ("PAGE_TITLE", str, "Trading Dashboard"),
     
     # Database settings
-    DATABASE_PATH = os.getenv("DATABASE_PATH", "magics.db")
-    SQLALCHEMY_DATABASE_URL = os.getenv("SQLALCHEMY_DATABASE_URL", None)
+    "DATABASE_PATH": ("DATABASE_PATH", str, "magics.db"),
+    "SQLALCHEMY_DATABASE_URL": ("SQLALCHEMY_DATABASE_URL", str, None),
+    # Memory-mapped I/O for tick databases in bytes, 0 disables (e.g. 32-bit builds)
+    "TICK_DB_MMAP_SIZE": ("TICK_DB_MMAP_SIZE", int, 256 * 1024 * 1024),
+    # Compression level of compressed tick batches: zstd 1-22, or zlib 1-9 without zstandard
+    "TICK_COMPRESSION_LEVEL": ("TICK_COMPRESSION_LEVEL", int, 3),
     
     # Trading settings
-    BALANCE_START = int(os.getenv("BALANCE_START", "8736"))
-    CUSTOM_TEXT = os.getenv("CUSTOM_TEXT", "October")
-    LOCAL_TIMESHIFT = int(os.getenv("LOCAL_TIMESHIFT", "3"))
+    "BALANCE_START": ("BALANCE_START", int, 8736),
+    "CUSTOM_TEXT": ("CUSTOM_TEXT", str, "October"),
+    "LOCAL_TIMESHIFT": ("LOCAL_TIMESHIFT", int, 3),
     
     # Auto-refresh settings
-    AUTO_REFRESH_INTERVAL = int(os.getenv("AUTO_REFRESH_INTERVAL", "60"))  # seconds
-    AUTO_REFRESH_ENABLED = os.getenv("AUTO_REFRESH_ENABLED", "True").lower() == "true"
+    "AUTO_REFRESH_INTERVAL": ("AUTO_REFRESH_INTERVAL", int, 60),  # seconds
+    "AUTO_REFRESH_ENABLED": ("AUTO_REFRESH_ENABLED", _as_bool, True),
     
     # Logging settings
-    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")  # DEBUG, INFO, WARNING, ERROR, CRITICAL
-    LOG_FILE = os.getenv("LOG_FILE", None)  # Path to log file, None for console only
+    "LOG_LEVEL": ("LOG_LEVEL", str, "INFO"),  # DEBUG, INFO, WARNING, ERROR, CRITICAL
+    "LOG_FILE": ("LOG_FILE", str, None),  # Path to log file, None for console only
 
     # Credential encryption key (Fernet)
-    MT5_CRED_KEY = os.getenv("MT5_CRED_KEY", None)
+    "MT5_CRED_KEY": ("MT5_CRED_KEY", str, None),
 
     # Drawdown calculation toggle (tick data heavy)
-    DRAWNDOWN_ENABLED = os.getenv("DRAWDOWN_ENABLED", "false").lower() == "true"
+    "DRAWNDOWN_ENABLED": ("DRAWDOWN_ENABLED", _as_bool, False),
 
     # MT5 signal handlers (disable to let uvicorn handle Ctrl+C)
-    MT5_REGISTER_SIGNAL_HANDLERS = os.getenv("MT5_REGISTER_SIGNAL_HANDLERS", "false").lower() == "true"
+    "MT5_REGISTER_SIGNAL_HANDLERS": ("MT5_REGISTER_SIGNAL_HANDLERS", _as_bool, False),
+})
+
+
+class _ConfigMeta(type):
+    """Reads ``_SPEC`` settings from the environment on first access"""
+    
+    def __getattr__(cls, name: str) -> Any:
+        spec = _SPEC.get(name)
+        if spec is None:
+            raise AttributeError(f"type object '{cls.__name__}' has no attribute '{name}'")
+        env_key, coerce, default = spec
+        value = _read_env(env_key, coerce, default)
+        # Cache on the base class so subclasses and later reads skip this hook
+        setattr(Config, name, value)
+        return value
+    
+    def __getitem__(cls, name: str) -> Any:
+        """Keyed access to environment settings: ``Config["APP_NAME"]``"""
+        if name not in _SPEC:
+            raise KeyError(name)
+        return getattr(cls, name)
+
+
+class Config(metaclass=_ConfigMeta):
+    """Main configuration class"""
+    
+    # Settings live on the class; instances carry no per-instance state
+    __slots__ = ()
+    
+    def __getattr__(self, name: str) -> Any:
+        # Instance lookups do not reach the metaclass hook
+        return getattr(type(self), name)
     
     @classmethod
     def validate(cls) -> tuple[bool, list[str]]:
@@ -62,120 +171,124 @@ class Config:
             tuple: (is_valid, list_of_errors)
         """
         errors = []
+        # Read each setting once
+        local_timeshift = cls.LOCAL_TIMESHIFT
+        refresh_interval = cls.AUTO_REFRESH_INTERVAL
+        log_level = cls.LOG_LEVEL
+        database_path = cls.DATABASE_PATH
+        balance_start = cls.BALANCE_START
         
         # Validate LOCAL_TIMESHIFT
-        if not isinstance(cls.LOCAL_TIMESHIFT, int) or cls.LOCAL_TIMESHIFT < -12 or cls.LOCAL_TIMESHIFT > 14:
-            errors.append(f"LOCAL_TIMESHIFT must be an integer between -12 and 14, got {cls.LOCAL_TIMESHIFT}")
+        if not isinstance(local_timeshift, int) or not -12 <= local_timeshift <= 14:
+            errors.append(f"LOCAL_TIMESHIFT must be an integer between -12 and 14, got {local_timeshift}")
         
         # Validate AUTO_REFRESH_INTERVAL
-        if not isinstance(cls.AUTO_REFRESH_INTERVAL, int) or cls.AUTO_REFRESH_INTERVAL < 0:
-            errors.append(f"AUTO_REFRESH_INTERVAL must be a non-negative integer, got {cls.AUTO_REFRESH_INTERVAL}")
+        if not isinstance(refresh_interval, int) or refresh_interval < 0:
+            errors.append(f"AUTO_REFRESH_INTERVAL must be a non-negative integer, got {refresh_interval}")
         
         # Validate LOG_LEVEL
-        valid_log_levels = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
-        if cls.LOG_LEVEL not in valid_log_levels:
-            errors.append(f"LOG_LEVEL must be one of {valid_log_levels}, got {cls.LOG_LEVEL}")
+        if log_level not in _VALID_LOG_LEVELS:
+            errors.append(f"LOG_LEVEL must be one of {sorted(_VALID_LOG_LEVELS)}, got {log_level}")
         
         # Validate DATABASE_PATH
-        if not cls.DATABASE_PATH or not isinstance(cls.DATABASE_PATH, str):
+        if not database_path or not isinstance(database_path, str):
             errors.append("DATABASE_PATH must be a non-empty string")
         
         # Validate BALANCE_START
-        if not isinstance(cls.BALANCE_START, (int, float)) or cls.BALANCE_START < 0:
-            errors.append(f"BALANCE_START must be a non-negative number, got {cls.BALANCE_START}")
+        if not isinstance(balance_start, (int, float)) or balance_start < 0:
+            errors.append(f"BALANCE_START must be a non-negative number, got {balance_start}")
         
         return len(errors) == 0, errors
     
     # Date range presets
     @staticmethod
-    def get_date_presets() -> Dict[str, Dict[str, datetime]]:
-        """Get predefined date ranges (returns local time)"""
+    def get_date_presets() -> Dict[str, Dict[str, Any]]:
+        """
+        Get predefined date ranges (returns local time)
+        
+        Each preset holds "from"/"to" datetimes and the same bounds as Unix
+        seconds in "from_ts"/"to_ts" for integer comparisons.
+        """
         now = datetime.now()
         # Добавляем 1 день к текущему времени, чтобы наверняка захватить все сделки
         # с учетом GMT shift и возможных задержек
         end_time = now + timedelta(days=1)
+        end_ts = int(end_time.timestamp())
         
-        # datetime.now() уже возвращает локальное время, не нужно добавлять LOCAL_TIMESHIFT
-        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        start_of_week = today - timedelta(days=now.weekday())
-        start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        start_of_year = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        
+        # Period starts change once a day, computed once per date
         return {
-            "today": {
-                "from": today,
-                "to": end_time
-            },
-            "this_week": {
-                "from": start_of_week,
-                "to": end_time
-            },
-            "this_month": {
-                "from": start_of_month,
-                "to": end_time
-            },
-            "this_year": {
-                "from": start_of_year,
-                "to": end_time
+            name: {
+                "from": start,
+                "to": end_time,
+                "from_ts": start_ts,
+                "to_ts": end_ts
             }
+            for name, start, start_ts in _preset_starts(now.date())
         }
     
     # UI settings
     CHART_HEIGHT_MULTIPLIER = 30
     MIN_CHART_HEIGHT = 300
-    CHART_MARGINS = {
-        "t": 120,
-        "b": 40,
-        "l": 40,
-        "r": 20
-    }
+    CHART_MARGINS = CHART_MARGINS
     
     # Color schemes
-    COLOR_SCHEMES = {
-        "profit_loss": "RdYlGn",
-        "positive": "lime",
-        "negative_warning": "orange",
-        "negative_critical": "OrangeRed",
-        "negative_danger": "red"
-    }
+    COLOR_SCHEMES = COLOR_SCHEMES
     
     # Performance thresholds (as percentages)
-    PERFORMANCE_THRESHOLDS = {
-        "warning": -12,
-        "critical": -20
-    }
+    PERFORMANCE_THRESHOLDS = PERFORMANCE_THRESHOLDS
 
 
 # Environment-specific configurations
 class DevelopmentConfig(Config):
     """Development environment configuration"""
+    __slots__ = ()
     DEBUG = True
     LOG_LEVEL = "DEBUG"
 
 
 class ProductionConfig(Config):
     """Production environment configuration"""
+    __slots__ = ()
     DEBUG = False
     LOG_LEVEL = "INFO"
 
 
+# Environment name -> configuration class
+_CONFIG_CLASSES = {
+    "development": DevelopmentConfig,
+    "production": ProductionConfig
+}
+
+# One shared instance per configuration class
+_CONFIG_SINGLETONS: Dict[type, Config] = {}
+
+
 # Configuration factory
 def get_config(env: str = None) -> Config:
     """Get configuration based on environment"""
     if env is None:
-        env = os.getenv("ENVIRONMENT", "development")
+        env = _env.get("ENVIRONMENT", "development")
     
-    config_map = {
-        "development": DevelopmentConfig,
-        "production": ProductionConfig
-    }
+    config_cls = _CONFIG_CLASSES.get(env, DevelopmentConfig)
+    config = _CONFIG_SINGLETONS.get(config_cls)
+    if config is None:
+        config = _CONFIG_SINGLETONS.setdefault(config_cls, config_cls())
+    return config
+
+
+def _validate_on_import() -> None:
+    """Validate environment configurations once per process (MT5_SKIP_VALIDATE=1 disables)"""
+    if _env.get("MT5_SKIP_VALIDATE") == "1":
+        return
     
-    config = config_map.get(env, DevelopmentConfig)()
+    errors = []
+    for config_cls in (DevelopmentConfig, ProductionConfig):
+        _, cls_errors = config_cls.validate()
+        errors.extend(e for e in cls_errors if e not in errors)
     
-    # Validate configuration
-    is_valid, errors = config.validate()
-    if not is_valid:
+    if errors:
         error_msg = "Configuration validation failed:\n" + "\n".join(f"  - {e}" for e in errors)
         raise ValueError(error_msg)
-    
-    return config
+
+
+_validate_on_import()
@@ -3,17 +3,186 @@ Database operations for tick data storage (uncompressed)
 Stores ticks directly, one DB file per server
 """
 
+import calendar
+import logging
 import sqlite3
 import os
 import threading
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any, Tuple
 from contextlib import contextmanager
+from itertools import repeat
+import numpy as np
 from ..config.settings import Config
 from ..utils.logger import get_logger
 
 logger = get_logger()
 
+# Applied to every tick database connection. journal_mode is persistent in the
+# file, the rest are per connection.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+)
+# Ticks converted and staged per chunk in save_ticks()
+TICK_INSERT_CHUNK = 50_000
+
+# Ticks per multi-row INSERT into the stage: 5 values per tick, kept under
+# SQLite's default limit of 999 bound parameters
+STAGE_INSERT_ROWS = 999 // 5
+
+# Unix epoch as a naive datetime, for integer timestamp -> datetime conversion
+_EPOCH = datetime(1970, 1, 1)
+
+# Row layout of get_ticks_array()
+TICK_DTYPE = np.dtype([
+    ('time', '<i8'),
+    ('bid', '<f8'),
+    ('ask', '<f8'),
+    ('volume', '<i8'),
+    ('flags', '<i8'),
+])
+
+
+def _local_to_utc_timestamp(local_dt: datetime) -> int:
+    """Naive local time (UTC+LOCAL_TIMESHIFT) -> UTC Unix timestamp"""
+    return calendar.timegm(local_dt.timetuple()) - Config.LOCAL_TIMESHIFT * 3600
+
+# Ticks are clustered on their natural key: the table is the (symbol, time)
+# B-tree, with no separate rowid tree to maintain
+TICKS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS ticks
+    (
+        symbol TEXT NOT NULL,
+        time INTEGER NOT NULL,
+        bid REAL NOT NULL,
+        ask REAL NOT NULL,
+        volume INTEGER NOT NULL,
+        flags INTEGER,
+        PRIMARY KEY(symbol, time)
+    ) WITHOUT ROWID
+"""
+
+# Per-connection staging table for one save_ticks() call; keeps the first
+# tick of a batch per time, like INSERT OR IGNORE into ticks
+TICK_STAGE_TABLE_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS tick_stage
+    (
+        time INTEGER PRIMARY KEY,
+        bid REAL NOT NULL,
+        ask REAL NOT NULL,
+        volume INTEGER NOT NULL,
+        flags INTEGER
+    )
+"""
+
+RANGES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS tick_ranges
+    (
+        symbol TEXT NOT NULL,
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        first_tick_time INTEGER,
+        last_tick_time INTEGER,
+        tick_count INTEGER DEFAULT 0,
+        PRIMARY KEY(symbol, year, month)
+    )
+"""
+
+# Statements are module constants, so every call passes the same string
+# object to the connection's prepared statement cache.
+# ?1 (symbol) is bound but unused: rows go in as _extract_tick_rows() makes them
+INSERT_STAGE_SQL = """
+    INSERT OR IGNORE INTO temp.tick_stage
+    (time, bid, ask, volume, flags)
+    VALUES (?2, ?3, ?4, ?5, ?6)
+"""
+
+# STAGE_INSERT_ROWS ticks per statement: one parse and one VM run per
+# statement instead of per tick
+INSERT_STAGE_MULTI_SQL = """
+    INSERT OR IGNORE INTO temp.tick_stage
+    (time, bid, ask, volume, flags)
+    VALUES """ + ", ".join(["(?, ?, ?, ?, ?)"] * STAGE_INSERT_ROWS)
+
+# Month ranges of the staged ticks not stored yet, merged with existing ranges.
+# Months are UTC, as in RECALCULATE_RANGES_SQL
+UPSERT_RANGES_FROM_STAGE_SQL = """
+    INSERT INTO tick_ranges
+    (symbol, year, month, first_tick_time, last_tick_time, tick_count)
+    SELECT
+        :symbol,
+        CAST(strftime('%Y', datetime(s.time, 'unixepoch')) AS INTEGER) as year,
+        CAST(strftime('%m', datetime(s.time, 'unixepoch')) AS INTEGER) as month,
+        MIN(s.time),
+        MAX(s.time),
+        COUNT(*)
+    FROM temp.tick_stage AS s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM ticks WHERE ticks.symbol = :symbol AND ticks.time = s.time
+    )
+    GROUP BY year, month
+    ON CONFLICT(symbol, year, month) DO UPDATE SET
+        first_tick_time = MIN(COALESCE(NULLIF(tick_ranges.first_tick_time, 0), excluded.first_tick_time),
+                              excluded.first_tick_time),
+        last_tick_time = MAX(COALESCE(tick_ranges.last_tick_time, 0), excluded.last_tick_time),
+        tick_count = tick_ranges.tick_count + excluded.tick_count
+"""
+
+# One statement, so its rowcount is the exact number of new ticks
+INSERT_TICKS_FROM_STAGE_SQL = """
+    INSERT INTO ticks
+    (symbol, time, bid, ask, volume, flags)
+    SELECT ?, time, bid, ask, volume, flags FROM temp.tick_stage WHERE true
+    ON CONFLICT(symbol, time) DO NOTHING
+"""
+
+CLEAR_STAGE_SQL = "DELETE FROM temp.tick_stage"
+
+SELECT_TICKS_SQL = """
+    SELECT time, bid, ask, volume, flags FROM ticks
+    WHERE symbol = ? AND time BETWEEN ? AND ?
+    ORDER BY time
+"""
+
+SELECT_TICKS_ARRAY_SQL = """
+    SELECT time, bid, ask, volume, COALESCE(flags, 0) FROM ticks
+    WHERE symbol = ? AND time BETWEEN ? AND ?
+    ORDER BY time
+"""
+
+# get_tick_extreme() column -> query
+SELECT_EXTREME_SQL = {
+    "bid": "SELECT MIN(bid) FROM ticks WHERE symbol = ? AND time BETWEEN ? AND ?",
+    "ask": "SELECT MAX(ask) FROM ticks WHERE symbol = ? AND time BETWEEN ? AND ?",
+}
+
+SELECT_RANGES_SQL = """
+    SELECT year, month, first_tick_time, last_tick_time, tick_count
+    FROM tick_ranges
+    WHERE symbol = ?
+    ORDER BY year, month
+"""
+
+RECALCULATE_RANGES_SQL = """
+    INSERT INTO tick_ranges
+    (symbol, year, month, first_tick_time, last_tick_time, tick_count)
+    SELECT 
+        symbol,
+        CAST(strftime('%Y', datetime(time, 'unixepoch')) AS INTEGER) as year,
+        CAST(strftime('%m', datetime(time, 'unixepoch')) AS INTEGER) as month,
+        MIN(time) as first_tick_time,
+        MAX(time) as last_tick_time,
+        COUNT(*) as tick_count
+    FROM ticks
+    {where}
+    GROUP BY symbol, year, month
+"""
+RECALCULATE_ALL_RANGES_SQL = RECALCULATE_RANGES_SQL.format(where="")
+RECALCULATE_SYMBOL_RANGES_SQL = RECALCULATE_RANGES_SQL.format(where="WHERE symbol = ?")
+
 
 class TickDatabaseManager:
     """Manages uncompressed tick data database operations"""
@@ -24,7 +193,14 @@ class TickDatabaseManager:
         os.makedirs(self.data_dir, exist_ok=True)
         # Lock for thread-safe database operations
         self._locks = {}  # {server: threading.Lock()}
-        self._locks_lock = threading.Lock()  # Lock for accessing _locks dict
+        self._locks_lock = threading.Lock()  # Lock for accessing _locks, _conns and _initialized
+        # Long-lived connections, one per server and thread
+        self._conns: Dict[Tuple[str, int], sqlite3.Connection] = {}
+        # Servers whose schema has been created in this process
+        self._initialized: set = set()
+        # tick_ranges rows per (server, symbol), dropped on every write to the server
+        self._ranges_cache: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self._ranges_version: Dict[str, int] = {}  # {server: writes seen}
     
     def get_db_path(self, server: str) -> str:
         """Get database file path for a server"""
@@ -39,73 +215,217 @@ class TickDatabaseManager:
                 self._locks[server] = threading.Lock()
             return self._locks[server]
     
+    def _connect(self, server: str, timeout: float) -> sqlite3.Connection:
+        """Open a connection to a server DB and apply connection pragmas"""
+        # check_same_thread=False only so close() can run from any thread;
+        # each connection is used by the thread that opened it.
+        # isolation_level=None: writers open transactions explicitly with BEGIN IMMEDIATE
+        conn = sqlite3.connect(
+            self.get_db_path(server), timeout=timeout, isolation_level=None, check_same_thread=False
+        )
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        conn.execute(f"PRAGMA mmap_size={int(Config.TICK_DB_MMAP_SIZE)}")
+        conn.execute(TICK_STAGE_TABLE_SQL)
+        return conn
+    
     @contextmanager
     def get_connection(self, server: str, timeout: float = 30.0):
-        """Context manager for database connections with timeout"""
-        db_path = self.get_db_path(server)
-        conn = sqlite3.connect(db_path, timeout=timeout)
+        """Context manager for the calling thread's cached connection to a server DB"""
+        key = (server, threading.get_ident())
+        conn = self._conns.get(key)
+        if conn is None:
+            conn = self._connect(server, timeout)
+            with self._locks_lock:
+                self._conns[key] = conn
         try:
             yield conn
         finally:
+            # Connection outlives the block: never leave a transaction open on it
+            if conn.in_transaction:
+                conn.rollback()
+    
+    def _invalidate_ranges(self, server: str):
+        """Forget cached ranges of a server after its tick_ranges changed"""
+        with self._locks_lock:
+            self._ranges_version[server] = self._ranges_version.get(server, 0) + 1
+            for key in [key for key in self._ranges_cache if key[0] == server]:
+                del self._ranges_cache[key]
+    
+    def close(self):
+        """Close all cached connections"""
+        with self._locks_lock:
+            conns = list(self._conns.values())
+            self._conns.clear()
+            self._initialized.clear()
+            self._ranges_cache.clear()
+        for conn in conns:
             conn.close()
     
     def init_database(self, server: str):
         """Initialize tick database tables for a server"""
+        if server in self._initialized:
+            return
+        
         with self.get_connection(server) as conn:
             cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
             
-            # Table for storing tick data
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS ticks
-                (
-                    symbol TEXT NOT NULL,
-                    time INTEGER NOT NULL,
-                    bid REAL NOT NULL,
-                    ask REAL NOT NULL,
-                    volume INTEGER NOT NULL,
-                    flags INTEGER,
-                    PRIMARY KEY(symbol, time)
-                )
-            """)
+            # Databases created before WITHOUT ROWID: move ticks into the new layout
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='ticks'")
+            existing = cursor.fetchone()
+            if existing and 'WITHOUT ROWID' not in existing[0].upper():
+                logger.info(f"init_database: Перенос тиков {server} в таблицу WITHOUT ROWID")
+                cursor.execute("ALTER TABLE ticks RENAME TO ticks_rowid")
+                cursor.execute(TICKS_TABLE_SQL)
+                cursor.execute("""
+                    INSERT INTO ticks (symbol, time, bid, ask, volume, flags)
+                    SELECT symbol, time, bid, ask, volume, flags FROM ticks_rowid
+                """)
+                cursor.execute("DROP TABLE ticks_rowid")
             
-            # Index for faster queries
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_ticks_symbol_time
-                ON ticks(symbol, time)
-            """)
+            # Table for storing tick data
+            cursor.execute(TICKS_TABLE_SQL)
             
             # Table for tracking available data ranges per symbol
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS tick_ranges
-                (
-                    symbol TEXT NOT NULL,
-                    year INTEGER NOT NULL,
-                    month INTEGER NOT NULL,
-                    first_tick_time INTEGER,
-                    last_tick_time INTEGER,
-                    tick_count INTEGER DEFAULT 0,
-                    PRIMARY KEY(symbol, year, month)
-                )
-            """)
+            cursor.execute(RANGES_TABLE_SQL)
             
-            # Index for range queries
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_ranges_symbol
-                ON tick_ranges(symbol, year, month)
-            """)
+            # Primary keys already index (symbol, time) and (symbol, year, month);
+            # drop the duplicate indexes older databases were created with
+            cursor.execute("DROP INDEX IF EXISTS idx_ticks_symbol_time")
+            cursor.execute("DROP INDEX IF EXISTS idx_ranges_symbol")
             
             conn.commit()
+        
+        with self._locks_lock:
+            self._initialized.add(server)
+    
+    @staticmethod
+    def _extract_tick_rows(symbol: str, ticks: Any) -> List[Tuple]:
+        """
+        Convert ticks to (symbol, time, bid, ask, volume, flags) rows
+        
+        MT5 structured arrays are converted column by column in C. Lists
+        are converted in one comprehension chosen by the shape of the first
+        tick; mixed or malformed lists fall back to per-tick field access.
+        """
+        names = getattr(getattr(ticks, 'dtype', None), 'names', None)
+        if names:
+            times = ticks['time'].tolist()
+            flags = ticks['flags'].tolist() if 'flags' in names else [0] * len(times)
+            return list(zip(
+                repeat(symbol),
+                times,
+                ticks['bid'].tolist(),
+                ticks['ask'].tolist(),
+                ticks['volume'].tolist(),
+                flags
+            ))
+        
+        rows = TickDatabaseManager._extract_uniform_rows(symbol, ticks)
+        if rows is not None:
+            return rows
+        
+        tick_data = []
+        for tick in ticks:
+            # Extract tick data
+            try:
+                if hasattr(tick, 'dtype') and tick.dtype.names:
+                    tick_time = int(tick['time'])
+                    tick_bid = float(tick['bid'])
+                    tick_ask = float(tick['ask'])
+                    tick_volume = int(tick['volume'])
+                    tick_flags = int(tick['flags'] if 'flags' in tick.dtype.names else 0)
+                elif isinstance(tick, dict):
+                    tick_time = int(tick['time'])
+                    tick_bid = float(tick['bid'])
+                    tick_ask = float(tick['ask'])
+                    tick_volume = int(tick.get('volume', 0))
+                    tick_flags = int(tick.get('flags', 0))
+                elif hasattr(tick, 'time'):
+                    tick_time = int(tick.time)
+                    tick_bid = float(tick.bid)
+                    tick_ask = float(tick.ask)
+                    tick_volume = int(tick.volume)
+                    tick_flags = int(getattr(tick, 'flags', 0))
+                else:
+                    tick_time = int(tick[0])
+                    tick_bid = float(tick[1])
+                    tick_ask = float(tick[2])
+                    tick_volume = int(tick[3])
+                    tick_flags = int(tick[4] if len(tick) > 4 else 0)
+            except (AttributeError, KeyError, IndexError, TypeError) as e:
+                print(f"⚠️ Ошибка доступа к полям тика: {e}, тип: {type(tick)}")
+                continue
+            
+            tick_data.append((symbol, tick_time, tick_bid, tick_ask, tick_volume, tick_flags))
+        return tick_data
+    
+    @staticmethod
+    def _extract_uniform_rows(symbol: str, ticks: Any) -> Optional[List[Tuple]]:
+        """
+        Rows for a list of ticks that all have the shape of the first one
+        
+        Returns None when the list is empty, mixed or has a malformed tick;
+        the caller then converts tick by tick and skips bad ones.
+        """
+        first = next(iter(ticks), None)
+        try:
+            if first is None or hasattr(first, 'dtype'):
+                return None
+            if isinstance(first, dict):
+                return [
+                    (symbol, int(t['time']), float(t['bid']), float(t['ask']),
+                     int(t.get('volume', 0)), int(t.get('flags', 0)))
+                    for t in ticks
+                ]
+            if hasattr(first, 'time'):
+                # MT5 Tick namedtuples from copy_ticks_from/copy_ticks_range
+                if hasattr(first, 'flags'):
+                    return [
+                        (symbol, int(t.time), float(t.bid), float(t.ask), int(t.volume), int(t.flags))
+                        for t in ticks
+                    ]
+                return [
+                    (symbol, int(t.time), float(t.bid), float(t.ask), int(t.volume), 0)
+                    for t in ticks
+                ]
+            if len(first) > 4:
+                return [
+                    (symbol, int(t[0]), float(t[1]), float(t[2]), int(t[3]), int(t[4]))
+                    for t in ticks
+                ]
+            return [
+                (symbol, int(t[0]), float(t[1]), float(t[2]), int(t[3]), 0)
+                for t in ticks
+            ]
+        except (AttributeError, KeyError, IndexError, TypeError):
+            return None
+    
+    @staticmethod
+    def _stage_rows(cursor: sqlite3.Cursor, tick_data: List[Tuple]) -> None:
+        """Insert tick rows into the stage, STAGE_INSERT_ROWS ticks per statement"""
+        full = len(tick_data) - len(tick_data) % STAGE_INSERT_ROWS
+        for start in range(0, full, STAGE_INSERT_ROWS):
+            cursor.execute(INSERT_STAGE_MULTI_SQL, [
+                value
+                for row in tick_data[start:start + STAGE_INSERT_ROWS]
+                for value in row[1:]
+            ])
+        # Remainder shorter than one statement
+        cursor.executemany(INSERT_STAGE_SQL, tick_data[full:])
     
     def save_ticks(self, server: str, symbol: str, ticks: List[Any]):
         """
         Save ticks to database
-        ticks: list of MT5 tick objects (with time, bid, ask, volume, flags attributes)
+        ticks: MT5 structured tick array, or list of tick objects/dicts/tuples
+        (with time, bid, ask, volume, flags fields)
         """
-        if not ticks:
+        if ticks is None or len(ticks) == 0:
             logger.debug(f"save_ticks: Пустой список тиков для {symbol} на {server}")
             return
         
-        logger.info(f"save_ticks: Начинаю сохранение {len(ticks)} тиков для {symbol} на {server}")
+        logger.debug(f"save_ticks: Начинаю сохранение {len(ticks)} тиков для {symbol} на {server}")
         
         # Initialize database if needed
         self.init_database(server)
@@ -116,138 +436,34 @@ class TickDatabaseManager:
             with self.get_connection(server) as conn:
                 cursor = conn.cursor()
                 
-                # Prepare data for bulk insert
-                tick_data = []
-                months_data = {}  # Track data per month for ranges
-                
-                for tick in ticks:
-                    # Extract tick data
-                    try:
-                        if hasattr(tick, 'dtype') and tick.dtype.names:
-                            tick_time = int(tick['time'])
-                            tick_bid = float(tick['bid'])
-                            tick_ask = float(tick['ask'])
-                            tick_volume = int(tick['volume'])
-                            tick_flags = int(tick['flags'] if 'flags' in tick.dtype.names else 0)
-                        elif isinstance(tick, dict):
-                            tick_time = int(tick['time'])
-                            tick_bid = float(tick['bid'])
-                            tick_ask = float(tick['ask'])
-                            tick_volume = int(tick.get('volume', 0))
-                            tick_flags = int(tick.get('flags', 0))
-                        elif hasattr(tick, 'time'):
-                            tick_time = int(tick.time)
-                            tick_bid = float(tick.bid)
-                            tick_ask = float(tick.ask)
-                            tick_volume = int(tick.volume)
-                            tick_flags = int(getattr(tick, 'flags', 0))
-                        else:
-                            tick_time = int(tick[0])
-                            tick_bid = float(tick[1])
-                            tick_ask = float(tick[2])
-                            tick_volume = int(tick[3])
-                            tick_flags = int(tick[4] if len(tick) > 4 else 0)
-                    except (AttributeError, KeyError, IndexError, TypeError) as e:
-                        print(f"⚠️ Ошибка доступа к полям тика: {e}, тип: {type(tick)}")
-                        continue
-                    
-                    tick_dt = datetime.fromtimestamp(tick_time)
-                    year = tick_dt.year
-                    month = tick_dt.month
-                    
-                    # Store tick data
-                    tick_data.append((
-                        symbol,
-                        tick_time,
-                        tick_bid,
-                        tick_ask,
-                        tick_volume,
-                        tick_flags
-                    ))
-                    
-                    # Track month ranges
-                    month_key = (year, month)
-                    if month_key not in months_data:
-                        months_data[month_key] = {
-                            'first_time': tick_time,
-                            'last_time': tick_time,
-                            'count': 0
-                        }
-                    else:
-                        months_data[month_key]['first_time'] = min(
-                            months_data[month_key]['first_time'], tick_time
-                        )
-                        months_data[month_key]['last_time'] = max(
-                            months_data[month_key]['last_time'], tick_time
-                        )
-                    months_data[month_key]['count'] += 1
+                # One write transaction for ticks and ranges; the write lock is
+                # taken up front, a failure is rolled back by get_connection()
+                cursor.execute("BEGIN IMMEDIATE")
                 
-                # Логируем максимальные времена для каждого месяца для диагностики
-                for (year, month), data in months_data.items():
-                    from datetime import timezone as tz
-                    first_time_local = datetime.fromtimestamp(data['first_time'], tz=tz.utc).replace(tzinfo=None) + timedelta(hours=Config.LOCAL_TIMESHIFT)
-                    last_time_local = datetime.fromtimestamp(data['last_time'], tz=tz.utc).replace(tzinfo=None) + timedelta(hours=Config.LOCAL_TIMESHIFT)
-                    logger.info(f"save_ticks: Месяц {year}-{month:02d}: {data['count']} тиков, "
-                               f"период {first_time_local} (UTC: {data['first_time']}) - "
-                               f"{last_time_local} (UTC: {data['last_time']})")
+                # Stage the batch in chunks, so only one chunk of row tuples
+                # is alive at a time
+                cursor.execute(CLEAR_STAGE_SQL)
+                saved_count = 0
+                for start in range(0, len(ticks), TICK_INSERT_CHUNK):
+                    tick_data = self._extract_tick_rows(symbol, ticks[start:start + TICK_INSERT_CHUNK])
+                    self._stage_rows(cursor, tick_data)
+                    saved_count += len(tick_data)
                 
-                logger.info(f"save_ticks: Подготовлено {len(tick_data)} тиков для сохранения, месяцы: {list(months_data.keys())}")
+                logger.debug(f"save_ticks: Подготовлено {saved_count} тиков для сохранения")
                 
-                # Bulk insert ticks (ignore duplicates)
-                cursor.executemany("""
-                    INSERT OR IGNORE INTO ticks 
-                    (symbol, time, bid, ask, volume, flags)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, tick_data)
+                # Update month ranges from the staged ticks not stored yet
+                cursor.execute(UPSERT_RANGES_FROM_STAGE_SQL, {"symbol": symbol})
+                months_count = cursor.rowcount
                 
-                # Note: executemany doesn't return rowcount reliably, so we log what we tried to insert
-                logger.info(f"save_ticks: Выполнена вставка {len(tick_data)} тиков в БД")
-                
-                # Update month ranges
-                for (year, month), data in months_data.items():
-                    cursor.execute("""
-                        SELECT first_tick_time, last_tick_time, tick_count FROM tick_ranges
-                        WHERE symbol=? AND year=? AND month=?
-                    """, (symbol, year, month))
-                    existing = cursor.fetchone()
-                    
-                    if existing:
-                        existing_first = existing[0]
-                        existing_last = existing[1]
-                        existing_count = existing[2]
-                        
-                        final_first = min(existing_first, data['first_time']) if existing_first else data['first_time']
-                        final_last = max(existing_last, data['last_time']) if existing_last else data['last_time']
-                        final_count = existing_count + data['count']
-                        
-                        # Конвертируем для логирования в локальное время
-                        from datetime import timezone as tz
-                        existing_last_local = datetime.fromtimestamp(existing_last, tz=tz.utc).replace(tzinfo=None) + timedelta(hours=Config.LOCAL_TIMESHIFT)
-                        final_last_local = datetime.fromtimestamp(final_last, tz=tz.utc).replace(tzinfo=None) + timedelta(hours=Config.LOCAL_TIMESHIFT)
-                        logger.info(f"save_ticks: Обновление диапазона для {symbol} {year}-{month:02d}: "
-                                   f"было {existing_count} тиков до {existing_last_local} (UTC timestamp: {existing_last}), "
-                                   f"стало {final_count} тиков до {final_last_local} (UTC timestamp: {final_last})")
-                    else:
-                        final_first = data['first_time']
-                        final_last = data['last_time']
-                        final_count = data['count']
-                        
-                        # Конвертируем для логирования в локальное время
-                        from datetime import timezone as tz
-                        final_first_local = datetime.fromtimestamp(final_first, tz=tz.utc).replace(tzinfo=None) + timedelta(hours=Config.LOCAL_TIMESHIFT)
-                        final_last_local = datetime.fromtimestamp(final_last, tz=tz.utc).replace(tzinfo=None) + timedelta(hours=Config.LOCAL_TIMESHIFT)
-                        logger.info(f"save_ticks: Создание нового диапазона для {symbol} {year}-{month:02d}: "
-                                  f"{final_count} тиков, период {final_first_local} (UTC timestamp: {final_first}) - "
-                                  f"{final_last_local} (UTC timestamp: {final_last})")
-                    
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO tick_ranges
-                        (symbol, year, month, first_tick_time, last_tick_time, tick_count)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """, (symbol, year, month, final_first, final_last, final_count))
+                # Move staged ticks into the table (ignore duplicates)
+                cursor.execute(INSERT_TICKS_FROM_STAGE_SQL, (symbol,))
+                inserted_count = cursor.rowcount
+                cursor.execute(CLEAR_STAGE_SQL)
                 
                 conn.commit()
-                logger.info(f"save_ticks: Успешно сохранено {len(tick_data)} тиков для {symbol} на {server}, обновлено диапазонов: {len(months_data)}")
+                self._invalidate_ranges(server)
+                logger.info(f"save_ticks: Успешно сохранено {inserted_count} новых тиков из {saved_count} для {symbol} на {server} "
+                            f"(дубликатов: {saved_count - inserted_count}), обновлено диапазонов: {months_count}")
     
     def get_ticks(self, server: str, symbol: str, 
                   from_time: datetime, to_time: datetime) -> List[Dict[str, Any]]:
@@ -259,35 +475,15 @@ class TickDatabaseManager:
             to_time: End time in LOCAL time (naive datetime, represents UTC+LOCAL_TIMESHIFT)
         
         Note: datetime objects represent local time (UTC+LOCAL_TIMESHIFT).
-        Ticks in DB are stored with UTC timestamps.
-        To convert local time to UTC timestamp:
-        - Create UTC datetime by subtracting LOCAL_TIMESHIFT from local time
-        - Use timezone.utc to ensure correct conversion
+        Ticks in DB are stored with UTC timestamps; _local_to_utc_timestamp()
+        reads the local wall time as UTC and subtracts LOCAL_TIMESHIFT.
+        For large periods prefer get_ticks_array().
         """
         self.init_database(server)
         
-        from datetime import timezone
-        
-        # from_time represents local time (UTC+LOCAL_TIMESHIFT), naive datetime
-        # To get UTC datetime: subtract LOCAL_TIMESHIFT from local time
-        # Then mark it as UTC timezone for correct timestamp conversion
-        from_time_utc_naive = from_time - timedelta(hours=Config.LOCAL_TIMESHIFT)
-        to_time_utc_naive = to_time - timedelta(hours=Config.LOCAL_TIMESHIFT)
-        
-        # Now mark as UTC timezone for correct timestamp conversion
-        from_time_utc = from_time_utc_naive.replace(tzinfo=timezone.utc)
-        to_time_utc = to_time_utc_naive.replace(tzinfo=timezone.utc)
-        
-        from_timestamp = int(from_time_utc.timestamp())
-        to_timestamp = int(to_time_utc.timestamp())
-        
         with self.get_connection(server) as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT time, bid, ask, volume, flags FROM ticks
-                WHERE symbol = ? AND time BETWEEN ? AND ?
-                ORDER BY time
-            """, (symbol, from_timestamp, to_timestamp))
+            cursor.execute(SELECT_TICKS_SQL, (symbol, _local_to_utc_timestamp(from_time), _local_to_utc_timestamp(to_time)))
             
             results = cursor.fetchall()
             return [
@@ -301,21 +497,61 @@ class TickDatabaseManager:
                 for row in results
             ]
     
+    def get_ticks_array(self, server: str, symbol: str,
+                        from_time: datetime, to_time: datetime) -> np.ndarray:
+        """
+        Get ticks as a structured array (TICK_DTYPE), sorted by time
+        
+        Same rows as get_ticks() without building a dict per tick;
+        from_time/to_time are LOCAL time. Missing flags are returned as 0.
+        """
+        self.init_database(server)
+        
+        with self.get_connection(server) as conn:
+            cursor = conn.execute(SELECT_TICKS_ARRAY_SQL, (symbol, _local_to_utc_timestamp(from_time), _local_to_utc_timestamp(to_time)))
+            return np.fromiter(cursor, dtype=TICK_DTYPE)
+    
+    def get_tick_extreme(self, server: str, symbol: str,
+                         from_time: datetime, to_time: datetime, column: str) -> Optional[float]:
+        """
+        Get lowest bid (column='bid') or highest ask (column='ask') in the period
+        
+        The reduction runs inside SQLite, only one value is returned.
+        from_time/to_time are LOCAL time, same as in get_ticks().
+        """
+        query = SELECT_EXTREME_SQL.get(column)
+        if query is None:
+            raise ValueError(f"column must be 'bid' or 'ask', got {column!r}")
+        
+        self.init_database(server)
+        
+        with self.get_connection(server) as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, (symbol, _local_to_utc_timestamp(from_time), _local_to_utc_timestamp(to_time)))
+            return cursor.fetchone()[0]
+    
     def get_available_ranges(self, server: str, symbol: str) -> List[Dict[str, Any]]:
-        """Get available data ranges for symbol"""
+        """
+        Get available data ranges for symbol
+        
+        Results are cached until the next write to the server;
+        the returned list is shared and must not be modified.
+        """
+        key = (server, symbol)
+        with self._locks_lock:
+            cached = self._ranges_cache.get(key)
+            version = self._ranges_version.get(server, 0)
+        if cached is not None:
+            return cached
+        
         self.init_database(server)
         
         with self.get_connection(server) as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT year, month, first_tick_time, last_tick_time, tick_count
-                FROM tick_ranges
-                WHERE symbol = ?
-                ORDER BY year, month
-            """, (symbol,))
+            cursor.execute(SELECT_RANGES_SQL, (symbol,))
             
             results = cursor.fetchall()
-            return [
+            ranges = [
                 {
                     "year": row[0],
                     "month": row[1],
@@ -325,6 +561,12 @@ class TickDatabaseManager:
                 }
                 for row in results
             ]
+        
+        # Don't cache a result read before a concurrent write was committed
+        with self._locks_lock:
+            if self._ranges_version.get(server, 0) == version:
+                self._ranges_cache[key] = ranges
+        return ranges
     
     def get_missing_months(self, server: str, symbol: str, 
                           from_date: datetime, to_date: datetime) -> List[Tuple[int, int]]:
@@ -336,180 +578,142 @@ class TickDatabaseManager:
         
         logger.debug(f"get_missing_months: Проверка для {symbol} на {server}, период {from_date} - {to_date}")
         
-        # Get all months in the range
-        required_months = set()
-        current = datetime(from_date.year, from_date.month, 1)
-        end = datetime(to_date.year, to_date.month, 1)
-        
-        while current <= end:
-            required_months.add((current.year, current.month))
-            if current.month == 12:
-                current = datetime(current.year + 1, 1, 1)
-            else:
-                current = datetime(current.year, current.month + 1, 1)
+        # Get all months in the range, as month indexes (year * 12 + month - 1)
+        first_index = from_date.year * 12 + from_date.month - 1
+        last_index = to_date.year * 12 + to_date.month - 1
+        required_months = [(index // 12, index % 12 + 1) for index in range(first_index, last_index + 1)]
         
-        logger.debug(f"get_missing_months: Требуемые месяцы: {sorted(required_months)}")
+        logger.debug(f"get_missing_months: Требуемые месяцы: {required_months}")
         
         # Get available months from DB with their last tick times
-        available_ranges = self.get_available_ranges(server, symbol)
         available_months = {}
-        for r in available_ranges:
-            key = (r["year"], r["month"])
-            if key not in available_months:
-                available_months[key] = r
+        for r in self.get_available_ranges(server, symbol):
+            available_months.setdefault((r["year"], r["month"]), r)
         
         logger.debug(f"get_missing_months: Доступные месяцы в БД: {list(available_months.keys())}")
         
+        # Local time (UTC+LOCAL_TIMESHIFT) <-> UTC timestamp is integer math;
+        # datetimes are only built for log messages
+        shift_seconds = Config.LOCAL_TIMESHIFT * 3600
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        
+        def utc_timestamp_to_local(timestamp: int) -> datetime:
+            return _EPOCH + timedelta(seconds=timestamp + shift_seconds)
+        
+        def month_end_utc_timestamp(month_index: int) -> int:
+            # Last second of the month in local time, as UTC timestamp
+            next_year, next_month_index = divmod(month_index + 1, 12)
+            return calendar.timegm((next_year, next_month_index + 1, 1, 0, 0, 0)) - 1 - shift_seconds
+        
+        now = datetime.now()
+        current_index = now.year * 12 + now.month - 1
+        
+        # Current month: we don't load current day ticks, so we only need data up to yesterday
+        yesterday_end_utc_timestamp = calendar.timegm((now.year, now.month, now.day, 0, 0, 0)) - 1 - shift_seconds
+        to_date_utc_timestamp = _local_to_utc_timestamp(to_date)
+        
+        # Допуск: если разница менее 5 минут, считаем что данных достаточно
+        # (MT5 может не вернуть тики точно до указанного времени)
+        tolerance_seconds = 5 * 60  # 5 минут
+        # Для исторических месяцев используем более мягкий допуск:
+        # - Если последний тик в пределах 3 дней от конца месяца, считаем что данных достаточно
+        #   (учитываем выходные и праздники, когда торговли нет)
+        # - Или если запрашиваемый to_date не выходит за пределы имеющихся данных более чем на 1 день
+        tolerance_for_month_end = 3 * 24 * 3600  # 3 дня допуск для конца месяца (выходные/праздники)
+        tolerance_for_to_date = 1 * 24 * 3600  # 1 день допуск для запрашиваемой даты
+        
         # Check each required month
         missing = []
-        now = datetime.now()
         
         for year, month in required_months:
-            month_key = (year, month)
+            range_info = available_months.get((year, month))
             
-            if month_key not in available_months:
+            if range_info is None:
                 # Month completely missing
                 logger.debug(f"get_missing_months: Месяц {year}-{month:02d} полностью отсутствует")
                 missing.append((year, month))
-            else:
-                # Month exists, but check if we need more data
-                range_info = available_months[month_key]
-                last_tick_time = range_info.get('last_tick_time')
+                continue
+            
+            # Month exists, but check if we need more data
+            last_tick_time = range_info.get('last_tick_time')
+            if not last_tick_time:
+                # Month exists but has no data
+                logger.warning(f"get_missing_months: Месяц {year}-{month:02d} существует в БД, но не имеет данных")
+                missing.append((year, month))
+                continue
+            
+            month_index = year * 12 + month - 1
+            
+            if debug_enabled:
+                logger.debug(f"get_missing_months: Месяц {year}-{month:02d} существует, "
+                            f"последний тик UTC timestamp: {last_tick_time}, "
+                            f"локальное время: {utc_timestamp_to_local(last_tick_time)}, "
+                            f"запрашивается до: {to_date}")
+            
+            if month_index == current_index:
+                # Сравниваем UTC timestamps напрямую, чтобы избежать ошибок конвертации
+                time_diff_seconds = last_tick_time - yesterday_end_utc_timestamp
                 
-                if last_tick_time:
-                    # UTC timestamp нужно конвертировать правильно: fromtimestamp с timezone.utc
-                    from datetime import timezone as tz
-                    last_tick_dt_utc = datetime.fromtimestamp(last_tick_time, tz=tz.utc)
-                    # Convert to local time for comparison (UTC+LOCAL_TIMESHIFT)
-                    last_tick_dt_local = last_tick_dt_utc.replace(tzinfo=None) + timedelta(hours=Config.LOCAL_TIMESHIFT)
-                    
-                    logger.debug(f"get_missing_months: Месяц {year}-{month:02d} существует, "
-                                f"последний тик UTC timestamp: {last_tick_time}, "
-                                f"UTC datetime: {last_tick_dt_utc.replace(tzinfo=None)}, "
-                                f"локальное время: {last_tick_dt_local}, "
-                                f"запрашивается до: {to_date}")
-                    
-                    # If we need data beyond what we have
-                    # For current or future months, always check if we need update
-                    if (year == now.year and month == now.month):
-                        # Current month - check if we have data up to end of previous day
-                        # We don't load current day ticks, so we only need data up to yesterday
-                        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-                        yesterday_end = today_start - timedelta(seconds=1)
-                        
-                        # Конвертируем yesterday_end в UTC timestamp для прямого сравнения с last_tick_time (UTC timestamp)
-                        # yesterday_end - локальное время (UTC+LOCAL_TIMESHIFT)
-                        # Чтобы получить UTC timestamp: вычитаем LOCAL_TIMESHIFT и конвертируем
-                        yesterday_end_utc_naive = yesterday_end - timedelta(hours=Config.LOCAL_TIMESHIFT)
-                        yesterday_end_utc = yesterday_end_utc_naive.replace(tzinfo=tz.utc)
-                        yesterday_end_utc_timestamp = int(yesterday_end_utc.timestamp())
-                        
-                        # Сравниваем UTC timestamps напрямую, чтобы избежать ошибок конвертации
-                        time_diff_seconds = last_tick_time - yesterday_end_utc_timestamp
-                        # Допуск: если разница менее 5 минут, считаем что данных достаточно
-                        # (MT5 может не вернуть тики точно до указанного времени)
-                        tolerance_seconds = 5 * 60  # 5 минут
-                        
-                        logger.debug(f"get_missing_months: Сравнение для текущего месяца {year}-{month:02d} (UTC timestamps): "
-                                    f"последний тик UTC timestamp: {last_tick_time} ({last_tick_dt_local} локальное), "
-                                    f"конец предыдущего дня UTC timestamp: {yesterday_end_utc_timestamp} ({yesterday_end} локальное), "
-                                    f"разница: {time_diff_seconds} секунд ({time_diff_seconds/3600:.2f} часов), "
-                                    f"допуск: {tolerance_seconds} секунд")
-                        
-                        # Если последний тик >= конца предыдущего дня в UTC (с учетом допуска), данных достаточно
-                        if last_tick_time >= (yesterday_end_utc_timestamp - tolerance_seconds):
-                            # We have data up to end of previous day (within tolerance), no need to update
-                            if time_diff_seconds >= 0:
-                                logger.debug(f"get_missing_months: Текущий месяц {year}-{month:02d} имеет данные до конца предыдущего дня "
-                                            f"(последний тик UTC: {last_tick_time}, локальное: {last_tick_dt_local}, "
-                                            f"требуется до UTC: {yesterday_end_utc_timestamp}, локальное: {yesterday_end})")
-                            else:
-                                logger.debug(f"get_missing_months: Текущий месяц {year}-{month:02d} имеет данные достаточно близко к концу предыдущего дня "
-                                            f"(разница: {abs(time_diff_seconds)} секунд, в пределах допуска {tolerance_seconds} секунд)")
-                            # Don't add to missing - we don't load current day ticks
-                        else:
-                            # We need data up to end of previous day
-                            logger.info(f"get_missing_months: Текущий месяц {year}-{month:02d} нуждается в обновлении: "
-                                      f"последний тик UTC timestamp: {last_tick_time} ({last_tick_dt_local} локальное), "
-                                      f"требуется до UTC timestamp: {yesterday_end_utc_timestamp} ({yesterday_end} локальное), "
-                                      f"не хватает: {abs(time_diff_seconds)} секунд ({abs(time_diff_seconds)/3600:.2f} часов), "
-                                      f"превышает допуск {tolerance_seconds} секунд")
-                            missing.append((year, month))
-                    elif (year > now.year) or (year == now.year and month > now.month):
-                        # Future month - should not happen, but include it
-                        logger.warning(f"get_missing_months: Будущий месяц {year}-{month:02d} помечен как недостающий")
-                        missing.append((year, month))
-                    # For past months, check if we have sufficient data
-                    # For historical months, we need to check if the last tick is reasonably close to the end of the month
-                    # OR if the requested to_date is beyond what we have
-                    else:
-                        # Convert to_date to UTC timestamp for comparison
-                        to_date_utc_naive = to_date - timedelta(hours=Config.LOCAL_TIMESHIFT)
-                        to_date_utc = to_date_utc_naive.replace(tzinfo=tz.utc)
-                        to_date_utc_timestamp = int(to_date_utc.timestamp())
-                        
-                        # Calculate end of month in local time
-                        if month == 12:
-                            month_end_local = datetime(year + 1, 1, 1, 0, 0, 0) - timedelta(seconds=1)
-                        else:
-                            month_end_local = datetime(year, month + 1, 1, 0, 0, 0) - timedelta(seconds=1)
-                        
-                        # Convert month end to UTC timestamp for comparison
-                        month_end_utc_naive = month_end_local - timedelta(hours=Config.LOCAL_TIMESHIFT)
-                        month_end_utc = month_end_utc_naive.replace(tzinfo=tz.utc)
-                        month_end_utc_timestamp = int(month_end_utc.timestamp())
-                        
-                        # Compare UTC timestamps directly
-                        time_diff_from_month_end = last_tick_time - month_end_utc_timestamp
-                        time_diff_from_to_date = last_tick_time - to_date_utc_timestamp
-                        
-                        # Для исторических месяцев используем более мягкий допуск:
-                        # - Если последний тик в пределах 3 дней от конца месяца, считаем что данных достаточно
-                        #   (учитываем выходные и праздники, когда торговли нет)
-                        # - Или если запрашиваемый to_date не выходит за пределы имеющихся данных более чем на 1 день
-                        tolerance_for_month_end = 3 * 24 * 3600  # 3 дня допуск для конца месяца (выходные/праздники)
-                        tolerance_for_to_date = 1 * 24 * 3600  # 1 день допуск для запрашиваемой даты
-                        
-                        logger.debug(f"get_missing_months: Проверка исторического месяца {year}-{month:02d}: "
-                                   f"последний тик UTC timestamp: {last_tick_time} ({last_tick_dt_local} локальное), "
-                                   f"конец месяца UTC timestamp: {month_end_utc_timestamp} ({month_end_local} локальное), "
-                                   f"запрашивается до UTC timestamp: {to_date_utc_timestamp} ({to_date} локальное), "
-                                   f"разница от конца месяца: {time_diff_from_month_end} секунд ({time_diff_from_month_end/3600:.2f} часов), "
-                                   f"разница от запрашиваемой даты: {time_diff_from_to_date} секунд ({time_diff_from_to_date/3600:.2f} часов)")
-                        
-                        # Проверяем, нужны ли данные:
-                        # 1. Если последний тик значительно раньше конца месяца (более 3 дней) И
-                        # 2. Запрашиваемая дата выходит за пределы имеющихся данных (более 1 дня)
-                        needs_update = False
-                        if time_diff_from_month_end < -tolerance_for_month_end:
-                            # Последний тик более чем на 3 дня раньше конца месяца
-                            if time_diff_from_to_date < -tolerance_for_to_date:
-                                # И запрашиваемая дата выходит за пределы имеющихся данных более чем на 1 день
-                                needs_update = True
-                                logger.info(f"get_missing_months: Исторический месяц {year}-{month:02d} нуждается в обновлении: "
-                                          f"последний тик {last_tick_dt_local} (UTC: {last_tick_time}), "
-                                          f"конец месяца {month_end_local} (UTC: {month_end_utc_timestamp}), "
-                                          f"запрашивается до {to_date} (UTC: {to_date_utc_timestamp}), "
-                                          f"не хватает от конца месяца: {abs(time_diff_from_month_end)} секунд ({abs(time_diff_from_month_end)/3600:.2f} часов), "
-                                          f"не хватает от запрашиваемой даты: {abs(time_diff_from_to_date)} секунд ({abs(time_diff_from_to_date)/3600:.2f} часов)")
-                            else:
-                                logger.debug(f"get_missing_months: Исторический месяц {year}-{month:02d} актуален "
-                                           f"(последний тик {last_tick_dt_local} достаточно близок к запрашиваемой дате {to_date}, "
-                                           f"разница: {abs(time_diff_from_to_date)} секунд, в пределах допуска {tolerance_for_to_date} секунд)")
-                        else:
-                            logger.debug(f"get_missing_months: Исторический месяц {year}-{month:02d} актуален "
-                                       f"(последний тик {last_tick_dt_local} достаточно близок к концу месяца {month_end_local}, "
-                                       f"разница: {abs(time_diff_from_month_end)} секунд, в пределах допуска {tolerance_for_month_end} секунд)")
-                        
-                        if needs_update:
-                            missing.append((year, month))
+                if debug_enabled:
+                    logger.debug(f"get_missing_months: Сравнение для текущего месяца {year}-{month:02d} (UTC timestamps): "
+                                f"последний тик UTC timestamp: {last_tick_time} ({utc_timestamp_to_local(last_tick_time)} локальное), "
+                                f"конец предыдущего дня UTC timestamp: {yesterday_end_utc_timestamp} "
+                                f"({utc_timestamp_to_local(yesterday_end_utc_timestamp)} локальное), "
+                                f"разница: {time_diff_seconds} секунд ({time_diff_seconds/3600:.2f} часов), "
+                                f"допуск: {tolerance_seconds} секунд")
+                
+                # Если последний тик >= конца предыдущего дня в UTC (с учетом допуска), данных достаточно
+                if time_diff_seconds >= -tolerance_seconds:
+                    # Don't add to missing - we don't load current day ticks
+                    logger.debug(f"get_missing_months: Текущий месяц {year}-{month:02d} имеет данные до конца предыдущего дня "
+                                f"(разница: {time_diff_seconds} секунд, допуск {tolerance_seconds} секунд)")
                 else:
-                    # Month exists but has no data
-                    logger.warning(f"get_missing_months: Месяц {year}-{month:02d} существует в БД, но не имеет данных")
+                    logger.info(f"get_missing_months: Текущий месяц {year}-{month:02d} нуждается в обновлении: "
+                              f"последний тик UTC timestamp: {last_tick_time} ({utc_timestamp_to_local(last_tick_time)} локальное), "
+                              f"требуется до UTC timestamp: {yesterday_end_utc_timestamp} "
+                              f"({utc_timestamp_to_local(yesterday_end_utc_timestamp)} локальное), "
+                              f"не хватает: {abs(time_diff_seconds)} секунд ({abs(time_diff_seconds)/3600:.2f} часов), "
+                              f"превышает допуск {tolerance_seconds} секунд")
+                    missing.append((year, month))
+            elif month_index > current_index:
+                # Future month - should not happen, but include it
+                logger.warning(f"get_missing_months: Будущий месяц {year}-{month:02d} помечен как недостающий")
+                missing.append((year, month))
+            else:
+                # Historical month: compare UTC timestamps directly
+                month_end_timestamp = month_end_utc_timestamp(month_index)
+                time_diff_from_month_end = last_tick_time - month_end_timestamp
+                time_diff_from_to_date = last_tick_time - to_date_utc_timestamp
+                
+                if debug_enabled:
+                    logger.debug(f"get_missing_months: Проверка исторического месяца {year}-{month:02d}: "
+                               f"последний тик UTC timestamp: {last_tick_time} ({utc_timestamp_to_local(last_tick_time)} локальное), "
+                               f"конец месяца UTC timestamp: {month_end_timestamp} ({utc_timestamp_to_local(month_end_timestamp)} локальное), "
+                               f"запрашивается до UTC timestamp: {to_date_utc_timestamp} ({to_date} локальное), "
+                               f"разница от конца месяца: {time_diff_from_month_end} секунд ({time_diff_from_month_end/3600:.2f} часов), "
+                               f"разница от запрашиваемой даты: {time_diff_from_to_date} секунд ({time_diff_from_to_date/3600:.2f} часов)")
+                
+                # Проверяем, нужны ли данные:
+                # 1. Если последний тик значительно раньше конца месяца (более 3 дней) И
+                # 2. Запрашиваемая дата выходит за пределы имеющихся данных (более 1 дня)
+                if (time_diff_from_month_end < -tolerance_for_month_end
+                        and time_diff_from_to_date < -tolerance_for_to_date):
+                    logger.info(f"get_missing_months: Исторический месяц {year}-{month:02d} нуждается в обновлении: "
+                              f"последний тик {utc_timestamp_to_local(last_tick_time)} (UTC: {last_tick_time}), "
+                              f"конец месяца {utc_timestamp_to_local(month_end_timestamp)} (UTC: {month_end_timestamp}), "
+                              f"запрашивается до {to_date} (UTC: {to_date_utc_timestamp}), "
+                              f"не хватает от конца месяца: {abs(time_diff_from_month_end)} секунд ({abs(time_diff_from_month_end)/3600:.2f} часов), "
+                              f"не хватает от запрашиваемой даты: {abs(time_diff_from_to_date)} секунд ({abs(time_diff_from_to_date)/3600:.2f} часов)")
                     missing.append((year, month))
+                else:
+                    if debug_enabled:
+                        logger.debug(f"get_missing_months: Исторический месяц {year}-{month:02d} актуален "
+                                   f"(последний тик {utc_timestamp_to_local(last_tick_time)}, "
+                                   f"конец месяца {utc_timestamp_to_local(month_end_timestamp)}, "
+                                   f"запрашивается до {to_date})")
         
         logger.info(f"get_missing_months: Для {symbol} на {server} недостающие месяцы: {missing}")
-        return sorted(list(set(missing)))
+        return sorted(set(missing))
     
     def get_first_available_month(self, server: str, symbol: str) -> Optional[Tuple[int, int]]:
         """Get first available month (year, month) for symbol"""
@@ -532,6 +736,7 @@ class TickDatabaseManager:
         
         with self.get_connection(server) as conn:
             cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
             
             # Удалить существующие диапазоны
             if symbol:
@@ -539,47 +744,16 @@ class TickDatabaseManager:
             else:
                 cursor.execute("DELETE FROM tick_ranges")
             
-            # Пересчитать диапазоны на основе тиков
+            # Пересчитать диапазоны на основе тиков одним запросом
             if symbol:
-                query = """
-                    SELECT 
-                        symbol,
-                        CAST(strftime('%Y', datetime(time, 'unixepoch')) AS INTEGER) as year,
-                        CAST(strftime('%m', datetime(time, 'unixepoch')) AS INTEGER) as month,
-                        MIN(time) as first_tick_time,
-                        MAX(time) as last_tick_time,
-                        COUNT(*) as tick_count
-                    FROM ticks
-                    WHERE symbol = ?
-                    GROUP BY symbol, year, month
-                """
-                cursor.execute(query, (symbol,))
+                cursor.execute(RECALCULATE_SYMBOL_RANGES_SQL, (symbol,))
             else:
-                query = """
-                    SELECT 
-                        symbol,
-                        CAST(strftime('%Y', datetime(time, 'unixepoch')) AS INTEGER) as year,
-                        CAST(strftime('%m', datetime(time, 'unixepoch')) AS INTEGER) as month,
-                        MIN(time) as first_tick_time,
-                        MAX(time) as last_tick_time,
-                        COUNT(*) as tick_count
-                    FROM ticks
-                    GROUP BY symbol, year, month
-                """
-                cursor.execute(query)
-            
-            ranges = cursor.fetchall()
-            
-            # Вставить пересчитанные диапазоны
-            for sym, yr, mn, first_time, last_time, count in ranges:
-                cursor.execute("""
-                    INSERT INTO tick_ranges
-                    (symbol, year, month, first_tick_time, last_tick_time, tick_count)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (sym, yr, mn, int(first_time), int(last_time), count))
+                cursor.execute(RECALCULATE_ALL_RANGES_SQL)
+            ranges_count = cursor.rowcount
             
             conn.commit()
-            print(f"✅ Пересчитано диапазонов: {len(ranges)}")
+            self._invalidate_ranges(server)
+            print(f"✅ Пересчитано диапазонов: {ranges_count}")
     
     def get_statistics(self, server: str) -> Dict[str, Any]:
         """Get database statistics for a server"""
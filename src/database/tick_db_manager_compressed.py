@@ -1,5 +1,5 @@
 """
-Database operations for compressed tick data storage using BLOB + zlib
+Database operations for compressed tick data storage using BLOB + zstd/zlib
 Stores ticks in daily batches, one DB file per server
 """
 
@@ -7,10 +7,146 @@ import sqlite3
 import zlib
 import struct
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any, Tuple, Union
 from contextlib import contextmanager
+import numpy as np
 from ..config.settings import Config
+from ..utils.logger import get_logger
+from .tick_db_manager import CONNECTION_PRAGMAS
+
+try:
+    import zstandard
+except ImportError:
+    # Optional: without it new batches are compressed with zlib
+    zstandard = None
+
+logger = get_logger()
+
+# Batch BLOB formats, told apart by the first byte:
+#   0x78 ('x')            zlib(count + packed ticks), written before zstd support
+#   'Z'                   zstd(count + packed ticks)
+#   'C' version codec     columnar: codec(count + byte-shuffled columns),
+#                         codec is 'Z' (zstd) or 'L' (zlib); since version 2
+#                         the time column is first time + deltas, since
+#                         version 3 prices are decimal fixed-point integers
+ZSTD_BATCH_TAG = b'Z'
+COLUMNAR_BATCH_TAG = b'C'
+COLUMNAR_BATCH_VERSION = 3
+# Payload header size per columnar version: count, first time, price digits
+COLUMNAR_HEADER_SIZES = {1: 4, 2: 8, 3: 9}
+ZSTD_CODEC = b'Z'
+ZLIB_CODEC = b'L'
+
+# Decimal places tried for fixed-point prices (MT5 symbols use up to 8)
+MAX_PRICE_DIGITS = 8
+# Price digits header value of batches whose prices are stored as float32
+RAW_PRICE_DIGITS = 0xFF
+
+# PRAGMA user_version of server DBs whose batches are UTC days; files
+# written before hold host-local day batches, re-split by init_database()
+UTC_BATCHES_VERSION = 1
+
+# Upper bound of threads compressing daily batches in save_ticks()
+MAX_COMPRESSION_WORKERS = 8
+
+# zstandard (de)compressor objects must not be shared between threads
+_codecs = threading.local()
+
+# Shared by all saves, so worker threads keep their zstd contexts in _codecs
+_compression_workers = min(os.cpu_count() or 1, MAX_COMPRESSION_WORKERS)
+_compression_executor = ThreadPoolExecutor(max_workers=_compression_workers, thread_name_prefix="tick_compress_")
+
+
+def _zstd_compressor():
+    cctx = getattr(_codecs, 'cctx', None)
+    if cctx is None:
+        cctx = _codecs.cctx = zstandard.ZstdCompressor(level=int(Config.TICK_COMPRESSION_LEVEL))
+    return cctx
+
+
+def _zstd_decompressor():
+    dctx = getattr(_codecs, 'dctx', None)
+    if dctx is None:
+        dctx = _codecs.dctx = zstandard.ZstdDecompressor()
+    return dctx
+
+
+def _zstd_decompress(data: Union[bytes, memoryview]) -> bytes:
+    if zstandard is None:
+        raise RuntimeError("Tick batch is zstd-compressed, install the zstandard package to read it")
+    return _zstd_decompressor().decompress(data)
+
+
+def _shuffle_words(data: np.ndarray) -> bytes:
+    """Group bytes of 4-byte words by significance: all first bytes, all second bytes..."""
+    return data.reshape(-1, 4).T.tobytes()
+
+
+def _unshuffle_words(data: Union[bytes, memoryview]) -> np.ndarray:
+    """Inverse of _shuffle_words, as a flat uint8 array"""
+    return np.frombuffer(data, dtype=np.uint8).reshape(4, -1).T.reshape(-1)
+
+
+def _price_digits(prices: np.ndarray) -> int:
+    """
+    Fewest decimal places at which all float32 prices are integers
+    
+    The integer values must decode back to the same float32 values;
+    RAW_PRICE_DIGITS when no precision up to MAX_PRICE_DIGITS does.
+    """
+    values = prices.astype(np.float64)
+    for digits in range(MAX_PRICE_DIGITS + 1):
+        scale = 10.0 ** digits
+        scaled = np.rint(values * scale)
+        # Keep integers, their deltas and the spread within int32
+        if not np.abs(scaled).max() < 2 ** 29:
+            break
+        if ((scaled / scale).astype(np.float32) == prices).all():
+            return digits
+    return RAW_PRICE_DIGITS
+
+
+def _civil_from_days(days):
+    """
+    Days since 1970-01-01 -> (year, month, day), integer math only
+    
+    Works on ints and on int64 arrays (H. Hinnant's civil_from_days).
+    """
+    z = days + 719468
+    era = z // 146097
+    day_of_era = z - era * 146097
+    year_of_era = (day_of_era - day_of_era // 1460 + day_of_era // 36524 - day_of_era // 146096) // 365
+    day_of_year = day_of_era - (365 * year_of_era + year_of_era // 4 - year_of_era // 100)
+    shifted_month = (5 * day_of_year + 2) // 153  # March-based
+    day = day_of_year - (153 * shifted_month + 2) // 5 + 1
+    month = shifted_month + 3 - 12 * (shifted_month >= 10)
+    year = year_of_era + era * 400 + (month <= 2)
+    return year, month, day
+
+
+def _zigzag(values: np.ndarray) -> np.ndarray:
+    """int64 values within int32 -> uint32, small magnitudes to small numbers"""
+    return ((values << 1) ^ (values >> 63)).astype(np.uint32)
+
+
+def _unzigzag(values: np.ndarray) -> np.ndarray:
+    """Inverse of _zigzag, as int64"""
+    values = values.astype(np.int64)
+    return (values >> 1) ^ -(values & 1)
+
+
+# One packed tick in a batch, same bytes as struct 'IffII':
+# time(4) + bid(4) + ask(4) + volume(4) + flags(4) = 20 bytes
+BATCH_TICK_DTYPE = np.dtype([
+    ('time', '<u4'),
+    ('bid', '<f4'),
+    ('ask', '<f4'),
+    ('volume', '<u4'),
+    ('flags', '<u4'),
+])
 
 
 class CompressedTickDatabaseManager:
@@ -20,6 +156,11 @@ class CompressedTickDatabaseManager:
         self.data_dir = os.path.join(data_dir, "compressed")
         # Ensure data directory exists
         os.makedirs(self.data_dir, exist_ok=True)
+        # Long-lived connections, one per server and thread
+        self._conns: Dict[Tuple[str, int], sqlite3.Connection] = {}
+        # Servers whose schema has been created in this process
+        self._initialized: set = set()
+        self._conns_lock = threading.Lock()  # Lock for accessing _conns and _initialized
     
     def get_db_path(self, server: str) -> str:
         """Get database file path for a server"""
@@ -27,18 +168,49 @@ class CompressedTickDatabaseManager:
         safe_server_name = server.replace('/', '_').replace('\\', '_').replace(':', '_')
         return os.path.join(self.data_dir, f"{safe_server_name}.db")
     
+    def _connect(self, server: str, timeout: float) -> sqlite3.Connection:
+        """Open a connection to a server DB and apply connection pragmas"""
+        # check_same_thread=False only so close() can run from any thread;
+        # each connection is used by the thread that opened it.
+        # isolation_level=None: writers open transactions explicitly with BEGIN IMMEDIATE
+        conn = sqlite3.connect(
+            self.get_db_path(server), timeout=timeout, isolation_level=None, check_same_thread=False
+        )
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        conn.execute(f"PRAGMA mmap_size={int(Config.TICK_DB_MMAP_SIZE)}")
+        return conn
+    
     @contextmanager
-    def get_connection(self, server: str):
-        """Context manager for database connections"""
-        db_path = self.get_db_path(server)
-        conn = sqlite3.connect(db_path)
+    def get_connection(self, server: str, timeout: float = 30.0):
+        """Context manager for the calling thread's cached connection to a server DB"""
+        key = (server, threading.get_ident())
+        conn = self._conns.get(key)
+        if conn is None:
+            conn = self._connect(server, timeout)
+            with self._conns_lock:
+                self._conns[key] = conn
         try:
             yield conn
         finally:
+            # Connection outlives the block: never leave a transaction open on it
+            if conn.in_transaction:
+                conn.rollback()
+    
+    def close(self):
+        """Close all cached connections"""
+        with self._conns_lock:
+            conns = list(self._conns.values())
+            self._conns.clear()
+            self._initialized.clear()
+        for conn in conns:
             conn.close()
     
     def init_database(self, server: str):
         """Initialize tick database tables for a server"""
+        if server in self._initialized:
+            return
+        
         with self.get_connection(server) as conn:
             cursor = conn.cursor()
             
@@ -50,17 +222,15 @@ class CompressedTickDatabaseManager:
                     batch_date INTEGER NOT NULL,  -- date as YYYYMMDD integer
                     batch_start_time INTEGER NOT NULL,  -- first tick timestamp in batch
                     batch_end_time INTEGER NOT NULL,    -- last tick timestamp in batch
-                    compressed_data BLOB NOT NULL,     -- zlib compressed tick data
+                    compressed_data BLOB NOT NULL,     -- zstd/zlib compressed tick data
                     tick_count INTEGER NOT NULL,        -- number of ticks in batch
                     PRIMARY KEY(symbol, batch_date)
                 )
             """)
             
-            # Index for faster queries
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_batches_symbol_time
-                ON tick_batches(symbol, batch_start_time, batch_end_time)
-            """)
+            # Batches are looked up by PRIMARY KEY(symbol, batch_date) ranges;
+            # drop the time index older databases were created with
+            cursor.execute("DROP INDEX IF EXISTS idx_batches_symbol_time")
             
             # Table for tracking available data ranges per symbol
             cursor.execute("""
@@ -76,18 +246,137 @@ class CompressedTickDatabaseManager:
                 )
             """)
             
-            # Index for range queries
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_ranges_symbol
-                ON tick_ranges(symbol, year, month)
-            """)
+            # PRIMARY KEY(symbol, year, month) serves range queries; drop the
+            # duplicate index older databases were created with
+            cursor.execute("DROP INDEX IF EXISTS idx_ranges_symbol")
+            
+            # Saving a UTC day over a local day batch would drop the ticks
+            # outside that UTC day, so older batches are re-split first
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("PRAGMA user_version")
+            if cursor.fetchone()[0] < UTC_BATCHES_VERSION:
+                self._rebucket_local_day_batches(cursor)
+                cursor.execute(f"PRAGMA user_version = {UTC_BATCHES_VERSION}")
             
             conn.commit()
+        
+        with self._conns_lock:
+            self._initialized.add(server)
+    
+    def _rebucket_local_day_batches(self, cursor: sqlite3.Cursor):
+        """
+        Re-split batches of host-local days into UTC day batches
+        
+        Only symbols with a batch outside its UTC day are rewritten, one
+        stored batch at a time; their month ranges are rebuilt afterwards.
+        Runs inside the caller's transaction.
+        """
+        cursor.execute("""
+            SELECT DISTINCT symbol FROM tick_batches
+            WHERE batch_date != CAST(strftime('%Y%m%d', batch_start_time, 'unixepoch') AS INTEGER)
+            OR batch_date != CAST(strftime('%Y%m%d', batch_end_time, 'unixepoch') AS INTEGER)
+        """)
+        symbols = [row[0] for row in cursor.fetchall()]
+        
+        for symbol in symbols:
+            cursor.execute(
+                "SELECT batch_date FROM tick_batches WHERE symbol = ? ORDER BY batch_date", (symbol,)
+            )
+            batch_dates = [row[0] for row in cursor.fetchall()]
+            
+            # UTC day -> tick arrays. Local day batches do not overlap and
+            # come in time order, so a UTC day is complete once a batch
+            # starts after it; it never collides with an unread batch date
+            pending: Dict[int, List[np.ndarray]] = {}
+            written = 0
+            
+            def flush(before_day: Optional[int] = None):
+                nonlocal written
+                for day in sorted(pending):
+                    if before_day is not None and day >= before_day:
+                        break
+                    day_ticks = np.concatenate(pending.pop(day))
+                    written += 1
+                    cursor.execute("""
+                        INSERT OR REPLACE INTO tick_batches
+                        (symbol, batch_date, batch_start_time, batch_end_time, compressed_data, tick_count)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, (
+                        symbol,
+                        self._utc_date_int(day * 86400),
+                        int(day_ticks['time'][0]),
+                        int(day_ticks['time'][-1]),
+                        self._compress_ticks(day_ticks),
+                        len(day_ticks)
+                    ))
+            
+            for batch_date in batch_dates:
+                cursor.execute(
+                    "SELECT compressed_data FROM tick_batches WHERE symbol = ? AND batch_date = ?",
+                    (symbol, batch_date)
+                )
+                batch_ticks = self._decompress_ticks(cursor.fetchone()[0])
+                cursor.execute(
+                    "DELETE FROM tick_batches WHERE symbol = ? AND batch_date = ?", (symbol, batch_date)
+                )
+                if len(batch_ticks) == 0:
+                    continue
+                
+                batch_ticks = batch_ticks[np.argsort(batch_ticks['time'], kind='stable')]
+                days = batch_ticks['time'].astype(np.int64) // 86400
+                flush(before_day=int(days[0]))
+                day_starts = np.concatenate(([0], np.flatnonzero(np.diff(days)) + 1))
+                for day, day_ticks in zip(days[day_starts].tolist(), np.split(batch_ticks, day_starts[1:])):
+                    pending.setdefault(day, []).append(day_ticks)
+            flush()
+            
+            self._rebuild_ranges(cursor, symbol)
+            logger.info(
+                f"init_database: Перенос батчей {symbol} на дни UTC: "
+                f"прочитано {len(batch_dates)}, записано {written}"
+            )
+    
+    @staticmethod
+    def _rebuild_ranges(cursor: sqlite3.Cursor, symbol: str = None) -> int:
+        """Replace month ranges of a symbol (or all) with ones computed from batches"""
+        # Удалить существующие диапазоны
+        if symbol:
+            cursor.execute("DELETE FROM tick_ranges WHERE symbol=?", (symbol,))
+        else:
+            cursor.execute("DELETE FROM tick_ranges")
+        
+        # Пересчитать диапазоны на основе батчей одним запросом;
+        # год и месяц берутся из batch_date (YYYYMMDD, UTC день)
+        query = """
+            INSERT INTO tick_ranges
+            (symbol, year, month, first_tick_time, last_tick_time, tick_count)
+            SELECT 
+                symbol,
+                batch_date / 10000 as year,
+                batch_date / 100 % 100 as month,
+                MIN(batch_start_time) as first_tick_time,
+                MAX(batch_end_time) as last_tick_time,
+                SUM(tick_count) as tick_count
+            FROM tick_batches
+            {where}
+            GROUP BY symbol, year, month
+        """
+        if symbol:
+            cursor.execute(query.format(where="WHERE symbol = ?"), (symbol,))
+        else:
+            cursor.execute(query.format(where=""))
+        return cursor.rowcount
     
     def _date_to_int(self, dt: datetime) -> int:
         """Convert datetime to YYYYMMDD integer"""
         return dt.year * 10000 + dt.month * 100 + dt.day
     
+    @staticmethod
+    def _utc_date_int(timestamp: int) -> int:
+        """UTC timestamp -> YYYYMMDD integer of its UTC day"""
+        year, month, day = _civil_from_days(timestamp // 86400)
+        return year * 10000 + month * 100 + day
+    
     def _int_to_date(self, date_int: int) -> datetime:
         """Convert YYYYMMDD integer to datetime"""
         year = date_int // 10000
@@ -95,65 +384,181 @@ class CompressedTickDatabaseManager:
         day = date_int % 100
         return datetime(year, month, day)
     
-    def _compress_ticks(self, ticks: List[Dict[str, Any]]) -> bytes:
+    def _compress_ticks(self, ticks: np.ndarray) -> bytes:
         """
-        Compress ticks using struct + zlib
-        Format: [count(4)][time(4)][bid(4)][ask(4)][volume(4)][flags(4)]...
+        Compress ticks (BATCH_TICK_DTYPE array) into a columnar batch
+        Payload: [count(4)][first time(4)][price digits(1)] + time delta, bid,
+        ask, volume and flags columns (4 bytes per value), byte-shuffled so
+        that similar bytes of neighbouring values are adjacent. Compressed
+        with zstd, or zlib without zstandard.
+        
+        Prices with a fixed number of decimals are stored as integers:
+        bid as zigzag deltas, ask as zigzag spread to bid. Decoding gives
+        back the same float32 values.
         """
-        if not ticks:
+        if len(ticks) == 0:
             return b''
         
-        # Pack data: count + ticks
-        # Each tick: time(4) + bid(4) + ask(4) + volume(4) + flags(4) = 20 bytes
-        # Format: I (time) + f (bid) + f (ask) + f (volume) + I (flags) = IffII
-        data = struct.pack('I', len(ticks))  # count (4 bytes)
+        # Sorted ticks are seconds apart: deltas are small and compress well.
+        # uint32 arithmetic wraps, so any order still round-trips
+        times = np.ascontiguousarray(ticks['time'], dtype=BATCH_TICK_DTYPE['time'])
+        first_time = int(times[0])
         
-        for tick in ticks:
-            data += struct.pack('IffII',
-                int(tick['time']),
-                float(tick['bid']),
-                float(tick['ask']),
-                int(tick.get('volume', 0)),  # volume is int, not float
-                int(tick.get('flags', 0))
-            )
+        bids = np.ascontiguousarray(ticks['bid'], dtype=BATCH_TICK_DTYPE['bid'])
+        asks = np.ascontiguousarray(ticks['ask'], dtype=BATCH_TICK_DTYPE['ask'])
+        digits = _price_digits(np.concatenate((bids, asks)))
+        if digits == RAW_PRICE_DIGITS:
+            bid_words, ask_words = bids, asks
+        else:
+            scale = 10.0 ** digits
+            bid_ints = np.rint(bids.astype(np.float64) * scale).astype(np.int64)
+            ask_ints = np.rint(asks.astype(np.float64) * scale).astype(np.int64)
+            bid_words = _zigzag(np.diff(bid_ints, prepend=0))
+            ask_words = _zigzag(ask_ints - bid_ints)
         
-        # Compress with zlib (level 6 - balance between speed and compression)
-        compressed = zlib.compress(data, level=6)
-        return compressed
+        columns = np.concatenate([
+            np.diff(times, prepend=times[:1]).view(np.uint8),
+            bid_words.view(np.uint8),
+            ask_words.view(np.uint8),
+            np.ascontiguousarray(ticks['volume'], dtype=BATCH_TICK_DTYPE['volume']).view(np.uint8),
+            np.ascontiguousarray(ticks['flags'], dtype=BATCH_TICK_DTYPE['flags']).view(np.uint8),
+        ])
+        data = struct.pack('<IIB', len(ticks), first_time, digits) + _shuffle_words(columns)
+        
+        # Compress at TICK_COMPRESSION_LEVEL (zstd 3 by default: faster than zlib at a similar ratio)
+        header = COLUMNAR_BATCH_TAG + bytes([COLUMNAR_BATCH_VERSION])
+        if zstandard is not None:
+            return header + ZSTD_CODEC + _zstd_compressor().compress(data)
+        return header + ZLIB_CODEC + zlib.compress(data, level=min(max(int(Config.TICK_COMPRESSION_LEVEL), 1), 9))
     
-    def _decompress_ticks(self, compressed_data: bytes) -> List[Dict[str, Any]]:
-        """Decompress ticks from BLOB"""
+    def _decompress_ticks(self, compressed_data: bytes) -> np.ndarray:
+        """Decompress ticks from BLOB into a BATCH_TICK_DTYPE array (any batch format)"""
         if not compressed_data:
-            return []
-        
-        # Decompress
-        data = zlib.decompress(compressed_data)
-        
-        # Read count
-        tick_count = struct.unpack('I', data[:4])[0]
-        
-        ticks = []
-        offset = 4
-        # Format: I (time) + f (bid) + f (ask) + I (volume) + I (flags) = 20 bytes
-        for _ in range(tick_count):
-            tick_data = struct.unpack('IffII', data[offset:offset+20])
-            ticks.append({
-                'time': tick_data[0],
-                'bid': tick_data[1],
-                'ask': tick_data[2],
-                'volume': int(tick_data[3]),
-                'flags': int(tick_data[4])
-            })
-            offset += 20
+            return np.empty(0, dtype=BATCH_TICK_DTYPE)
+        
+        tag = compressed_data[:1]
+        if tag == COLUMNAR_BATCH_TAG:
+            return self._decompress_columnar(compressed_data)
+        
+        # Packed ticks: zstd or pre-zstd zlib
+        if tag == ZSTD_BATCH_TAG:
+            data = _zstd_decompress(memoryview(compressed_data)[1:])
+        else:
+            data = zlib.decompress(compressed_data)
+        
+        # Read count, then view the packed ticks without copying
+        tick_count = struct.unpack_from('<I', data)[0]
+        return np.frombuffer(data, dtype=BATCH_TICK_DTYPE, count=tick_count, offset=4)
+    
+    def _decompress_columnar(self, compressed_data: bytes) -> np.ndarray:
+        """Decode a columnar batch, see _compress_ticks()"""
+        version, codec = compressed_data[1], compressed_data[2:3]
+        if version not in COLUMNAR_HEADER_SIZES:
+            raise ValueError(f"Unsupported tick batch version: {version}")
+        # Memoryview slices: neither the blob nor the payload is copied
+        if codec == ZSTD_CODEC:
+            data = _zstd_decompress(memoryview(compressed_data)[3:])
+        else:
+            data = zlib.decompress(memoryview(compressed_data)[3:])
+        
+        tick_count = struct.unpack_from('<I', data)[0]
+        columns = _unshuffle_words(memoryview(data)[COLUMNAR_HEADER_SIZES[version]:])
+        column_size = 4 * tick_count
         
+        def column(index: int, dtype) -> np.ndarray:
+            return columns[index * column_size:(index + 1) * column_size].view(dtype)
+        
+        ticks = np.empty(tick_count, dtype=BATCH_TICK_DTYPE)
+        for index, name in enumerate(BATCH_TICK_DTYPE.names):
+            ticks[name] = column(index, BATCH_TICK_DTYPE[name])
+        if version >= 2:
+            # Time column holds deltas from the first time
+            first_time = struct.unpack_from('<I', data, 4)[0]
+            np.cumsum(ticks['time'], dtype=BATCH_TICK_DTYPE['time'], out=ticks['time'])
+            ticks['time'] += np.uint32(first_time)
+        if version >= 3 and data[8] != RAW_PRICE_DIGITS:
+            # Bid deltas and ask spread as fixed-point integers
+            scale = 10.0 ** data[8]
+            bid_ints = np.cumsum(_unzigzag(column(1, '<u4')))
+            ticks['bid'] = bid_ints / scale
+            ticks['ask'] = (bid_ints + _unzigzag(column(2, '<u4'))) / scale
         return ticks
     
+    @staticmethod
+    def _ticks_to_dicts(ticks: np.ndarray) -> List[Dict[str, Any]]:
+        """BATCH_TICK_DTYPE array -> list of tick dicts"""
+        return [
+            {'time': time, 'bid': bid, 'ask': ask, 'volume': volume, 'flags': flags}
+            for time, bid, ask, volume, flags in zip(
+                ticks['time'].tolist(),
+                ticks['bid'].tolist(),
+                ticks['ask'].tolist(),
+                ticks['volume'].tolist(),
+                ticks['flags'].tolist()
+            )
+        ]
+    
+    @staticmethod
+    def _ticks_to_array(ticks: Any) -> np.ndarray:
+        """
+        Convert ticks to a BATCH_TICK_DTYPE array
+        
+        MT5 structured arrays are converted column by column;
+        other containers fall back to per-tick field access.
+        """
+        names = getattr(getattr(ticks, 'dtype', None), 'names', None)
+        if names:
+            result = np.zeros(len(ticks), dtype=BATCH_TICK_DTYPE)
+            for name in BATCH_TICK_DTYPE.names:
+                if name in names:
+                    result[name] = ticks[name]
+            return result
+        
+        rows = []
+        for tick in ticks:
+            # Extract tick data
+            try:
+                if hasattr(tick, 'dtype') and tick.dtype.names:
+                    tick_time = int(tick['time'])
+                    tick_bid = float(tick['bid'])
+                    tick_ask = float(tick['ask'])
+                    tick_volume = int(tick['volume'])
+                    tick_flags = int(tick['flags'] if 'flags' in tick.dtype.names else 0)
+                elif isinstance(tick, dict):
+                    tick_time = int(tick['time'])
+                    tick_bid = float(tick['bid'])
+                    tick_ask = float(tick['ask'])
+                    tick_volume = int(tick.get('volume', 0))
+                    tick_flags = int(tick.get('flags', 0))
+                elif hasattr(tick, 'time'):
+                    tick_time = int(tick.time)
+                    tick_bid = float(tick.bid)
+                    tick_ask = float(tick.ask)
+                    tick_volume = int(tick.volume)
+                    tick_flags = int(getattr(tick, 'flags', 0))
+                else:
+                    tick_time = int(tick[0])
+                    tick_bid = float(tick[1])
+                    tick_ask = float(tick[2])
+                    tick_volume = int(tick[3])
+                    tick_flags = int(tick[4] if len(tick) > 4 else 0)
+            except (AttributeError, KeyError, IndexError, TypeError) as e:
+                print(f"⚠️ Ошибка доступа к полям тика: {e}, тип: {type(tick)}")
+                continue
+            
+            rows.append((tick_time, tick_bid, tick_ask, tick_volume, tick_flags))
+        return np.array(rows, dtype=BATCH_TICK_DTYPE)
+    
     def save_ticks(self, server: str, symbol: str, ticks: List[Any]):
         """
         Save ticks to database, grouping by days and compressing
-        ticks: list of MT5 tick objects (with time, bid, ask, volume, flags attributes)
+        ticks: MT5 structured tick array, or list of tick objects/dicts/tuples
+        (with time, bid, ask, volume, flags fields)
+        
+        Days and months are UTC calendar days/months of the tick timestamps,
+        same as in recalculate_ranges().
         """
-        if not ticks:
+        if ticks is None or len(ticks) == 0:
             return
         
         # Initialize database if needed
@@ -162,120 +567,94 @@ class CompressedTickDatabaseManager:
         with self.get_connection(server) as conn:
             cursor = conn.cursor()
             
-            # Group ticks by day
-            daily_batches = {}
-            months_data = {}  # Track data per month for ranges
-            
-            for tick in ticks:
-                # Extract tick data
-                try:
-                    if hasattr(tick, 'dtype') and tick.dtype.names:
-                        tick_time = int(tick['time'])
-                        tick_bid = float(tick['bid'])
-                        tick_ask = float(tick['ask'])
-                        tick_volume = int(tick['volume'])
-                        tick_flags = int(tick['flags'] if 'flags' in tick.dtype.names else 0)
-                    elif isinstance(tick, dict):
-                        tick_time = int(tick['time'])
-                        tick_bid = float(tick['bid'])
-                        tick_ask = float(tick['ask'])
-                        tick_volume = int(tick.get('volume', 0))
-                        tick_flags = int(tick.get('flags', 0))
-                    elif hasattr(tick, 'time'):
-                        tick_time = int(tick.time)
-                        tick_bid = float(tick.bid)
-                        tick_ask = float(tick.ask)
-                        tick_volume = int(tick.volume)
-                        tick_flags = int(getattr(tick, 'flags', 0))
-                    else:
-                        tick_time = int(tick[0])
-                        tick_bid = float(tick[1])
-                        tick_ask = float(tick[2])
-                        tick_volume = int(tick[3])
-                        tick_flags = int(tick[4] if len(tick) > 4 else 0)
-                except (AttributeError, KeyError, IndexError, TypeError) as e:
-                    print(f"⚠️ Ошибка доступа к полям тика: {e}, тип: {type(tick)}")
-                    continue
-                
-                # Convert timestamp to datetime for date grouping
-                tick_dt = datetime.fromtimestamp(tick_time)
-                date_int = self._date_to_int(tick_dt)
-                
-                # Group by date
-                if date_int not in daily_batches:
-                    daily_batches[date_int] = []
-                
-                daily_batches[date_int].append({
-                    'time': tick_time,
-                    'bid': tick_bid,
-                    'ask': tick_ask,
-                    'volume': tick_volume,
-                    'flags': tick_flags
-                })
-                
-                # Track month ranges
-                year = tick_dt.year
-                month = tick_dt.month
-                month_key = (year, month)
-                if month_key not in months_data:
-                    months_data[month_key] = {
-                        'first_time': tick_time,
-                        'last_time': tick_time,
-                        'count': 0
-                    }
-                else:
-                    months_data[month_key]['first_time'] = min(
-                        months_data[month_key]['first_time'], tick_time
-                    )
-                    months_data[month_key]['last_time'] = max(
-                        months_data[month_key]['last_time'], tick_time
-                    )
-                months_data[month_key]['count'] += 1
-            
-            # Save each daily batch
-            for date_int, batch_ticks in daily_batches.items():
-                # Sort by time
-                batch_ticks.sort(key=lambda x: x['time'])
-                
-                # Compress
-                compressed = self._compress_ticks(batch_ticks)
-                
-                batch_start = batch_ticks[0]['time']
-                batch_end = batch_ticks[-1]['time']
-                
-                # Insert or replace batch
-                cursor.execute("""
-                    INSERT OR REPLACE INTO tick_batches
-                    (symbol, batch_date, batch_start_time, batch_end_time, compressed_data, tick_count)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (symbol, date_int, batch_start, batch_end, compressed, len(batch_ticks)))
-            
-            # Update month ranges
-            for (year, month), data in months_data.items():
-                cursor.execute("""
-                    SELECT first_tick_time, last_tick_time, tick_count FROM tick_ranges
-                    WHERE symbol=? AND year=? AND month=?
-                """, (symbol, year, month))
-                existing = cursor.fetchone()
-                
-                if existing:
-                    existing_first = existing[0]
-                    existing_last = existing[1]
-                    existing_count = existing[2]
-                    
-                    final_first = min(existing_first, data['first_time']) if existing_first else data['first_time']
-                    final_last = max(existing_last, data['last_time']) if existing_last else data['last_time']
-                    final_count = existing_count + data['count']
-                else:
-                    final_first = data['first_time']
-                    final_last = data['last_time']
-                    final_count = data['count']
-                
-                cursor.execute("""
-                    INSERT OR REPLACE INTO tick_ranges
-                    (symbol, year, month, first_tick_time, last_tick_time, tick_count)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (symbol, year, month, final_first, final_last, final_count))
+            # Sort by time once; every day and month is then a contiguous slice
+            all_ticks = self._ticks_to_array(ticks)
+            if len(all_ticks) == 0:
+                return
+            all_ticks = all_ticks[np.argsort(all_ticks['time'], kind='stable')]
+            times = all_ticks['time']
+            
+            # Group ticks by UTC day; calendar dates are only computed per day
+            days = times.astype(np.int64) // 86400
+            day_starts = np.concatenate(([0], np.flatnonzero(np.diff(days)) + 1))
+            years, months, month_days = _civil_from_days(days[day_starts])
+            daily_batches = dict(zip(
+                (years * 10000 + months * 100 + month_days).tolist(),
+                np.split(all_ticks, day_starts[1:])
+            ))
+            
+            # Track data per month for ranges: months are runs of days
+            month_keys = years * 12 + months
+            month_day_starts = np.concatenate(([0], np.flatnonzero(np.diff(month_keys)) + 1))
+            month_starts = day_starts[month_day_starts]
+            month_ends = np.append(month_starts[1:], len(times)) - 1
+            months_data = {
+                (year, month): {
+                    'first_time': first,
+                    'last_time': last,
+                    'count': count
+                }
+                for year, month, first, last, count in zip(
+                    years[month_day_starts].tolist(),
+                    months[month_day_starts].tolist(),
+                    times[month_starts].tolist(),
+                    times[month_ends].tolist(),
+                    (month_ends - month_starts + 1).tolist()
+                )
+            }
+            
+            # Compress daily batches in parallel: zstd and zlib release the GIL,
+            # and each worker thread keeps its own compression context
+            if len(daily_batches) > 1 and _compression_workers > 1:
+                compressed = list(_compression_executor.map(self._compress_ticks, daily_batches.values()))
+            else:
+                compressed = [self._compress_ticks(batch_ticks) for batch_ticks in daily_batches.values()]
+            
+            batch_rows = [
+                (
+                    symbol,
+                    date_int,
+                    int(batch_ticks['time'][0]),
+                    int(batch_ticks['time'][-1]),
+                    compressed_data,
+                    len(batch_ticks)
+                )
+                for (date_int, batch_ticks), compressed_data in zip(daily_batches.items(), compressed)
+            ]
+            
+            # One write transaction for batches and ranges, write lock taken up front
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            # Insert or replace batches
+            cursor.executemany("""
+                INSERT OR REPLACE INTO tick_batches
+                (symbol, batch_date, batch_start_time, batch_end_time, compressed_data, tick_count)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, batch_rows)
+            
+            # Update month ranges from the month's batches: a saved day replaces
+            # its old batch, so adding counts to the old range would double-count
+            cursor.executemany("""
+                INSERT INTO tick_ranges
+                (symbol, year, month, first_tick_time, last_tick_time, tick_count)
+                SELECT
+                    symbol,
+                    batch_date / 10000 as year,
+                    batch_date / 100 % 100 as month,
+                    MIN(batch_start_time),
+                    MAX(batch_end_time),
+                    SUM(tick_count)
+                FROM tick_batches
+                WHERE symbol = ? AND batch_date BETWEEN ? AND ?
+                GROUP BY symbol, year, month
+                ON CONFLICT(symbol, year, month) DO UPDATE SET
+                    first_tick_time = excluded.first_tick_time,
+                    last_tick_time = excluded.last_tick_time,
+                    tick_count = excluded.tick_count
+            """, [
+                (symbol, year * 10000 + month * 100, year * 10000 + month * 100 + 99)
+                for year, month in months_data
+            ])
             
             conn.commit()
     
@@ -290,24 +669,46 @@ class CompressedTickDatabaseManager:
         with self.get_connection(server) as conn:
             cursor = conn.cursor()
             
-            # Find all batches that intersect with requested range
+            # Find all batches that intersect with requested range: a primary key
+            # range over their days (one day of margin for batches bucketed by
+            # local days before days were UTC), then the exact overlap check
             cursor.execute("""
                 SELECT compressed_data FROM tick_batches
-                WHERE symbol = ? 
+                WHERE symbol = ? AND batch_date BETWEEN ? AND ?
                 AND batch_start_time <= ? AND batch_end_time >= ?
-                ORDER BY batch_start_time
-            """, (symbol, to_timestamp, from_timestamp))
+                ORDER BY batch_date
+            """, (
+                symbol,
+                self._utc_date_int(from_timestamp - 86400),
+                self._utc_date_int(to_timestamp + 86400),
+                to_timestamp,
+                from_timestamp
+            ))
+            
+            # Batch times are uint32: keep the bounds in range for searchsorted
+            lo_time = min(max(from_timestamp, 0), 0xFFFFFFFF)
+            hi_time = min(max(to_timestamp, 0), 0xFFFFFFFF)
             
-            all_ticks = []
-            for (compressed_data,) in cursor.fetchall():
-                # Decompress batch
+            # Rows are streamed from the cursor, so only one compressed
+            # batch is held at a time
+            parts = []
+            for (compressed_data,) in cursor:
+                # Decompress batch; its ticks are sorted, so the range is one slice
                 batch_ticks = self._decompress_ticks(compressed_data)
-                # Filter by time range
-                filtered = [t for t in batch_ticks 
-                           if from_timestamp <= t['time'] <= to_timestamp]
-                all_ticks.extend(filtered)
+                times = batch_ticks['time']
+                lo = times.searchsorted(lo_time, side='left')
+                hi = times.searchsorted(hi_time, side='right')
+                if hi > lo:
+                    parts.append(batch_ticks[lo:hi])
             
-            return sorted(all_ticks, key=lambda x: x['time'])
+            if not parts:
+                return []
+            all_ticks = np.concatenate(parts)
+            # Batches are disjoint days read in day order, so the result is
+            # already sorted. Batches saved before days were UTC may overlap
+            if len(parts) > 1 and (np.diff(all_ticks['time'].astype(np.int64)) < 0).any():
+                all_ticks = all_ticks[np.argsort(all_ticks['time'], kind='stable')]
+            return self._ticks_to_dicts(all_ticks)
     
     def get_available_ranges(self, server: str, symbol: str) -> List[Dict[str, Any]]:
         """Get available data ranges for symbol"""
@@ -342,63 +743,35 @@ class CompressedTickDatabaseManager:
         """
         self.init_database(server)
         
-        # Get all months in the range
-        required_months = set()
-        current = datetime(from_date.year, from_date.month, 1)
-        end = datetime(to_date.year, to_date.month, 1)
-        
-        while current <= end:
-            required_months.add((current.year, current.month))
-            if current.month == 12:
-                current = datetime(current.year + 1, 1, 1)
-            else:
-                current = datetime(current.year, current.month + 1, 1)
+        # Months as indexes (year * 12 + month - 1), so the range is integer math
+        first_index = from_date.year * 12 + from_date.month - 1
+        last_index = to_date.year * 12 + to_date.month - 1
         
-        # Get available months from DB with their last tick times
-        available_ranges = self.get_available_ranges(server, symbol)
-        available_months = {}
-        for r in available_ranges:
-            key = (r["year"], r["month"])
-            if key not in available_months:
-                available_months[key] = r
+        # Last tick times of the stored months inside the range only
+        with self.get_connection(server) as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT year * 12 + month - 1, last_tick_time FROM tick_ranges
+                WHERE symbol = ? AND year * 12 + month - 1 BETWEEN ? AND ?
+            """, (symbol, first_index, last_index))
+            last_tick_times = dict(cursor.fetchall())
         
-        # Check each required month
-        missing = []
+        # Requested end as UTC timestamp, so stored ticks compare without datetimes
+        to_timestamp = (to_date - timedelta(hours=Config.LOCAL_TIMESHIFT)).timestamp()
         now = datetime.now()
+        current_index = now.year * 12 + now.month - 1
         
-        for year, month in required_months:
-            month_key = (year, month)
-            
-            if month_key not in available_months:
-                # Month completely missing
-                missing.append((year, month))
-            else:
-                # Month exists, but check if we need more data
-                range_info = available_months[month_key]
-                last_tick_time = range_info.get('last_tick_time')
-                
-                if last_tick_time:
-                    last_tick_dt = datetime.fromtimestamp(last_tick_time)
-                    # Convert to local time for comparison
-                    last_tick_dt_local = last_tick_dt + timedelta(hours=Config.LOCAL_TIMESHIFT)
-                    
-                    # If we need data beyond what we have
-                    # For current or future months, always check if we need update
-                    if (year == now.year and month == now.month):
-                        # Current month - check if we need data after the last tick
-                        if to_date > last_tick_dt_local:
-                            missing.append((year, month))  # Need to update current month
-                    elif (year > now.year) or (year == now.year and month > now.month):
-                        # Future month - should not happen, but include it
-                        missing.append((year, month))
-                    # For past months, if to_date is beyond last_tick, we need more data
-                    elif to_date > last_tick_dt_local:
-                        missing.append((year, month))
-                else:
-                    # Month exists but has no data
-                    missing.append((year, month))
+        missing = []
+        for month_index in range(first_index, last_index + 1):
+            last_tick_time = last_tick_times.get(month_index)
+            # Month completely missing or without data, a future month,
+            # or data that ends before the requested date
+            if (not last_tick_time
+                    or month_index > current_index
+                    or to_timestamp > last_tick_time):
+                missing.append((month_index // 12, month_index % 12 + 1))
         
-        return sorted(list(set(missing)))
+        return missing
     
     def get_first_available_month(self, server: str, symbol: str) -> Optional[Tuple[int, int]]:
         """Get first available month (year, month) for symbol"""
@@ -421,54 +794,11 @@ class CompressedTickDatabaseManager:
         
         with self.get_connection(server) as conn:
             cursor = conn.cursor()
-            
-            # Удалить существующие диапазоны
-            if symbol:
-                cursor.execute("DELETE FROM tick_ranges WHERE symbol=?", (symbol,))
-            else:
-                cursor.execute("DELETE FROM tick_ranges")
-            
-            # Пересчитать диапазоны на основе батчей
-            if symbol:
-                query = """
-                    SELECT 
-                        symbol,
-                        CAST(strftime('%Y', datetime(batch_start_time, 'unixepoch')) AS INTEGER) as year,
-                        CAST(strftime('%m', datetime(batch_start_time, 'unixepoch')) AS INTEGER) as month,
-                        MIN(batch_start_time) as first_tick_time,
-                        MAX(batch_end_time) as last_tick_time,
-                        SUM(tick_count) as tick_count
-                    FROM tick_batches
-                    WHERE symbol = ?
-                    GROUP BY symbol, year, month
-                """
-                cursor.execute(query, (symbol,))
-            else:
-                query = """
-                    SELECT 
-                        symbol,
-                        CAST(strftime('%Y', datetime(batch_start_time, 'unixepoch')) AS INTEGER) as year,
-                        CAST(strftime('%m', datetime(batch_start_time, 'unixepoch')) AS INTEGER) as month,
-                        MIN(batch_start_time) as first_tick_time,
-                        MAX(batch_end_time) as last_tick_time,
-                        SUM(tick_count) as tick_count
-                    FROM tick_batches
-                    GROUP BY symbol, year, month
-                """
-                cursor.execute(query)
-            
-            ranges = cursor.fetchall()
-            
-            # Вставить пересчитанные диапазоны
-            for sym, yr, mn, first_time, last_time, count in ranges:
-                cursor.execute("""
-                    INSERT INTO tick_ranges
-                    (symbol, year, month, first_tick_time, last_tick_time, tick_count)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (sym, yr, mn, int(first_time), int(last_time), count))
+            cursor.execute("BEGIN IMMEDIATE")
+            ranges_count = self._rebuild_ranges(cursor, symbol)
             
             conn.commit()
-            print(f"✅ Пересчитано диапазонов: {len(ranges)}")
+            print(f"✅ Пересчитано диапазонов: {ranges_count}")
     
     def get_statistics(self, server: str) -> Dict[str, Any]:
         """Get database statistics for a server"""
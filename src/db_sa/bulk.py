@@ -0,0 +1,123 @@
+"""Bulk insert/upsert helpers for high-volume tables.
+
+Rows are plain dicts keyed by column name, all with the same keys. Each chunk
+is one Core executemany() call; the helpers do not commit, so everything a
+caller writes before ``session.commit()`` stays one transaction.
+"""
+
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .models import Deal, Magic, Position, TickBatch
+
+# Rows per executemany() call; input iterables are consumed chunk by chunk
+BULK_BATCH_SIZE = 10_000
+
+# Deal columns written by analytics.drawdown, not by deal sync
+DEAL_DRAWDOWN_COLUMNS = ("max_drawdown_points", "max_drawdown_currency", "drawdown_calculated_at")
+
+# Columns refreshed when an already stored deal is synced again
+DEAL_UPDATE_COLUMNS = tuple(
+    column.name
+    for column in Deal.__table__.columns
+    if not column.primary_key and column.name not in DEAL_DRAWDOWN_COLUMNS
+)
+
+# Columns refreshed when an already stored open position is synced again
+POSITION_UPDATE_COLUMNS = ("direction", "volume", "current_price", "profit", "swap", "is_open", "updated_at")
+
+# Statements are built once (module constant or cached per dialect), so
+# repeated calls reuse the construct and its compiled-SQL cache entry
+TICK_BATCH_INSERT = insert(TickBatch)
+# Core (not ORM) update: executemany with per-row WHERE bind parameters
+DEAL_DRAWDOWN_UPDATE = (
+    update(Deal.__table__)
+    .where(
+        Deal.__table__.c.account_id == bindparam("key_account_id"),
+        Deal.__table__.c.ticket_id == bindparam("key_ticket_id"),
+    )
+    .values(
+        max_drawdown_points=bindparam("max_drawdown_points"),
+        max_drawdown_currency=bindparam("max_drawdown_currency"),
+        drawdown_calculated_at=func.now(),
+    )
+)
+
+
+def _chunks(rows: Iterable[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+    iterator = iter(rows)
+    return iter(lambda: list(islice(iterator, BULK_BATCH_SIZE)), [])
+
+
+def _execute_chunks(session, statement, rows: Iterable[Dict[str, Any]]) -> int:
+    count = 0
+    for chunk in _chunks(rows):
+        session.execute(statement, chunk)
+        count += len(chunk)
+    return count
+
+
+def _dialect_insert(dialect_name: str, model):
+    """insert() of the given dialect, which has the ON CONFLICT clauses."""
+    if dialect_name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+@lru_cache(maxsize=None)
+def _upsert_statement(dialect_name: str, model, update_columns: Optional[Tuple[str, ...]]):
+    """INSERT ... ON CONFLICT (primary key) DO UPDATE, built once per dialect and model."""
+    table = model.__table__
+    if update_columns is None:
+        update_columns = tuple(column.name for column in table.columns if not column.primary_key)
+    stmt = _dialect_insert(dialect_name, model)
+    return stmt.on_conflict_do_update(
+        index_elements=[column.name for column in table.primary_key],
+        set_={name: stmt.excluded[name] for name in update_columns},
+    )
+
+
+@lru_cache(maxsize=None)
+def _insert_ignore_statement(dialect_name: str, model):
+    return _dialect_insert(dialect_name, model).on_conflict_do_nothing()
+
+
+def _upsert(session, model, rows: Iterable[Dict[str, Any]], update_columns: Tuple[str, ...] = None) -> int:
+    """Upsert on the primary key; default updates all non-key columns."""
+    stmt = _upsert_statement(session.get_bind().dialect.name, model, update_columns)
+    return _execute_chunks(session, stmt, rows)
+
+
+def upsert_deals(session, rows: Iterable[Dict[str, Any]]) -> int:
+    return _upsert(session, Deal, rows, DEAL_UPDATE_COLUMNS)
+
+
+def upsert_positions(session, rows: Iterable[Dict[str, Any]]) -> int:
+    return _upsert(session, Position, rows, POSITION_UPDATE_COLUMNS)
+
+
+def update_deal_drawdowns(session, rows: Iterable[Dict[str, Any]]) -> int:
+    """Set drawdown columns of stored deals; rows carry account_id and ticket_id."""
+    return _execute_chunks(session, DEAL_DRAWDOWN_UPDATE, (
+        {
+            "key_account_id": row["account_id"],
+            "key_ticket_id": row["ticket_id"],
+            "max_drawdown_points": row["max_drawdown_points"],
+            "max_drawdown_currency": row["max_drawdown_currency"],
+        }
+        for row in rows
+    ))
+
+
+def insert_magics(session, rows: Iterable[Dict[str, Any]]) -> int:
+    """Insert magics that are not stored yet; existing labels are kept."""
+    stmt = _insert_ignore_statement(session.get_bind().dialect.name, Magic)
+    return _execute_chunks(session, stmt, rows)
+
+
+def insert_tick_batches(session, rows: Iterable[Dict[str, Any]]) -> int:
+    return _execute_chunks(session, TICK_BATCH_INSERT, rows)
@@ -1,10 +1,32 @@
 """SQLAlchemy engine configuration."""
 
 from pathlib import Path
-from sqlalchemy import create_engine
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, make_url
 from ..config.settings import Config
 
 
+# Warm connection pool: connections are reused across requests and not pinged
+# before checkout (local SQLite file, nothing to go stale on the network).
+# In-memory SQLite keeps SQLAlchemy's per-thread pool, which takes no sizes
+POOL_SIZE = 10
+POOL_MAX_OVERFLOW = 20
+
+# Seconds a SQLite connection waits for another writer's lock
+SQLITE_BUSY_TIMEOUT = 30
+
+# Applied once per new DBAPI connection; pooled connections keep them
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA mmap_size=268435456",
+)
+
+
 def _default_db_path() -> str:
     project_root = Path(__file__).resolve().parents[2]
     return str(project_root / "mt5_dashboard.db")
@@ -14,8 +36,37 @@ def get_database_url() -> str:
     return getattr(Config, "SQLALCHEMY_DATABASE_URL", None) or f"sqlite:///{_default_db_path()}"
 
 
-engine = create_engine(
-    get_database_url(),
-    future=True,
-    connect_args={"check_same_thread": False},
-)
+def _is_memory_sqlite(url: URL) -> bool:
+    """Same test pysqlite uses to choose SingletonThreadPool over QueuePool."""
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+    )
+
+
+def _pool_options(url: URL) -> Dict[str, Any]:
+    if _is_memory_sqlite(url):
+        return {}
+    return {"pool_size": POOL_SIZE, "max_overflow": POOL_MAX_OVERFLOW}
+
+
+_url = make_url(get_database_url())
+_engine_options: Dict[str, Any] = dict(future=True, pool_pre_ping=False, pool_recycle=-1, **_pool_options(_url))
+
+if _url.get_backend_name() == "sqlite":
+    # sqlite3.connect() arguments; other drivers get none
+    engine = create_engine(
+        _url,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT},
+        **_engine_options,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, _connection_record) -> None:
+        cursor = dbapi_conn.cursor()
+        try:
+            for pragma in SQLITE_PRAGMAS:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+else:
+    engine = create_engine(_url, **_engine_options)
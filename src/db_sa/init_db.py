@@ -1,5 +1,7 @@
 """Database initialization for SQLAlchemy models."""
 
+import threading
+
 from sqlalchemy import text
 from ..utils.logger import get_logger
 from .engine import engine
@@ -7,62 +9,111 @@ from .models import Base
 
 logger = get_logger()
 
+_initialized = False
+_init_lock = threading.Lock()
 
-def _ensure_deals_comment_column() -> None:
-    try:
-        with engine.begin() as conn:
-            result = conn.execute(text("PRAGMA table_info(deals)")).fetchall()
-            columns = {row[1] for row in result}
-            if "comment" not in columns:
-                logger.info("init_database: adding deals.comment column")
-                conn.execute(text("ALTER TABLE deals ADD COLUMN comment VARCHAR"))
-    except Exception:
-        logger.warning("init_database: failed to ensure deals.comment column", exc_info=True)
 
+# Columns added after their tables first shipped: (table, column, type)
+SCHEMA_ADDITIONS = (
+    ("deals", "comment", "VARCHAR"),
+    ("magic_groups", "label2", "VARCHAR"),
+    ("magic_groups", "font_color", "VARCHAR"),
+    ("magic_groups", "fill_color", "VARCHAR"),
+    ("accounts", "history_start_date", "DATETIME"),
+    ("tick_batches", "compression_codec", "VARCHAR(8)"),
+    ("tick_batches", "uncompressed_size", "INTEGER"),
+    ("deals", "max_drawdown_points", "FLOAT"),
+    ("deals", "max_drawdown_currency", "FLOAT"),
+    ("deals", "drawdown_calculated_at", "DATETIME"),
+)
 
-def _ensure_magic_groups_label2_column() -> None:
-    try:
-        with engine.begin() as conn:
-            result = conn.execute(text("PRAGMA table_info(magic_groups)")).fetchall()
-            columns = {row[1] for row in result}
-            if "label2" not in columns:
-                logger.info("init_database: adding magic_groups.label2 column")
-                conn.execute(text("ALTER TABLE magic_groups ADD COLUMN label2 VARCHAR"))
-    except Exception:
-        logger.warning("init_database: failed to ensure magic_groups.label2 column", exc_info=True)
+# Drawdowns used to live in a 1:1 deal_drawdowns table; copied into deals
+# before the table is dropped
+MOVE_DEAL_DRAWDOWNS_SQL = """
+    UPDATE deals SET (max_drawdown_points, max_drawdown_currency, drawdown_calculated_at) = (
+        SELECT dd.max_drawdown_points, dd.max_drawdown_currency, dd.calculated_at
+        FROM deal_drawdowns AS dd
+        WHERE dd.account_id = deals.account_id AND dd.ticket_id = deals.ticket_id
+    )
+    WHERE EXISTS (
+        SELECT 1 FROM deal_drawdowns AS dd
+        WHERE dd.account_id = deals.account_id AND dd.ticket_id = deals.ticket_id
+    )
+"""
 
+# Indexes removed from the models, dropped from existing databases
+DROPPED_INDEXES = (
+    "ix_deals_symbol",
+    # Primary keys lead with account_id; every deal/position query is per account
+    "ix_deals_account_id",
+    "ix_deals_magic",
+    "ix_positions_account_id",
+    "ix_positions_magic",
+    "ix_positions_symbol",
+    "ix_magics_account_id",
+)
 
-def _ensure_magic_groups_color_columns() -> None:
-    try:
-        with engine.begin() as conn:
-            result = conn.execute(text("PRAGMA table_info(magic_groups)")).fetchall()
-            columns = {row[1] for row in result}
-            if "font_color" not in columns:
-                logger.info("init_database: adding magic_groups.font_color column")
-                conn.execute(text("ALTER TABLE magic_groups ADD COLUMN font_color VARCHAR"))
-            if "fill_color" not in columns:
-                logger.info("init_database: adding magic_groups.fill_color column")
-                conn.execute(text("ALTER TABLE magic_groups ADD COLUMN fill_color VARCHAR"))
-    except Exception:
-        logger.warning("init_database: failed to ensure magic_groups color columns", exc_info=True)
+# Recorded in PRAGMA user_version once SCHEMA_ADDITIONS, moved tables, model
+# indexes and DROPPED_INDEXES are applied, so later startups skip the checks; bump it
+# when changing any of them
+SCHEMA_VERSION = 5
 
 
-def _ensure_accounts_history_start_date() -> None:
+def _ensure_schema_additions() -> None:
+    """Apply SCHEMA_ADDITIONS, moved tables and model indexes in one transaction."""
     try:
         with engine.begin() as conn:
-            result = conn.execute(text("PRAGMA table_info(accounts)")).fetchall()
-            columns = {row[1] for row in result}
-            if "history_start_date" not in columns:
-                logger.info("init_database: adding accounts.history_start_date column")
-                conn.execute(text("ALTER TABLE accounts ADD COLUMN history_start_date DATETIME"))
+            if conn.execute(text("PRAGMA user_version")).scalar() >= SCHEMA_VERSION:
+                return
+
+            columns = {}
+            for table, column, column_type in SCHEMA_ADDITIONS:
+                if table not in columns:
+                    result = conn.execute(text(f"PRAGMA table_info({table})")).fetchall()
+                    columns[table] = {row[1] for row in result}
+                if column not in columns[table]:
+                    logger.info(f"init_database: adding {table}.{column} column")
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+
+            if "deal_drawdowns" in _get_existing_tables(conn):
+                logger.info("init_database: moving deal_drawdowns into deals")
+                conn.execute(text(MOVE_DEAL_DRAWDOWNS_SQL))
+                conn.execute(text("DROP TABLE deal_drawdowns"))
+
+            # create_all() only builds indexes of new tables
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(conn, checkfirst=True)
+            for name in DROPPED_INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            # Planner statistics, so new composite indexes are picked over
+            # narrower ones (e.g. ix_deals_account_magic_time for per-magic lists)
+            conn.execute(text("ANALYZE"))
+            conn.execute(text(f"PRAGMA user_version = {SCHEMA_VERSION}"))
     except Exception:
-        logger.warning("init_database: failed to ensure accounts.history_start_date", exc_info=True)
+        logger.warning("init_database: failed to ensure schema columns", exc_info=True)
+
+
+def _get_existing_tables(conn) -> set:
+    return set(conn.execute(text("SELECT name FROM sqlite_master WHERE type='table'")).scalars())
 
 
 def init_database() -> None:
-    logger.info("Initializing SQLAlchemy database schema")
-    Base.metadata.create_all(bind=engine)
-    _ensure_deals_comment_column()
-    _ensure_magic_groups_label2_column()
-    _ensure_magic_groups_color_columns()
-    _ensure_accounts_history_start_date()
\ No newline at end of file
+    """Create missing tables and columns once per process; later calls are no-ops."""
+    global _initialized
+    if _initialized:
+        return
+
+    with _init_lock:
+        if _initialized:
+            return
+
+        logger.info("Initializing SQLAlchemy database schema")
+        with engine.connect() as conn:
+            existing = _get_existing_tables(conn)
+        missing = [table for name, table in Base.metadata.tables.items() if name not in existing]
+        if missing:
+            logger.info(f"init_database: creating tables {[table.name for table in missing]}")
+            Base.metadata.create_all(bind=engine, tables=missing)
+        _ensure_schema_additions()
+        _initialized = True
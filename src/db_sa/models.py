@@ -1,35 +1,61 @@
 """SQLAlchemy ORM models for MT5 Trading Dashboard."""
 
-from datetime import datetime
 from sqlalchemy import (
+    BigInteger,
     Column,
     Integer,
     String,
     Float,
     DateTime,
     Boolean,
+    LargeBinary,
     ForeignKey,
     Index,
     ForeignKeyConstraint,
     PrimaryKeyConstraint,
+    TypeDecorator,
+    func,
 )
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.orm import DeclarativeBase, relationship
 
 
-Base = declarative_base()
+class Base(DeclarativeBase):
+    pass
+
+
+class AccountId(TypeDecorator):
+    """MT5 login stored as a fixed-width integer key; Python code uses str ids.
+
+    Databases created with VARCHAR account_id columns keep working: SQLite
+    compares and stores the bound integers with the column's TEXT affinity.
+    """
+
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, str) and value.isdigit():
+            return int(value)
+        return value
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else str(value)
 
 
 class Account(Base):
     __tablename__ = "accounts"
 
-    account_id = Column(String, primary_key=True)
+    account_id = Column(AccountId, primary_key=True)
     label = Column(String, nullable=True)
     history_start_date = Column(DateTime, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
-
-    info = relationship("AccountInfo", uselist=False, back_populates="account")
-    credentials = relationship("AccountCredentials", uselist=False, back_populates="account")
+    created_at = Column(DateTime, default=func.now(), nullable=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
+
+    # One row each: loaded in the same query as the account (LEFT OUTER JOIN)
+    info = relationship("AccountInfo", uselist=False, back_populates="account", lazy="joined")
+    credentials = relationship("AccountCredentials", uselist=False, back_populates="account", lazy="joined")
+    # Collections stay lazy: magics, groups, deals and positions are read by
+    # their own per-account queries, never by walking an account
     magics = relationship("Magic", back_populates="account")
     groups = relationship("MagicGroup", back_populates="account")
     deals = relationship("Deal", back_populates="account")
@@ -39,14 +65,14 @@ class Account(Base):
 class AccountInfo(Base):
     __tablename__ = "account_info"
 
-    account_id = Column(String, ForeignKey("accounts.account_id"), primary_key=True)
+    account_id = Column(AccountId, ForeignKey("accounts.account_id"), primary_key=True)
     account_number = Column(String, nullable=True)
     leverage = Column(Integer, nullable=True)
     server = Column(String, nullable=True)
     currency = Column(String, nullable=True)
     balance = Column(Float, nullable=True)
     equity = Column(Float, nullable=True)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
 
     account = relationship("Account", back_populates="info")
 
@@ -54,11 +80,11 @@ class AccountInfo(Base):
 class AccountCredentials(Base):
     __tablename__ = "account_credentials"
 
-    account_id = Column(String, ForeignKey("accounts.account_id"), primary_key=True)
+    account_id = Column(AccountId, ForeignKey("accounts.account_id"), primary_key=True)
     login = Column(String, nullable=True)
     server = Column(String, nullable=True)
     password_encrypted = Column(String, nullable=True)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
 
     account = relationship("Account", back_populates="credentials")
 
@@ -67,7 +93,7 @@ class Magic(Base):
     __tablename__ = "magics"
 
     id = Column(Integer, autoincrement=False)
-    account_id = Column(String, ForeignKey("accounts.account_id"), nullable=False)
+    account_id = Column(AccountId, ForeignKey("accounts.account_id"), nullable=False)
     label = Column(String, nullable=True)
 
     account = relationship("Account", back_populates="magics")
@@ -75,7 +101,6 @@ class Magic(Base):
 
     __table_args__ = (
         PrimaryKeyConstraint("account_id", "id", name="pk_magics"),
-        Index("ix_magics_account_id", "account_id"),
     )
 
 
@@ -83,7 +108,7 @@ class MagicGroup(Base):
     __tablename__ = "magic_groups"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    account_id = Column(String, ForeignKey("accounts.account_id"), nullable=False)
+    account_id = Column(AccountId, ForeignKey("accounts.account_id"), nullable=False)
     name = Column(String, nullable=False)
     label2 = Column(String, nullable=True)
     font_color = Column(String, nullable=True)
@@ -98,7 +123,7 @@ class MagicGroup(Base):
 class MagicGroupAssignment(Base):
     __tablename__ = "magic_group_assignments"
 
-    account_id = Column(String, ForeignKey("accounts.account_id"), primary_key=True)
+    account_id = Column(AccountId, ForeignKey("accounts.account_id"), primary_key=True)
     group_id = Column(Integer, ForeignKey("magic_groups.id"), primary_key=True)
     magic_id = Column(Integer, primary_key=True)
 
@@ -119,9 +144,9 @@ class Deal(Base):
 
     ticket_id = Column(Integer, autoincrement=False)
     position_id = Column(Integer, nullable=False, index=True)
-    account_id = Column(String, ForeignKey("accounts.account_id"), nullable=False, index=True)
-    magic = Column(Integer, nullable=True, index=True)
-    symbol = Column(String, nullable=False, index=True)
+    account_id = Column(AccountId, ForeignKey("accounts.account_id"), nullable=False)
+    magic = Column(Integer, nullable=True)
+    symbol = Column(String, nullable=False)
     direction = Column(String, nullable=True)
     volume = Column(Float, nullable=True)
     entry_time = Column(DateTime, nullable=True)
@@ -133,45 +158,30 @@ class Deal(Base):
     swap = Column(Float, nullable=True)
     comment = Column(String, nullable=True)
     is_closed = Column(Boolean, default=False, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # Filled for closed deals by analytics.drawdown, kept across re-syncs
+    max_drawdown_points = Column(Float, nullable=True)
+    max_drawdown_currency = Column(Float, nullable=True)
+    drawdown_calculated_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
 
     account = relationship("Account", back_populates="deals")
-    drawdown = relationship("DealDrawdown", uselist=False, back_populates="deal")
 
     __table_args__ = (
         PrimaryKeyConstraint("account_id", "ticket_id", name="pk_deals"),
         Index("ix_deals_account_time", "account_id", "entry_time"),
         Index("ix_deals_account_exit", "account_id", "exit_time"),
+        # Per-magic deal lists ordered by entry time, and magic -> group joins
+        Index("ix_deals_account_magic_time", "account_id", "magic", "entry_time"),
     )
 
 
-class DealDrawdown(Base):
-    __tablename__ = "deal_drawdowns"
-
-    account_id = Column(String, primary_key=True)
-    ticket_id = Column(Integer, primary_key=True)
-    max_drawdown_points = Column(Float, nullable=True)
-    max_drawdown_currency = Column(Float, nullable=True)
-    calculated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-
-    __table_args__ = (
-        ForeignKeyConstraint(
-            ["account_id", "ticket_id"],
-            ["deals.account_id", "deals.ticket_id"],
-            name="fk_deal_drawdowns_deals",
-        ),
-    )
-
-    deal = relationship("Deal", back_populates="drawdown")
-
-
 class Position(Base):
     __tablename__ = "positions"
 
     position_id = Column(Integer, autoincrement=False)
-    account_id = Column(String, ForeignKey("accounts.account_id"), nullable=False, index=True)
-    magic = Column(Integer, nullable=True, index=True)
-    symbol = Column(String, nullable=False, index=True)
+    account_id = Column(AccountId, ForeignKey("accounts.account_id"), nullable=False)
+    magic = Column(Integer, nullable=True)
+    symbol = Column(String, nullable=False)
     direction = Column(String, nullable=True)
     volume = Column(Float, nullable=True)
     entry_time = Column(DateTime, nullable=True)
@@ -180,7 +190,7 @@ class Position(Base):
     profit = Column(Float, nullable=True)
     swap = Column(Float, nullable=True)
     is_open = Column(Boolean, default=True, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
 
     account = relationship("Account", back_populates="positions")
 
@@ -211,7 +221,9 @@ class TickBatch(Base):
     server = Column(String, nullable=False)
     symbol = Column(String, nullable=False)
     day = Column(String, nullable=False)
-    compressed_blob = Column(String, nullable=True)
+    compressed_blob = Column(LargeBinary, nullable=True)
+    compression_codec = Column(String(8), nullable=True, default="zstd")
+    uncompressed_size = Column(Integer, nullable=True)  # lets readers size the output buffer
     tick_count = Column(Integer, nullable=True)
 
     __table_args__ = (Index("ix_tick_batches_server_symbol", "server", "symbol"),)
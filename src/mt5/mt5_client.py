@@ -1321,7 +1321,7 @@ class MT5Calculator:
                 logger.warning(f"get_price_at_time: Не удалось определить сервер для {symbol}")
                 return {'bid': None, 'ask': None}
             
-            ticks = mt5_tick_provider.get_ticks_from_db(
+            ticks = mt5_tick_provider.get_ticks_array_from_db(
                 symbol=symbol,
                 from_date=from_time,
                 to_date=to_time,
@@ -1329,51 +1329,44 @@ class MT5Calculator:
                 account=account
             )
             
-            logger.debug(f"get_price_at_time: Найдено {len(ticks) if ticks else 0} тиков для {symbol}")
+            logger.debug(f"get_price_at_time: Найдено {len(ticks)} тиков для {symbol}")
             
-            if not ticks:
+            if len(ticks) == 0:
                 logger.warning(f"get_price_at_time: Тики не найдены для {symbol} в диапазоне {from_time} - {to_time}")
                 return {'bid': None, 'ask': None}
             
-            # Убеждаемся, что тики отсортированы по времени
-            sorted_ticks = sorted(ticks, key=lambda x: x['time'])
+            # Тики из БД уже отсортированы по времени
+            tick_times = ticks['time']
+            first_tick_time = int(tick_times[0])
+            last_tick_time = int(tick_times[-1])
             
             # Логируем первый и последний тик для диагностики
-            if sorted_ticks:
-                # UTC timestamps нужно конвертировать правильно: fromtimestamp с timezone.utc
-                from datetime import timezone as tz
-                first_tick_time_utc = datetime.fromtimestamp(sorted_ticks[0]['time'], tz=tz.utc)
-                last_tick_time_utc = datetime.fromtimestamp(sorted_ticks[-1]['time'], tz=tz.utc)
-                # Конвертируем в локальное время (UTC+LOCAL_TIMESHIFT)
-                first_tick_time_local = first_tick_time_utc.replace(tzinfo=None) + timedelta(hours=Config.LOCAL_TIMESHIFT)
-                last_tick_time_local = last_tick_time_utc.replace(tzinfo=None) + timedelta(hours=Config.LOCAL_TIMESHIFT)
-                logger.debug(f"get_price_at_time: Первый тик: {first_tick_time_local} (UTC timestamp: {sorted_ticks[0]['time']}), "
-                            f"последний тик: {last_tick_time_local} (UTC timestamp: {sorted_ticks[-1]['time']})")
-            
-            # Находим последний тик до или в момент compare_time
-            last_tick = None
-            for tick in sorted_ticks:
-                if tick['time'] <= compare_timestamp_utc:
-                    last_tick = tick
-                else:
-                    break
-            
-            if last_tick:
-                # UTC timestamp нужно конвертировать правильно: fromtimestamp с timezone.utc
-                from datetime import timezone as tz
-                tick_time_utc = datetime.fromtimestamp(last_tick['time'], tz=tz.utc)
+            # UTC timestamps нужно конвертировать правильно: fromtimestamp с timezone.utc
+            first_tick_time_local = datetime.fromtimestamp(first_tick_time, tz=timezone.utc).replace(tzinfo=None) + timedelta(hours=Config.LOCAL_TIMESHIFT)
+            last_tick_time_local = datetime.fromtimestamp(last_tick_time, tz=timezone.utc).replace(tzinfo=None) + timedelta(hours=Config.LOCAL_TIMESHIFT)
+            logger.debug(f"get_price_at_time: Первый тик: {first_tick_time_local} (UTC timestamp: {first_tick_time}), "
+                        f"последний тик: {last_tick_time_local} (UTC timestamp: {last_tick_time})")
+            
+            # Находим последний тик до или в момент compare_time (бинарный поиск)
+            index = int(tick_times.searchsorted(compare_timestamp_utc, side='right')) - 1
+            
+            if index >= 0:
+                last_tick = ticks[index]
+                tick_time_utc = datetime.fromtimestamp(int(last_tick['time']), tz=timezone.utc)
                 tick_time_local = tick_time_utc.replace(tzinfo=None) + timedelta(hours=Config.LOCAL_TIMESHIFT)
+                bid = float(last_tick['bid'])
+                ask = float(last_tick['ask'])
                 logger.debug(f"get_price_at_time: Найден тик для {symbol} на момент {tick_time_local} "
-                            f"(запрошено {target_time}), bid={last_tick.get('bid')}, ask={last_tick.get('ask')}")
+                            f"(запрошено {target_time}), bid={bid}, ask={ask}")
                 return {
-                    'bid': last_tick.get('bid'),
-                    'ask': last_tick.get('ask')
+                    'bid': bid,
+                    'ask': ask
                 }
             
             logger.warning(f"get_price_at_time: Не найден подходящий тик для {symbol} на момент {target_time} "
                           f"(сравнение с {compare_time}, UTC timestamp: {compare_timestamp_utc}), "
-                          f"найдено тиков: {len(sorted_ticks)}, "
-                          f"диапазон тиков UTC: {sorted_ticks[0]['time'] if sorted_ticks else 'N/A'} - {sorted_ticks[-1]['time'] if sorted_ticks else 'N/A'}")
+                          f"найдено тиков: {len(ticks)}, "
+                          f"диапазон тиков UTC: {first_tick_time} - {last_tick_time}")
             return {'bid': None, 'ask': None}
             
         except Exception as e:
@@ -4,6 +4,8 @@ Handles downloading and storing tick data from MetaTrader 5
 """
 
 import MetaTrader5 as mt5
+import threading
+import numpy as np
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any, Tuple
 from ..config.settings import Config
@@ -17,11 +19,15 @@ logger = get_logger()
 class MT5TickProvider:
     """Provides tick data from MetaTrader 5"""
     
+    # MT5 API is not reentrant: serializes terminal access when ticks are
+    # requested from several threads (e.g. parallel drawdown calculation)
+    _mt5_lock = threading.Lock()
+    
     def __init__(self):
         self.connection = MT5Connection()
     
     def get_ticks_from_mt5(self, symbol: str, from_date: datetime, 
-                          to_date: datetime, account: Dict[str, Any] = None) -> Optional[List]:
+                          to_date: datetime, account: Dict[str, Any] = None) -> Optional[Any]:
         """
         Get ticks from MT5 terminal for the specified symbol and date range
         
@@ -32,7 +38,7 @@ class MT5TickProvider:
             account: Account info dict (optional)
             
         Returns:
-            List of tick objects or None if error
+            Structured array of ticks as returned by MT5 or None if error
         """
         if not self.connection.initialize(account):
             logger.error("get_ticks_from_mt5: failed to initialize MT5 connection")
@@ -83,11 +89,11 @@ class MT5TickProvider:
             logger.error("get_ticks_from_mt5: MT5 returned None for ticks")
             return None
         
-        ticks_list = list(ticks)
-        if len(ticks_list) == 0:
+        if len(ticks) == 0:
             logger.warning("get_ticks_from_mt5: MT5 returned empty ticks list")
         
-        return ticks_list
+        # Returned as the array, so save_ticks can convert whole columns at once
+        return ticks
     
     def get_server_name(self, account: Dict[str, Any] = None) -> Optional[str]:
         """Get server name from account info"""
@@ -259,7 +265,7 @@ class MT5TickProvider:
                         
                         ticks = self.get_ticks_from_mt5(symbol, month_start, month_end, account)
                         
-                        if ticks:
+                        if ticks is not None and len(ticks) > 0:
                             tick_db_manager.save_ticks(server, symbol, ticks)
                             result["ticks_downloaded"] += len(ticks)
                             result["months_processed"].append({
@@ -309,7 +315,7 @@ class MT5TickProvider:
                                f"{actual_to_date} (было: {to_date})")
             
             ticks = self.get_ticks_from_mt5(symbol, from_date, actual_to_date, account)
-            if ticks:
+            if ticks is not None and len(ticks) > 0:
                 tick_db_manager.save_ticks(server, symbol, ticks)
                 result["ticks_downloaded"] = len(ticks)
                 result["months_processed"].append({
@@ -333,25 +339,18 @@ class MT5TickProvider:
         
         return result
     
-    def get_ticks_from_db(self, symbol: str, from_date: datetime, 
-                         to_date: datetime, server: str = None,
-                         account: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    def _ensure_ticks_in_db(self, symbol: str, from_date: datetime, to_date: datetime,
+                            server: str = None, account: Dict[str, Any] = None) -> Tuple[str, datetime]:
         """
-        Get ticks from database (with auto-download if missing)
+        Download missing months for the range so it can be served from the database
         
-        Args:
-            symbol: Trading symbol
-            from_date: Start date (local time)
-            to_date: End date (local time)
-            server: Server name (optional, will be detected if not provided)
-            account: Account info dict (optional)
-            
         Returns:
-            List of tick dictionaries
+            Tuple of (server name, to_date limited to the end of the previous day)
         """
         # Get server name if not provided
         if not server:
-            server = self.get_server_name(account)
+            with self._mt5_lock:
+                server = self.get_server_name(account)
             if not server:
                 server = account.get('server', 'unknown') if account else 'unknown'
         
@@ -452,16 +451,72 @@ class MT5TickProvider:
                 # Download full months to ensure continuous series
                 # Use auto_fill_months=False to avoid recursive logic issues
                 # We've already determined what needs to be downloaded
-                self.download_and_save_ticks(symbol, download_from, download_to, account, auto_fill_months=False)
+                with self._mt5_lock:
+                    # Another thread may have loaded these months while we waited
+                    if not tick_db_manager.get_missing_months(server, symbol, from_date, to_date):
+                        break
+                    self.download_and_save_ticks(symbol, download_from, download_to, account, auto_fill_months=False)
             except Exception as e:
                 logger.warning(f"Ошибка при загрузке тиков (попытка {attempt + 1}/{max_retries}): {e}")
                 if attempt == max_retries - 1:
                     # Last attempt failed, raise the exception
                     raise
         
+        return server, to_date
+    
+    def get_ticks_from_db(self, symbol: str, from_date: datetime, 
+                         to_date: datetime, server: str = None,
+                         account: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """
+        Get ticks from database (with auto-download if missing)
+        
+        Args:
+            symbol: Trading symbol
+            from_date: Start date (local time)
+            to_date: End date (local time)
+            server: Server name (optional, will be detected if not provided)
+            account: Account info dict (optional)
+            
+        Returns:
+            List of tick dictionaries
+        """
+        server, to_date = self._ensure_ticks_in_db(symbol, from_date, to_date, server, account)
+        
         # Get ticks from database
         return tick_db_manager.get_ticks(server, symbol, from_date, to_date)
     
+    def get_ticks_array_from_db(self, symbol: str, from_date: datetime,
+                                to_date: datetime, server: str = None,
+                                account: Dict[str, Any] = None) -> np.ndarray:
+        """
+        Same as get_ticks_from_db(), but returns a structured array (TICK_DTYPE)
+        
+        Returns:
+            Array with time/bid/ask/volume/flags fields, sorted by time
+        """
+        server, to_date = self._ensure_ticks_in_db(symbol, from_date, to_date, server, account)
+        return tick_db_manager.get_ticks_array(server, symbol, from_date, to_date)
+    
+    def get_tick_extreme(self, symbol: str, from_date: datetime, to_date: datetime,
+                         column: str, server: str = None,
+                         account: Dict[str, Any] = None) -> Optional[float]:
+        """
+        Get MIN(bid) or MAX(ask) for the period without loading the ticks
+        
+        Args:
+            symbol: Trading symbol
+            from_date: Start date (local time)
+            to_date: End date (local time)
+            column: 'bid' for the lowest bid, 'ask' for the highest ask
+            server: Server name (optional, will be detected if not provided)
+            account: Account info dict (optional)
+            
+        Returns:
+            Extreme price or None if there are no ticks in the period
+        """
+        server, to_date = self._ensure_ticks_in_db(symbol, from_date, to_date, server, account)
+        return tick_db_manager.get_tick_extreme(server, symbol, from_date, to_date, column)
+    
     def get_high_low_prices(self, symbol: str, from_date: datetime, 
                            to_date: datetime, server: str = None,
                            account: Dict[str, Any] = None) -> Dict[str, float]:
@@ -486,18 +541,18 @@ class MT5TickProvider:
                 if not server:
                     raise ValueError("Server must be provided or determined from account info")
         
-        ticks = self.get_ticks_from_db(symbol, from_date, to_date, server=server, account=account)
+        ticks = self.get_ticks_array_from_db(symbol, from_date, to_date, server=server, account=account)
         
-        if not ticks:
+        if len(ticks) == 0:
             return {"high": None, "low": None}
         
-        # get_ticks_from_db уже фильтрует тики по времени при запросе к БД
+        # get_ticks_array_from_db уже фильтрует тики по времени при запросе к БД
         # Тики из БД имеют UTC timestamps, и они уже отфильтрованы по нужному диапазону
         # Используем тики напрямую без дополнительной фильтрации
         
         # Find highest ask and lowest bid
-        high = max(tick["ask"] for tick in ticks)
-        low = min(tick["bid"] for tick in ticks)
+        high = float(ticks["ask"].max())
+        low = float(ticks["bid"].min())
         
         return {"high": high, "low": low}
 
@@ -6,7 +6,7 @@ from typing import Dict, Any, List, Optional
 from sqlalchemy import func
 
 from ..db_sa.session import SessionLocal
-from ..db_sa.models import Deal, DealDrawdown, MagicGroupAssignment, MagicGroup, Position, AccountInfo, Magic
+from ..db_sa.models import Deal, MagicGroupAssignment, MagicGroup, Position, AccountInfo, Magic
 
 
 def get_period_aggregates(account_id: str, from_dt: datetime, to_dt: datetime) -> Dict[str, Any]:
@@ -175,12 +175,7 @@ def get_groups(account_id: str) -> List[Dict[str, Any]]:
 def get_deals(account_id: str, from_dt: datetime, to_dt: datetime) -> List[Dict[str, Any]]:
     with SessionLocal() as session:
         rows = (
-            session.query(Deal, DealDrawdown)
-            .outerjoin(
-                DealDrawdown,
-                (DealDrawdown.account_id == Deal.account_id)
-                & (DealDrawdown.ticket_id == Deal.ticket_id),
-            )
+            session.query(Deal)
             .filter(
                 Deal.account_id == account_id,
                 Deal.is_closed.is_(True),
@@ -192,7 +187,7 @@ def get_deals(account_id: str, from_dt: datetime, to_dt: datetime) -> List[Dict[
         )
 
     result = []
-    for deal, drawdown in rows:
+    for deal in rows:
         result.append(
             {
                 "position_id": deal.position_id,
@@ -207,8 +202,8 @@ def get_deals(account_id: str, from_dt: datetime, to_dt: datetime) -> List[Dict[
                 "exit_price": deal.exit_price,
                 "profit": deal.profit or 0.0,
                 "comment": deal.comment,
-                "max_drawdown_points": drawdown.max_drawdown_points if drawdown else None,
-                "max_drawdown_currency": drawdown.max_drawdown_currency if drawdown else None,
+                "max_drawdown_points": deal.max_drawdown_points,
+                "max_drawdown_currency": deal.max_drawdown_currency,
                 "status": "closed" if deal.is_closed else "open",
             }
         )
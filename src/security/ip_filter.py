@@ -1,58 +1,91 @@
 """IP whitelist middleware for FastAPI."""
 
+import ipaddress
 import os
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from typing import Optional
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from ..utils.logger import get_logger
 
 logger = get_logger()
 
 
-class IPFilterMiddleware(BaseHTTPMiddleware):
+class IPFilterMiddleware:
     """
     Middleware to filter requests by IP address.
     
     Configure via IP_WHITELIST environment variable:
     - Empty or not set: allow all IPs
-    - Comma-separated list: only allow listed IPs
+    - Comma-separated list of IPs and/or CIDR networks: only allow those
+    
+    Example: IP_WHITELIST=192.168.1.100,10.0.0.0/24
     
-    Example: IP_WHITELIST=192.168.1.100,10.0.0.1
+    Implemented as a plain ASGI middleware: no per-request Request object and
+    no BaseHTTPMiddleware task/stream wrapping.
     """
     
-    def __init__(self, app):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp):
+        self.app = app
         whitelist = os.getenv("IP_WHITELIST", "")
-        self.allowed_ips = set(ip.strip() for ip in whitelist.split(",") if ip.strip())
+        entries = [ip.strip() for ip in whitelist.split(",") if ip.strip()]
+        self.allowed_ips = frozenset(entry for entry in entries if "/" not in entry)
+        self.allowed_networks = tuple(
+            ipaddress.ip_network(entry, strict=False) for entry in entries if "/" in entry
+        )
+        self.enabled = bool(self.allowed_ips or self.allowed_networks)
         
-        if self.allowed_ips:
-            logger.info(f"IP whitelist enabled: {len(self.allowed_ips)} IPs allowed")
+        if self.enabled:
+            logger.info(
+                f"IP whitelist enabled: {len(self.allowed_ips)} IPs, "
+                f"{len(self.allowed_networks)} networks allowed"
+            )
         else:
             logger.info("IP whitelist disabled: all IPs allowed")
     
-    async def dispatch(self, request: Request, call_next) -> Response:
-        # If whitelist is empty, allow all
-        if not self.allowed_ips:
-            return await call_next(request)
+    @staticmethod
+    def _client_ip(scope: Scope) -> Optional[str]:
+        client = scope.get("client")
+        client_ip = client[0] if client else None
         
-        # Get client IP
-        client_ip = request.client.host if request.client else None
+        headers = dict(scope.get("headers") or ())
         
         # Check X-Forwarded-For header for reverse proxy support
-        forwarded = request.headers.get("X-Forwarded-For")
+        forwarded = headers.get(b"x-forwarded-for")
         if forwarded:
             # Take the first IP in the chain (original client)
-            client_ip = forwarded.split(",")[0].strip()
+            client_ip = forwarded.decode("latin-1").split(",")[0].strip()
         
         # Also check X-Real-IP header (nginx)
-        real_ip = request.headers.get("X-Real-IP")
+        real_ip = headers.get(b"x-real-ip")
         if real_ip:
-            client_ip = real_ip.strip()
+            client_ip = real_ip.decode("latin-1").strip()
+        
+        return client_ip
+    
+    def _is_allowed(self, client_ip: Optional[str]) -> bool:
+        if client_ip in self.allowed_ips:
+            return True
+        if not self.allowed_networks or not client_ip:
+            return False
+        try:
+            address = ipaddress.ip_address(client_ip)
+        except ValueError:
+            return False
+        return any(address in network for network in self.allowed_networks)
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # If whitelist is empty, allow all
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
         
-        # Check if IP is allowed
-        if client_ip not in self.allowed_ips:
+        client_ip = self._client_ip(scope)
+        if not self._is_allowed(client_ip):
             logger.warning(f"Access denied for IP: {client_ip}")
-            raise HTTPException(status_code=403, detail="Access denied")
+            response = JSONResponse({"detail": "Access denied"}, status_code=403)
+            await response(scope, receive, send)
+            return
         
-        return await call_next(request)
+        await self.app(scope, receive, send)
@@ -11,17 +11,22 @@ from datetime import datetime
 from typing import Optional, Dict, Any, List
 
 from ..db_sa.session import SessionLocal
-from ..db_sa.models import Account, AccountInfo, AccountCredentials
+from ..db_sa.models import Account, AccountCredentials
 from ..security.crypto import encrypt_text, decrypt_text
+from ..utils.cache import ttl_cache
 from ..utils.logger import get_logger
 
 logger = get_logger()
 
+# Seconds a cached account list stays valid (writes invalidate it immediately)
+LIST_CACHE_TTL = 30
+
 
 class AccountService:
     """Service for account management operations."""
     
     @staticmethod
+    @ttl_cache(ttl=LIST_CACHE_TTL)
     def list_accounts() -> List[Dict[str, Any]]:
         """
         Get all accounts with their info and credential status.
@@ -29,14 +34,14 @@ class AccountService:
         Returns:
             List of account dictionaries with account_id, label, account_info, has_credentials
         """
+        # Account.info and Account.credentials are joined-loaded: one query
         with SessionLocal() as session:
             accounts = session.query(Account).all()
-            infos = {info.account_id: info for info in session.query(AccountInfo).all()}
-            creds = {c.account_id: c for c in session.query(AccountCredentials).all()}
 
         result = []
         for acc in accounts:
-            info = infos.get(acc.account_id)
+            info = acc.info
+            creds = acc.credentials
             result.append({
                 "account_id": acc.account_id,
                 "label": acc.label or acc.account_id,
@@ -46,10 +51,15 @@ class AccountService:
                     "leverage": info.leverage if info else 0,
                     "server": info.server if info else "",
                 },
-                "has_credentials": bool(creds.get(acc.account_id) and creds[acc.account_id].password_encrypted),
+                "has_credentials": bool(creds and creds.password_encrypted),
             })
         return result
     
+    @staticmethod
+    def clear_cache() -> None:
+        """Invalidate the cached account list."""
+        AccountService.list_accounts.cache_clear()
+    
     @staticmethod
     def get_credentials(account_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -110,6 +120,7 @@ class AccountService:
                 creds.password_encrypted = encrypted
             session.commit()
             
+        AccountService.clear_cache()
         logger.info(f"Credentials saved for account {account_id}")
         return True
     
@@ -132,6 +143,7 @@ class AccountService:
             account.label = label
             session.commit()
             
+        AccountService.clear_cache()
         logger.info(f"Label updated for account {account_id}: {label}")
         return True
     
@@ -154,6 +166,7 @@ class AccountService:
             account.history_start_date = history_start_date
             session.commit()
             
+        AccountService.clear_cache()
         logger.info(f"History start date updated for account {account_id}: {history_start_date}")
         return True
     
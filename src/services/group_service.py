@@ -12,15 +12,20 @@ from typing import Optional, Dict, Any, List
 from ..db_sa.session import SessionLocal
 from ..db_sa.models import MagicGroup, MagicGroupAssignment, Magic
 from ..readmodels.dashboard_queries import get_magics_with_groups, get_groups
+from ..utils.cache import ttl_cache
 from ..utils.logger import get_logger
 
 logger = get_logger()
 
+# Seconds cached magic/group lists stay valid (writes invalidate them immediately)
+LIST_CACHE_TTL = 30
+
 
 class GroupService:
     """Service for magic group management operations."""
     
     @staticmethod
+    @ttl_cache(ttl=LIST_CACHE_TTL)
     def list_magics(account_id: str) -> List[Dict[str, Any]]:
         """
         Get all magics with their group assignments.
@@ -34,6 +39,7 @@ class GroupService:
         return get_magics_with_groups(account_id)
     
     @staticmethod
+    @ttl_cache(ttl=LIST_CACHE_TTL)
     def list_groups(account_id: str) -> List[Dict[str, Any]]:
         """
         Get all groups for an account.
@@ -46,6 +52,12 @@ class GroupService:
         """
         return get_groups(account_id)
     
+    @staticmethod
+    def clear_cache() -> None:
+        """Invalidate cached magic and group lists."""
+        GroupService.list_magics.cache_clear()
+        GroupService.list_groups.cache_clear()
+    
     @staticmethod
     def create_group(
         account_id: str,
@@ -88,6 +100,7 @@ class GroupService:
                 "fill_color": group.fill_color,
             }
             
+        GroupService.clear_cache()
         logger.info(f"Group created: {name} (id={result['group_id']}) for account {account_id}")
         return result
     
@@ -131,6 +144,7 @@ class GroupService:
             
             session.commit()
             
+        GroupService.clear_cache()
         logger.info(f"Group updated: id={group_id}")
         return True
     
@@ -161,6 +175,7 @@ class GroupService:
             
             session.commit()
             
+        GroupService.clear_cache()
         logger.info(f"Group deleted: id={group_id} for account {account_id}")
         return deleted > 0
     
@@ -196,6 +211,7 @@ class GroupService:
             
             session.commit()
             
+        GroupService.clear_cache()
         logger.info(f"Group assignments updated: group_id={group_id}, magics={magic_ids}")
         return True
     
@@ -225,5 +241,6 @@ class GroupService:
             
             session.commit()
             
+        GroupService.clear_cache()
         logger.info(f"Magic labels updated for account {account_id}: {len(labels)} labels")
         return True
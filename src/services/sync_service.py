@@ -20,6 +20,7 @@ from ..analytics.drawdown import calculate_drawdown_for_deals
 from ..config.settings import Config
 from ..utils.logger import get_logger
 from .account_service import AccountService
+from .group_service import GroupService
 
 logger = get_logger()
 
@@ -30,6 +31,12 @@ _mt5_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="mt5_sync_"
 class SyncService:
     """Service for MT5 data synchronization operations."""
     
+    @staticmethod
+    def _clear_read_caches() -> None:
+        """Sync may add accounts, magics and account info: drop cached lists."""
+        AccountService.clear_cache()
+        GroupService.clear_cache()
+    
     @staticmethod
     def _get_active_account_sync():
         """Synchronous MT5 connection for thread pool."""
@@ -132,6 +139,7 @@ class SyncService:
                 return {"status": "error", "detail": "Active terminal account not found"}
             
             await loop.run_in_executor(_mt5_executor, sync_open_positions)
+            SyncService._clear_read_caches()
             logger.info(f"Open positions synced for active account {info.login}")
             return {"status": "ok", "account_id": str(info.login)}
 
@@ -151,6 +159,7 @@ class SyncService:
             _mt5_executor, 
             lambda: sync_open_positions(account=account)
         )
+        SyncService._clear_read_caches()
         logger.info(f"Open positions synced for account {account_id}")
         return {"status": "ok", "account_id": account_id}
     
@@ -203,6 +212,7 @@ class SyncService:
                     lambda: calculate_drawdown_for_deals(updated)
                 )
             
+            SyncService._clear_read_caches()
             summary = SyncService.build_sync_summary(active_account_id, updated)
             logger.info(f"History synced for active account {active_account_id}: {summary['new_deals_total']} new deals")
             return {"status": "ok", "account_id": active_account_id, **summary}
@@ -238,6 +248,7 @@ class SyncService:
                 lambda: calculate_drawdown_for_deals(updated)
             )
         
+        SyncService._clear_read_caches()
         summary = SyncService.build_sync_summary(account_id, updated)
         logger.info(f"History synced for account {account_id}: {summary['new_deals_total']} new deals")
         return {"status": "ok", "account_id": account_id, **summary}
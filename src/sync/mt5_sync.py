@@ -4,13 +4,18 @@ from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional, Tuple
 
 import MetaTrader5 as mt5
+from sqlalchemy import select, update
 
 from ..utils.logger import get_logger
 from ..db_sa.session import SessionLocal
-from ..db_sa.models import Account, AccountInfo, Deal, Position, Magic
+from ..db_sa.models import Account, AccountInfo, Deal, Position
+from ..db_sa.bulk import upsert_deals, upsert_positions, insert_magics
 from ..mt5.mt5_client import MT5DataProvider
 logger = get_logger()
 
+# Keys per IN (...) query when prefetching stored rows
+SYNC_QUERY_CHUNK = 500
+
 
 def _mt5_time_to_utc_dt(timestamp: Optional[float]) -> Optional[datetime]:
     if not timestamp:
@@ -157,6 +162,15 @@ def _ensure_account(session, account_info) -> str:
     return account_id
 
 
+def _fetch_by_ids(session, stmt, id_column, ids: List[int]) -> List[Tuple]:
+    """Rows of ``stmt`` restricted to ``ids``, one IN (...) query per chunk."""
+    rows = []
+    for start in range(0, len(ids), SYNC_QUERY_CHUNK):
+        chunk = ids[start:start + SYNC_QUERY_CHUNK]
+        rows.extend(session.execute(stmt.where(id_column.in_(chunk))).tuples())
+    return rows
+
+
 def sync_open_positions(account: Dict[str, Any] = None) -> None:
     provider = MT5DataProvider()
     positions, account_info = provider.get_open_positions(account)
@@ -166,48 +180,40 @@ def sync_open_positions(account: Dict[str, Any] = None) -> None:
 
     with SessionLocal() as session:
         account_id = _ensure_account(session, account_info)
-        active_ids = set()
+        session.flush()
 
+        rows = []
         for pos in positions:
-            position_id = int(getattr(pos, "ticket", 0) or 0)
-            active_ids.add(position_id)
-
-            direction = _direction_from_type(getattr(pos, "type", None))
-            entry_time = _mt5_time_to_utc_dt(getattr(pos, "time", None))
-
-            entry = session.get(Position, {"account_id": account_id, "position_id": position_id})
-            if not entry:
-                entry = Position(
-                    account_id=account_id,
-                    position_id=position_id,
-                    magic=int(getattr(pos, "magic", 0) or 0),
-                    symbol=getattr(pos, "symbol", ""),
-                    direction=direction,
-                    volume=float(getattr(pos, "volume", 0.0) or 0.0),
-                    entry_time=entry_time,
-                    entry_price=float(getattr(pos, "price_open", 0.0) or 0.0),
-                    current_price=float(getattr(pos, "price_current", 0.0) or 0.0),
-                    profit=float(getattr(pos, "profit", 0.0) or 0.0),
-                    swap=float(getattr(pos, "swap", 0.0) or 0.0),
-                    is_open=True,
-                )
-                session.add(entry)
-            else:
-                entry.direction = direction
-                entry.volume = float(getattr(pos, "volume", entry.volume or 0.0) or 0.0)
-                entry.current_price = float(getattr(pos, "price_current", entry.current_price or 0.0) or 0.0)
-                entry.profit = float(getattr(pos, "profit", entry.profit or 0.0) or 0.0)
-                entry.swap = float(getattr(pos, "swap", entry.swap or 0.0) or 0.0)
-                entry.is_open = True
-
-        existing_positions = (
-            session.query(Position)
-            .filter(Position.account_id == account_id, Position.is_open.is_(True))
-            .all()
+            rows.append(
+                {
+                    "account_id": account_id,
+                    "position_id": int(getattr(pos, "ticket", 0) or 0),
+                    "magic": int(getattr(pos, "magic", 0) or 0),
+                    "symbol": getattr(pos, "symbol", ""),
+                    "direction": _direction_from_type(getattr(pos, "type", None)),
+                    "volume": float(getattr(pos, "volume", 0.0) or 0.0),
+                    "entry_time": _mt5_time_to_utc_dt(getattr(pos, "time", None)),
+                    "entry_price": float(getattr(pos, "price_open", 0.0) or 0.0),
+                    "current_price": float(getattr(pos, "price_current", 0.0) or 0.0),
+                    "profit": float(getattr(pos, "profit", 0.0) or 0.0),
+                    "swap": float(getattr(pos, "swap", 0.0) or 0.0),
+                    "is_open": True,
+                }
+            )
+        # New positions are inserted whole; stored ones get their live values
+        upsert_positions(session, rows)
+
+        # Positions no longer reported by the terminal are closed
+        session.execute(
+            update(Position)
+            .where(
+                Position.account_id == account_id,
+                Position.is_open.is_(True),
+                Position.position_id.not_in([row["position_id"] for row in rows]),
+            )
+            .values(is_open=False)
+            .execution_options(synchronize_session=False)
         )
-        for existing in existing_positions:
-            if existing.position_id not in active_ids:
-                existing.is_open = False
 
         session.commit()
 
@@ -226,63 +232,56 @@ def sync_deals_history(
         return []
 
     aggregated = _aggregate_deals(list(deals))
+    items = [item for item in aggregated if item["ticket_id"]]
+    if len(items) < len(aggregated):
+        logger.debug(f"sync_deals_history: skipped {len(aggregated) - len(items)} deals without ticket_id")
 
     updated_closed: List[Tuple[str, int]] = []
 
     with SessionLocal() as session:
         account_id = _ensure_account(session, account_info)
-        seen_magics = set()
-        for item in aggregated:
-            if not item["ticket_id"]:
-                logger.debug("sync_deals_history: skipped deal without ticket_id")
-                continue
-
-            deal = session.get(Deal, {"account_id": account_id, "ticket_id": item["ticket_id"]})
-            was_closed = bool(deal.is_closed) if deal else False
-            magic_id = item["magic"]
-            if not magic_id:
-                if deal and deal.magic:
-                    magic_id = deal.magic
-                elif item["position_id"]:
-                    position = session.get(
-                        Position,
-                        {"account_id": account_id, "position_id": item["position_id"]},
-                    )
-                    if position and position.magic:
-                        magic_id = position.magic
-                if magic_id is None:
-                    magic_id = 0
-            if not deal:
-                deal_data = dict(item)
-                deal_data["magic"] = magic_id
-                deal = Deal(account_id=account_id, **deal_data)
-                session.add(deal)
-            else:
-                deal.position_id = item["position_id"]
-                if magic_id != 0 or not deal.magic:
-                    deal.magic = magic_id
-                deal.symbol = item["symbol"]
-                deal.direction = item["direction"]
-                deal.volume = item["volume"]
-                deal.entry_time = item["entry_time"]
-                deal.entry_price = item["entry_price"]
-                deal.exit_time = item["exit_time"]
-                deal.exit_price = item["exit_price"]
-                deal.profit = item["profit"]
-                deal.commission = item["commission"]
-                deal.swap = item["swap"]
-                deal.comment = item.get("comment")
-                deal.is_closed = item["is_closed"]
-
-            if magic_id is not None and magic_id != 0 and magic_id not in seen_magics:
-                seen_magics.add(magic_id)
-                magic_entry = session.get(Magic, {"account_id": account_id, "id": magic_id})
-                if not magic_entry:
-                    session.add(Magic(id=magic_id, account_id=account_id))
+        session.flush()
+
+        # Stored magic and closed state of the synced deals, in bulk
+        stored_deals = {
+            ticket_id: (magic, bool(is_closed))
+            for ticket_id, magic, is_closed in _fetch_by_ids(
+                session,
+                select(Deal.ticket_id, Deal.magic, Deal.is_closed).where(Deal.account_id == account_id),
+                Deal.ticket_id,
+                [item["ticket_id"] for item in items],
+            )
+        }
+        # Deals without a magic fall back to the stored deal's, then the position's
+        fallback_position_ids = [
+            item["position_id"]
+            for item in items
+            if not item["magic"] and not stored_deals.get(item["ticket_id"], (None,))[0] and item["position_id"]
+        ]
+        position_magics = dict(
+            _fetch_by_ids(
+                session,
+                select(Position.position_id, Position.magic).where(Position.account_id == account_id),
+                Position.position_id,
+                fallback_position_ids,
+            )
+        )
+
+        rows = []
+        magic_ids = set()
+        for item in items:
+            stored_magic, was_closed = stored_deals.get(item["ticket_id"], (None, False))
+            magic_id = item["magic"] or stored_magic or position_magics.get(item["position_id"]) or 0
+            rows.append({**item, "account_id": account_id, "magic": magic_id})
+            if magic_id:
+                magic_ids.add(magic_id)
 
             if item["is_closed"] and (not was_closed):
                 updated_closed.append((account_id, item["ticket_id"]))
 
+        upsert_deals(session, rows)
+        insert_magics(session, [{"account_id": account_id, "id": magic_id} for magic_id in magic_ids])
+
         session.commit()
 
     logger.info(f"sync_deals_history: synced {len(aggregated)} deals for account {account_info.login}")
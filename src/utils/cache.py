@@ -0,0 +1,61 @@
+"""
+In-process TTL cache for slow-changing read results
+"""
+
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Tuple
+
+
+def ttl_cache(ttl: float, maxsize: int = 128) -> Callable:
+    """
+    Cache function results per positional/keyword arguments for ``ttl`` seconds
+
+    The wrapped function gets a ``cache_clear()`` attribute; call it from
+    write paths that change the cached data. Cached values are shared between
+    callers and must not be mutated.
+
+    Args:
+        ttl: Time to live of a cached result in seconds
+        maxsize: Maximum number of cached argument combinations
+    """
+    def decorator(func: Callable) -> Callable:
+        cache: Dict[Tuple, Tuple[float, Any]] = {}
+        lock = threading.Lock()
+        # Bumped by cache_clear(); a result computed across a clear may
+        # predate the write that cleared it and is not stored
+        generation = [0]
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            with lock:
+                entry = cache.get(key)
+                if entry is not None and entry[0] > now:
+                    return entry[1]
+                started_generation = generation[0]
+
+            value = func(*args, **kwargs)
+            with lock:
+                if generation[0] != started_generation:
+                    return value
+                if len(cache) >= maxsize:
+                    # Drop expired entries first, then the oldest one
+                    for stale_key in [k for k, (expires, _) in cache.items() if expires <= now]:
+                        del cache[stale_key]
+                    if len(cache) >= maxsize:
+                        del cache[next(iter(cache))]
+                cache[key] = (now + ttl, value)
+            return value
+
+        def cache_clear() -> None:
+            with lock:
+                cache.clear()
+                generation[0] += 1
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
@@ -6,7 +6,7 @@ import pprint
 import time as time_mod
 from datetime import datetime, timedelta, time
 from typing import Dict, Any, List, Optional
-from ..config.settings import Config
+from ..config.settings import Config, COLOR_SCHEMES, PERFORMANCE_THRESHOLDS
 
 
 class PrettyPrinter:
@@ -79,13 +79,13 @@ class PerformanceUtils:
     def get_performance_color(percentage: float) -> str:
         """Get color based on performance percentage"""
         if percentage >= 0:
-            return Config.COLOR_SCHEMES["positive"]
-        elif percentage >= Config.PERFORMANCE_THRESHOLDS["warning"]:
-            return Config.COLOR_SCHEMES["negative_warning"]
-        elif percentage >= Config.PERFORMANCE_THRESHOLDS["critical"]:
-            return Config.COLOR_SCHEMES["negative_critical"]
+            return COLOR_SCHEMES["positive"]
+        elif percentage >= PERFORMANCE_THRESHOLDS["warning"]:
+            return COLOR_SCHEMES["negative_warning"]
+        elif percentage >= PERFORMANCE_THRESHOLDS["critical"]:
+            return COLOR_SCHEMES["negative_critical"]
         else:
-            return Config.COLOR_SCHEMES["negative_danger"]
+            return COLOR_SCHEMES["negative_danger"]
     
     @staticmethod
     def format_currency(amount: float, currency: str = "USD") -> str:
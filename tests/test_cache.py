@@ -0,0 +1,66 @@
+"""
+Tests for the in-process TTL cache
+
+python -m unittest tests.test_cache
+"""
+
+import sys
+import os
+import unittest
+
+# Добавляем корневую папку проекта в путь
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.cache import ttl_cache
+
+
+class TestTtlCache(unittest.TestCase):
+    """Test ttl_cache hits and invalidation"""
+
+    def test_cached_until_cleared(self):
+        """Test results are reused until cache_clear()"""
+        calls = []
+
+        @ttl_cache(ttl=60)
+        def read(key):
+            calls.append(key)
+            return len(calls)
+
+        self.assertEqual(read("a"), 1)
+        self.assertEqual(read("a"), 1)
+        self.assertEqual(read("b"), 2)
+        read.cache_clear()
+        self.assertEqual(read("a"), 3)
+
+    def test_expired_result_is_recomputed(self):
+        """Test a result older than ttl is not served"""
+        calls = []
+
+        @ttl_cache(ttl=0)
+        def read():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(read(), 1)
+        self.assertEqual(read(), 2)
+
+    def test_clear_during_call_is_not_overwritten(self):
+        """Test a result computed across a cache_clear() is not stored"""
+        rows = ["old"]
+
+        @ttl_cache(ttl=60)
+        def read():
+            value = list(rows)
+            # A write commits and invalidates while this read is running
+            if value == ["old"]:
+                rows[0] = "new"
+                read.cache_clear()
+            return value
+
+        self.assertEqual(read(), ["old"])
+        self.assertEqual(read(), ["new"])
+        self.assertEqual(read(), ["new"])
+
+
+if __name__ == '__main__':
+    unittest.main()
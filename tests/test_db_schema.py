@@ -0,0 +1,138 @@
+"""
+Tests for upgrading existing SQLAlchemy databases in init_database()
+
+python -m unittest tests.test_db_schema
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import unittest
+from contextlib import closing
+from unittest import mock
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+# Добавляем корневую папку проекта в путь
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.db_sa import init_db
+from src.db_sa.models import Deal
+
+# accounts, deals and deal_drawdowns as created before drawdowns moved into deals
+BASELINE_SCHEMA = """
+CREATE TABLE accounts (
+    account_id VARCHAR NOT NULL,
+    label VARCHAR,
+    history_start_date DATETIME,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    PRIMARY KEY (account_id)
+);
+CREATE TABLE deals (
+    ticket_id INTEGER NOT NULL,
+    position_id INTEGER NOT NULL,
+    account_id VARCHAR NOT NULL,
+    magic INTEGER,
+    symbol VARCHAR NOT NULL,
+    direction VARCHAR,
+    volume FLOAT,
+    entry_time DATETIME,
+    entry_price FLOAT,
+    exit_time DATETIME,
+    exit_price FLOAT,
+    profit FLOAT,
+    commission FLOAT,
+    swap FLOAT,
+    comment VARCHAR,
+    is_closed BOOLEAN NOT NULL,
+    updated_at DATETIME NOT NULL,
+    CONSTRAINT pk_deals PRIMARY KEY (account_id, ticket_id),
+    FOREIGN KEY(account_id) REFERENCES accounts (account_id)
+);
+CREATE INDEX ix_deals_symbol ON deals (symbol);
+CREATE INDEX ix_deals_account_id ON deals (account_id);
+CREATE INDEX ix_deals_magic ON deals (magic);
+CREATE TABLE deal_drawdowns (
+    account_id VARCHAR NOT NULL,
+    ticket_id INTEGER NOT NULL,
+    max_drawdown_points FLOAT,
+    max_drawdown_currency FLOAT,
+    calculated_at DATETIME NOT NULL,
+    PRIMARY KEY (account_id, ticket_id),
+    CONSTRAINT fk_deal_drawdowns_deals FOREIGN KEY(account_id, ticket_id) REFERENCES deals (account_id, ticket_id)
+);
+INSERT INTO accounts VALUES ('12345', 'Demo', NULL, '2025-01-01 00:00:00', '2025-01-01 00:00:00');
+INSERT INTO deals (ticket_id, position_id, account_id, magic, symbol, is_closed, profit, updated_at) VALUES
+    (11, 1, '12345', 7, 'EURUSD', 1, 3.5, '2025-01-01 00:00:00'),
+    (12, 2, '12345', 7, 'EURUSD', 1, -1.0, '2025-01-01 00:00:00');
+INSERT INTO deal_drawdowns VALUES ('12345', 11, -42.0, -4.2, '2025-02-01 10:00:00');
+"""
+
+
+class TestDealDrawdownMigration(unittest.TestCase):
+    """Test deal_drawdowns rows are moved onto deals"""
+
+    def setUp(self):
+        self.db_path = os.path.join(tempfile.mkdtemp(), "dashboard.db")
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            conn.executescript(BASELINE_SCHEMA)
+        self.engine = create_engine(f"sqlite:///{self.db_path}")
+        self.addCleanup(self.engine.dispose)
+
+        # init_database() runs against the test engine, as on a fresh process
+        for patcher in (
+            mock.patch.object(init_db, "engine", self.engine),
+            mock.patch.object(init_db, "_initialized", False),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def restart(self):
+        init_db._initialized = False
+        init_db.init_database()
+
+    def query(self, sql: str):
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            return conn.execute(sql).fetchall()
+
+    def test_drawdowns_moved_to_deals(self):
+        """Test drawdown values land on deals and deal_drawdowns is dropped"""
+        self.restart()
+
+        with Session(self.engine) as session:
+            deal = session.get(Deal, ("12345", 11))
+            self.assertEqual(deal.max_drawdown_points, -42.0)
+            self.assertEqual(deal.max_drawdown_currency, -4.2)
+            self.assertEqual(str(deal.drawdown_calculated_at), "2025-02-01 10:00:00")
+            self.assertEqual(deal.profit, 3.5)
+
+            other = session.get(Deal, ("12345", 12))
+            self.assertIsNone(other.max_drawdown_points)
+            self.assertIsNone(other.drawdown_calculated_at)
+
+        tables = {row[0] for row in self.query("SELECT name FROM sqlite_master WHERE type='table'")}
+        self.assertNotIn("deal_drawdowns", tables)
+        self.assertEqual(self.query("PRAGMA user_version"), [(init_db.SCHEMA_VERSION,)])
+
+    def test_second_startup_changes_nothing(self):
+        """Test an upgraded database is not altered again"""
+        self.restart()
+        deals_before = self.query("SELECT * FROM deals ORDER BY ticket_id")
+
+        statements = []
+        event.listen(
+            self.engine, "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement.split()[0].upper())
+        )
+        self.restart()
+
+        self.assertTrue(statements)
+        self.assertFalse({"ALTER", "UPDATE", "DROP", "CREATE", "ANALYZE"} & set(statements), statements)
+        self.assertEqual(self.query("SELECT * FROM deals ORDER BY ticket_id"), deals_before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+"""
+Tests for syncing MT5 deals and positions into SQLAlchemy
+
+Runs on an in-memory SQLite database with a stubbed MT5 data provider.
+
+python -m unittest tests.test_mt5_sync
+"""
+
+import sys
+import os
+import types
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Добавляем корневую папку проекта в путь
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import MetaTrader5  # noqa: F401
+except ImportError:
+    # The terminal package is Windows-only; sync only reads its deal entry constants
+    sys.modules["MetaTrader5"] = types.SimpleNamespace(
+        DEAL_ENTRY_IN=0, DEAL_ENTRY_OUT=1, DEAL_ENTRY_INOUT=2, DEAL_ENTRY_OUT_BY=3
+    )
+
+from src.db_sa.models import Account, Base, Deal, Magic, Position
+from src.sync import mt5_sync
+
+ACCOUNT_ID = "12345"
+
+
+def deal_event(ticket, position_id, entry, magic=7, time=1_700_000_000, profit=0.0):
+    return SimpleNamespace(
+        ticket=ticket, position_id=position_id, entry=entry, magic=magic, time=time,
+        symbol="EURUSD", type=0, volume=0.1, price=1.1, profit=profit, commission=0.0, swap=0.0, comment="",
+    )
+
+
+def open_position(ticket, magic=9):
+    return SimpleNamespace(
+        ticket=ticket, magic=magic, symbol="EURUSD", type=0, volume=0.1, time=1_700_000_000,
+        price_open=1.1, price_current=1.2, profit=1.0, swap=0.0,
+    )
+
+
+class StubProvider:
+    """MT5DataProvider replacement returning the test's deals and positions"""
+
+    deals = []
+    positions = []
+    account_info = SimpleNamespace(
+        login=int(ACCOUNT_ID), leverage=100, server="Test-Server", currency="USD", balance=1000.0, equity=1000.0
+    )
+
+    def get_history(self, account, from_date, to_date):
+        return list(self.deals), self.account_info
+
+    def get_open_positions(self, account):
+        return list(self.positions), self.account_info
+
+
+class TestMT5Sync(unittest.TestCase):
+    """Test bulk deal and position sync"""
+
+    def setUp(self):
+        engine = create_engine(
+            "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        Base.metadata.create_all(engine)
+        self.addCleanup(engine.dispose)
+        self.Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+        StubProvider.deals = []
+        StubProvider.positions = []
+        for patcher in (
+            mock.patch.object(mt5_sync, "SessionLocal", self.Session),
+            mock.patch.object(mt5_sync, "MT5DataProvider", StubProvider),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def sync_deals(self):
+        return mt5_sync.sync_deals_history(None, None)
+
+    def test_magic_falls_back_to_position(self):
+        """Test a deal without magic takes the stored position's magic"""
+        StubProvider.positions = [open_position(2, magic=9)]
+        mt5_sync.sync_open_positions()
+
+        StubProvider.deals = [deal_event(20, 2, entry=0, magic=0)]
+        self.sync_deals()
+
+        with self.Session() as session:
+            self.assertEqual(session.get(Deal, (ACCOUNT_ID, 20)).magic, 9)
+            self.assertIsNotNone(session.get(Magic, (ACCOUNT_ID, 9)))
+
+    def test_closed_deals_reported_once(self):
+        """Test a second sync returns no newly closed deals"""
+        StubProvider.deals = [
+            deal_event(10, 1, entry=0),
+            deal_event(11, 1, entry=1, time=1_700_000_100, profit=5.0),
+            deal_event(20, 2, entry=0),
+        ]
+        self.assertEqual(self.sync_deals(), [(ACCOUNT_ID, 11)])
+        self.assertEqual(self.sync_deals(), [])
+
+        # Position 2 closes later: only its deal is reported
+        StubProvider.deals.append(deal_event(21, 2, entry=1, time=1_700_000_200))
+        self.assertEqual(self.sync_deals(), [(ACCOUNT_ID, 21)])
+
+        with self.Session() as session:
+            self.assertTrue(session.get(Deal, (ACCOUNT_ID, 11)).is_closed)
+            self.assertEqual(session.get(Deal, (ACCOUNT_ID, 11)).profit, 5.0)
+
+    def test_magic_labels_survive_sync(self):
+        """Test syncing deals keeps labels of magics already stored"""
+        with self.Session() as session:
+            session.add(Account(account_id=ACCOUNT_ID))
+            session.add(Magic(account_id=ACCOUNT_ID, id=7, label="Scalper"))
+            session.commit()
+
+        StubProvider.deals = [deal_event(10, 1, entry=0, magic=7), deal_event(30, 3, entry=0, magic=8)]
+        self.sync_deals()
+
+        with self.Session() as session:
+            self.assertEqual(session.get(Magic, (ACCOUNT_ID, 7)).label, "Scalper")
+            self.assertIsNone(session.get(Magic, (ACCOUNT_ID, 8)).label)
+
+    def test_missing_positions_closed(self):
+        """Test positions the terminal no longer reports are closed"""
+        StubProvider.positions = [open_position(2), open_position(3)]
+        mt5_sync.sync_open_positions()
+
+        StubProvider.positions = [open_position(2)]
+        mt5_sync.sync_open_positions()
+        with self.Session() as session:
+            self.assertTrue(session.get(Position, (ACCOUNT_ID, 2)).is_open)
+            self.assertFalse(session.get(Position, (ACCOUNT_ID, 3)).is_open)
+
+        # No open positions at all: NOT IN () closes every stored one
+        StubProvider.positions = []
+        mt5_sync.sync_open_positions()
+        with self.Session() as session:
+            self.assertFalse(session.get(Position, (ACCOUNT_ID, 2)).is_open)
+            self.assertFalse(session.get(Position, (ACCOUNT_ID, 3)).is_open)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,253 @@
+"""
+Tests for the compressed tick batch BLOB formats and the UTC day re-split
+
+python -m unittest tests.test_tick_batch_format
+"""
+
+import sys
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+from datetime import datetime, timezone
+from unittest import mock
+
+import numpy as np
+
+# Добавляем корневую папку проекта в путь
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database import tick_db_manager_compressed as batch_format
+from src.database.tick_db_manager_compressed import (
+    BATCH_TICK_DTYPE,
+    COLUMNAR_BATCH_TAG,
+    COLUMNAR_BATCH_VERSION,
+    RAW_PRICE_DIGITS,
+    UTC_BATCHES_VERSION,
+    ZLIB_CODEC,
+    ZSTD_BATCH_TAG,
+    CompressedTickDatabaseManager,
+)
+
+
+def random_ticks(rng: np.random.Generator, count: int, digits: int = 5) -> np.ndarray:
+    """Sorted ticks with prices quoted to ``digits`` decimals"""
+    ticks = np.empty(count, dtype=BATCH_TICK_DTYPE)
+    ticks['time'] = 1_700_000_000 + np.cumsum(rng.integers(0, 30, count))
+    bids = 1.1 + np.cumsum(rng.integers(-5, 6, count)) * 10.0 ** -digits
+    ticks['bid'] = np.round(bids, digits)
+    ticks['ask'] = np.round(bids + rng.integers(0, 20, count) * 10.0 ** -digits, digits)
+    ticks['volume'] = rng.integers(0, 100, count)
+    ticks['flags'] = rng.choice([2, 4, 6], count)
+    return ticks
+
+
+def legacy_zlib_blob(ticks: np.ndarray) -> bytes:
+    """Batch BLOB as written before zstd: zlib(count + 'IffII' ticks)"""
+    data = struct.pack('I', len(ticks))
+    for tick in ticks:
+        data += struct.pack('IffII', *(tick[name].item() for name in BATCH_TICK_DTYPE.names))
+    return zlib.compress(data, level=6)
+
+
+def date_int(timestamp: int) -> int:
+    """YYYYMMDD of a UTC timestamp"""
+    day = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+class TestTickBatchFormat(unittest.TestCase):
+    """Test columnar batches and the older formats they replaced"""
+
+    def setUp(self):
+        self.rng = np.random.default_rng(12345)
+        self.manager = CompressedTickDatabaseManager(tempfile.mkdtemp())
+
+    def assertTicksEqual(self, actual: np.ndarray, expected: np.ndarray):
+        self.assertEqual(len(actual), len(expected))
+        for name in BATCH_TICK_DTYPE.names:
+            np.testing.assert_array_equal(actual[name], expected[name], err_msg=name)
+
+    def test_columnar_round_trip(self):
+        """Test random batches round-trip through the current version"""
+        for count in (1, 2, 1000, 20000):
+            for digits in (0, 2, 3, 5):
+                ticks = random_ticks(self.rng, count, digits)
+                blob = self.manager._compress_ticks(ticks)
+                self.assertEqual(blob[:1], COLUMNAR_BATCH_TAG)
+                self.assertEqual(blob[1], COLUMNAR_BATCH_VERSION)
+                self.assertTicksEqual(self.manager._decompress_ticks(blob), ticks)
+
+    def test_unsorted_times_round_trip(self):
+        """Test time deltas wrap around for ticks out of order"""
+        ticks = random_ticks(self.rng, 500)
+        self.rng.shuffle(ticks)
+        blob = self.manager._compress_ticks(ticks)
+        self.assertTicksEqual(self.manager._decompress_ticks(blob), ticks)
+
+    def test_raw_price_fallback(self):
+        """Test prices without a fixed number of decimals are stored as float32"""
+        ticks = random_ticks(self.rng, 1000)
+        ticks['bid'] = self.rng.random(1000) * 100
+        ticks['ask'] = ticks['bid'] + self.rng.random(1000)
+
+        prices = np.concatenate((ticks['bid'], ticks['ask']))
+        self.assertEqual(batch_format._price_digits(prices), RAW_PRICE_DIGITS)
+        blob = self.manager._compress_ticks(ticks)
+        self.assertTicksEqual(self.manager._decompress_ticks(blob), ticks)
+
+    def test_zlib_codec_round_trip(self):
+        """Test columnar batches without the zstandard package"""
+        ticks = random_ticks(self.rng, 1000)
+        with mock.patch.object(batch_format, 'zstandard', None):
+            blob = self.manager._compress_ticks(ticks)
+            self.assertEqual(blob[2:3], ZLIB_CODEC)
+            self.assertTicksEqual(self.manager._decompress_ticks(blob), ticks)
+
+    def test_legacy_zlib_batch(self):
+        """Test a batch packed as count + 'IffII' ticks and zlib-compressed"""
+        ticks = random_ticks(self.rng, 300)
+        decoded = self.manager._decompress_ticks(legacy_zlib_blob(ticks))
+        self.assertTicksEqual(decoded, ticks)
+
+    @unittest.skipIf(batch_format.zstandard is None, "zstandard is not installed")
+    def test_legacy_zstd_batch(self):
+        """Test a 'Z' batch: zstd-compressed count + packed ticks"""
+        ticks = random_ticks(self.rng, 300)
+        data = struct.pack('<I', len(ticks)) + ticks.tobytes()
+        blob = ZSTD_BATCH_TAG + batch_format.zstandard.ZstdCompressor().compress(data)
+        self.assertTicksEqual(self.manager._decompress_ticks(blob), ticks)
+
+    def test_empty_batch(self):
+        """Test an empty batch compresses to an empty BLOB and back"""
+        blob = self.manager._compress_ticks(np.empty(0, dtype=BATCH_TICK_DTYPE))
+        self.assertEqual(blob, b'')
+        self.assertEqual(len(self.manager._decompress_ticks(blob)), 0)
+
+
+class TestUtcBatchMigration(unittest.TestCase):
+    """Test init_database() re-splits host-local day batches into UTC days"""
+
+    SERVER = 'Test-Server'
+    SYMBOL = 'EURUSD'
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        rng = np.random.default_rng(7)
+        # ~12 days around a month boundary, a tick every 30-90 s
+        self.ticks = random_ticks(rng, 15000)
+        self.ticks['time'] = 1_790_380_800 + np.cumsum(rng.integers(30, 90, len(self.ticks)))
+
+    def write_local_day_batches(self, utc_offset_hours: int):
+        """Store self.ticks bucketed by days of a fixed UTC offset, like the old save_ticks()"""
+        manager = CompressedTickDatabaseManager(self.data_dir)
+        manager.init_database(self.SERVER)
+        offset = utc_offset_hours * 3600
+        local_days = (self.ticks['time'].astype(np.int64) + offset) // 86400
+        day_starts = np.concatenate(([0], np.flatnonzero(np.diff(local_days)) + 1))
+        with manager.get_connection(self.SERVER) as conn:
+            conn.execute("BEGIN")
+            for batch in np.split(self.ticks, day_starts[1:]):
+                start, end = int(batch['time'][0]), int(batch['time'][-1])
+                conn.execute(
+                    "INSERT INTO tick_batches VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.SYMBOL, date_int(start + offset), start, end, legacy_zlib_blob(batch), len(batch))
+                )
+            # Month ranges of local months, as the old save_ticks() kept them
+            local_month = lambda t: (date_int(t + offset) // 10000, date_int(t + offset) // 100 % 100)
+            months = {}
+            for t in self.ticks['time'].tolist():
+                first, last, count = months.get(local_month(t), (t, t, 0))
+                months[local_month(t)] = (min(first, t), max(last, t), count + 1)
+            conn.executemany(
+                "INSERT INTO tick_ranges VALUES (?, ?, ?, ?, ?, ?)",
+                [(self.SYMBOL, year, month, *values) for (year, month), values in months.items()]
+            )
+            conn.execute("PRAGMA user_version = 0")
+            conn.commit()
+        manager.close()
+
+    def stored_batches(self, manager):
+        with manager.get_connection(self.SERVER) as conn:
+            return conn.execute("""
+                SELECT batch_date, batch_start_time, batch_end_time, compressed_data, tick_count
+                FROM tick_batches WHERE symbol = ? ORDER BY batch_date
+            """, (self.SYMBOL,)).fetchall()
+
+    def assertMigrated(self, manager):
+        """All ticks once, in order, in UTC day batches with matching ranges"""
+        ticks = manager.get_ticks(self.SERVER, self.SYMBOL, datetime(2000, 1, 1), datetime(2100, 1, 1))
+        times = [tick['time'] for tick in ticks]
+        self.assertEqual(times, self.ticks['time'].tolist())
+        np.testing.assert_array_equal([tick['bid'] for tick in ticks], self.ticks['bid'])
+
+        batches = self.stored_batches(manager)
+        for batch_date, start, end, compressed_data, tick_count in batches:
+            self.assertEqual(date_int(start), batch_date)
+            self.assertEqual(date_int(end), batch_date)
+            batch_ticks = manager._decompress_ticks(compressed_data)
+            self.assertEqual(len(batch_ticks), tick_count)
+            self.assertEqual((int(batch_ticks['time'][0]), int(batch_ticks['time'][-1])), (start, end))
+        self.assertEqual(len(batches), len({date_int(t) for t in times}))
+
+        expected_ranges = {}
+        for t in times:
+            key = (date_int(t) // 10000, date_int(t) // 100 % 100)
+            first, last, count = expected_ranges.get(key, (t, t, 0))
+            expected_ranges[key] = (min(first, t), max(last, t), count + 1)
+        self.assertEqual(
+            [
+                (r['year'], r['month'], r['first_tick_time'], r['last_tick_time'], r['tick_count'])
+                for r in manager.get_available_ranges(self.SERVER, self.SYMBOL)
+            ],
+            [(year, month, *values) for (year, month), values in sorted(expected_ranges.items())]
+        )
+
+        with manager.get_connection(self.SERVER) as conn:
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], UTC_BATCHES_VERSION)
+
+    def test_positive_offset_batches(self):
+        """Test batches of UTC+3 days"""
+        self.write_local_day_batches(3)
+        manager = CompressedTickDatabaseManager(self.data_dir)
+        manager.init_database(self.SERVER)
+        self.assertMigrated(manager)
+        manager.close()
+
+    def test_negative_offset_batches(self):
+        """Test batches of UTC-5 days"""
+        self.write_local_day_batches(-5)
+        manager = CompressedTickDatabaseManager(self.data_dir)
+        manager.init_database(self.SERVER)
+        self.assertMigrated(manager)
+        manager.close()
+
+    def test_migration_runs_once(self):
+        """Test a migrated database is left alone by later startups"""
+        self.write_local_day_batches(3)
+        manager = CompressedTickDatabaseManager(self.data_dir)
+        manager.init_database(self.SERVER)
+        batches = self.stored_batches(manager)
+        manager.close()
+
+        manager = CompressedTickDatabaseManager(self.data_dir)
+        with mock.patch.object(CompressedTickDatabaseManager, '_rebucket_local_day_batches') as rebucket:
+            manager.init_database(self.SERVER)
+        rebucket.assert_not_called()
+        self.assertEqual(self.stored_batches(manager), batches)
+        manager.close()
+
+    def test_utc_batches_are_not_rewritten(self):
+        """Test batches that already are UTC days keep their BLOBs"""
+        self.write_local_day_batches(0)
+        manager = CompressedTickDatabaseManager(self.data_dir)
+        batches = self.stored_batches(manager)
+        manager.init_database(self.SERVER)
+        self.assertEqual(self.stored_batches(manager), batches)
+        self.assertMigrated(manager)
+        manager.close()
+
+
+if __name__ == '__main__':
+    unittest.main()